@@ -0,0 +1,305 @@
+"""Кэш на SQLite, общий для всех процессов-воркеров одного хоста.
+
+Файл базы открывается в режиме WAL: читатели не блокируют писателя и
+друг друга, поэтому cache_page, инвалидация поколений и кэш фрагментов
+видны всем воркерам сразу, а данные не дублируются в каждом процессе.
+
+Вытеснение — приближённый LRU: время доступа обновляется не чаще раза
+в ACCESS_GRANULARITY секунд, а при превышении MAX_ENTRIES или MAX_SIZE
+удаляются записи с самым старым доступом. Количество и суммарный размер
+записей поддерживаются триггерами, поэтому проверка лимитов бесплатна.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS cache_entry (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS cache_entry_accessed '
+    'ON cache_entry (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)',
+    '''
+    CREATE TABLE IF NOT EXISTS cache_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        entries INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    )
+    ''',
+    'INSERT OR IGNORE INTO cache_stats (id, entries, size) VALUES (1, 0, 0)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cache_entry_insert
+    AFTER INSERT ON cache_entry BEGIN
+        UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cache_entry_delete
+    AFTER DELETE ON cache_entry BEGIN
+        UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS cache_entry_update
+    AFTER UPDATE OF size ON cache_entry BEGIN
+        UPDATE cache_stats SET size = size - OLD.size + NEW.size;
+    END
+    ''',
+)
+# Ограничение SQLite на число параметров в одном запросе
+MAX_QUERY_PARAMS = 500
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._access_granularity = float(
+            options.get('ACCESS_GRANULARITY', 60)
+        )
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            timeout=self._busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with _transaction(connection):
+            for statement in SCHEMA:
+                connection.execute(statement)
+        return connection
+
+    def _keys(self, keys, version):
+        key_map = {}
+        for key in keys:
+            cache_key = self.make_key(key, version=version)
+            self.validate_key(cache_key)
+            key_map[cache_key] = key
+        return key_map
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        key_map = self._keys(keys, version)
+        if not key_map:
+            return {}
+        now = time.time()
+        found, expired, stale = {}, [], []
+        cache_keys = list(key_map)
+        for start in range(0, len(cache_keys), MAX_QUERY_PARAMS):
+            chunk = cache_keys[start:start + MAX_QUERY_PARAMS]
+            rows = self._connection.execute(
+                'SELECT key, value, expires, accessed FROM cache_entry '
+                f'WHERE key IN ({",".join("?" * len(chunk))})',
+                chunk,
+            )
+            for cache_key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    expired.append(cache_key)
+                    continue
+                found[key_map[cache_key]] = pickle.loads(value)
+                if now - accessed > self._access_granularity:
+                    stale.append(cache_key)
+        if expired or stale:
+            with _transaction(self._connection) as connection:
+                connection.executemany(
+                    'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                    [(cache_key, now) for cache_key in expired],
+                )
+                connection.executemany(
+                    'UPDATE cache_entry SET accessed = ? WHERE key = ?',
+                    [(now, cache_key) for cache_key in stale],
+                )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for cache_key, key in self._keys(data, version).items():
+            value = pickle.dumps(data[key], self.pickle_protocol)
+            rows.append((cache_key, value, len(value), expires, now))
+        with _transaction(self._connection) as connection:
+            connection.executemany(
+                'INSERT INTO cache_entry '
+                '(key, value, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'value = excluded.value, size = excluded.size, '
+                'expires = excluded.expires, accessed = excluded.accessed',
+                rows,
+            )
+            self._cull(connection, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self.make_key(key, version=version)
+        self.validate_key(cache_key)
+        value = pickle.dumps(value, self.pickle_protocol)
+        now = time.time()
+        with _transaction(self._connection) as connection:
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                (cache_key, now),
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache_entry '
+                '(key, value, size, expires, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (cache_key, value, len(value),
+                 self.get_backend_timeout(timeout), now),
+            )
+            self._cull(connection, now)
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cache_key = self.make_key(key, version=version)
+        self.validate_key(cache_key)
+        now = time.time()
+        with _transaction(self._connection) as connection:
+            cursor = connection.execute(
+                'UPDATE cache_entry SET expires = ?, accessed = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, cache_key, now),
+            )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        cache_key = self.make_key(key, version=version)
+        self.validate_key(cache_key)
+        now = time.time()
+        with _transaction(self._connection) as connection:
+            row = connection.execute(
+                'SELECT value FROM cache_entry '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (cache_key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            value = pickle.dumps(new_value, self.pickle_protocol)
+            connection.execute(
+                'UPDATE cache_entry SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                (value, len(value), now, cache_key),
+            )
+        return new_value
+
+    def has_key(self, key, version=None):
+        cache_key = self.make_key(key, version=version)
+        self.validate_key(cache_key)
+        row = self._connection.execute(
+            'SELECT 1 FROM cache_entry '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (cache_key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        cache_keys = list(self._keys(keys, version))
+        with _transaction(self._connection) as connection:
+            connection.executemany(
+                'DELETE FROM cache_entry WHERE key = ?',
+                [(cache_key,) for cache_key in cache_keys],
+            )
+
+    def clear(self):
+        with _transaction(self._connection) as connection:
+            connection.execute('DELETE FROM cache_entry')
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока, как у LocMemCache.
+        pass
+
+    def stats(self):
+        """Число записей и их суммарный размер в байтах."""
+        entries, size = self._totals(self._connection)
+        return {'entries': entries, 'size': size}
+
+    def _cull(self, connection, now):
+        entries, size = self._totals(connection)
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        connection.execute(
+            'DELETE FROM cache_entry WHERE expires <= ?', (now,)
+        )
+        entries, size = self._totals(connection)
+        if entries > self._max_entries:
+            # Как штатные бэкенды, удаляем 1/CULL_FREQUENCY записей,
+            # но выбираем самые давно использованные.
+            if self._cull_frequency:
+                count = max(entries // self._cull_frequency, 1)
+            else:
+                count = entries
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                'SELECT key FROM cache_entry ORDER BY accessed LIMIT ?)',
+                (count,),
+            )
+            entries, size = self._totals(connection)
+        if size > self._max_size:
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                'SELECT key FROM ('
+                'SELECT key, size, SUM(size) OVER (ORDER BY accessed, key) '
+                'AS running FROM cache_entry'
+                ') WHERE running - size < ?)',
+                (size - self._max_size,),
+            )
+
+    @staticmethod
+    def _totals(connection):
+        return connection.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT для соединения в autocommit-режиме."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
@@ -0,0 +1,197 @@
+"""Удаление из CSS правил, которые не нужны шаблонам проекта.
+
+Классы собираются из атрибутов class="…" всех шаблонов проекта, включая
+ветки {% if %} внутри атрибута и строки в тегах, и из аргументов
+фильтра addclass. Правило остаётся, если каждый класс хотя бы одного
+его селектора используется; селекторы без классов (body, a, [hidden])
+остаются всегда. Классы внутри :not(…) не обязательны: такой селектор
+срабатывает и без них.
+"""
+import os
+import re
+
+from django.conf import settings
+
+CLASS_ATTRIBUTE = re.compile(
+    r'''\bclass\s*=\s*(?:"((?:{%.*?%}|{{.*?}}|[^"])*)"'''
+    r"""|'((?:{%.*?%}|{{.*?}}|[^'])*)')""",
+    re.DOTALL,
+)
+ADDCLASS_FILTER = re.compile(r'''\|\s*addclass\s*:\s*(["'])(.*?)\1''')
+TEMPLATE_TAG = re.compile(r'{%.*?%}', re.DOTALL)
+TEMPLATE_VARIABLE = re.compile(r'{{.*?}}', re.DOTALL)
+STRING_LITERAL = re.compile(r'''(["'])(.*?)\1''')
+CLASS_NAME = re.compile(r'^-?[_a-zA-Z][\w-]*$')
+SELECTOR_CLASS = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+# Части селектора, в которых точка не означает класс
+SELECTOR_IGNORED = re.compile(
+    r'''\[[^\]]*\]|:not\((?:[^()]|\([^()]*\))*\)|"[^"]*"|'[^']*\''''
+)
+# At-правила, внутри которых обычные правила и которые чистятся рекурсивно
+NESTED_AT_RULES = ('@media', '@supports', '@document')
+
+
+def template_files(directories=None):
+    """Шаблоны проекта: каталоги TEMPLATES и шаблоны приложений в BASE_DIR.
+    """
+    if directories is None:
+        directories = [
+            directory
+            for engine in settings.TEMPLATES
+            for directory in engine.get('DIRS', ())
+        ]
+        for app_directory in os.listdir(settings.BASE_DIR):
+            path = os.path.join(settings.BASE_DIR, app_directory, 'templates')
+            if os.path.isdir(path):
+                directories.append(path)
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.endswith(('.html', '.txt')):
+                    yield os.path.join(root, name)
+
+
+def _classes(text):
+    return {word for word in text.split() if CLASS_NAME.match(word)}
+
+
+def template_classes(source):
+    """Классы, которые шаблон source может вывести в разметку."""
+    classes = set()
+    for match in CLASS_ATTRIBUTE.finditer(source):
+        value = match.group(1) or match.group(2) or ''
+        for tag in TEMPLATE_TAG.findall(value):
+            for _, literal in STRING_LITERAL.findall(tag):
+                classes |= _classes(literal)
+        value = TEMPLATE_TAG.sub(' ', TEMPLATE_VARIABLE.sub(' ', value))
+        classes |= _classes(value)
+    for _, value in ADDCLASS_FILTER.findall(source):
+        classes |= _classes(value)
+    return classes
+
+
+def used_classes(files=None):
+    """Классы из всех шаблонов files (по умолчанию — шаблонов проекта)."""
+    classes = set()
+    for path in template_files() if files is None else files:
+        with open(path, encoding='utf-8') as template:
+            classes |= template_classes(template.read())
+    return classes
+
+
+def _comment_end(css, index):
+    """Позиция сразу за комментарием, начатым в index."""
+    end = css.find('*/', index + 2)
+    return len(css) if end == -1 else end + 2
+
+
+def _string_end(css, index):
+    """Позиция сразу за строкой в кавычках, начатой в index."""
+    quote = css[index]
+    end = index + 1
+    while end < len(css) and css[end] != quote:
+        end += 2 if css[end] == '\\' else 1
+    return end + 1
+
+
+def _skip_comment_or_string(css, index, depth):
+    """(css, index) за комментарием или строкой в index, иначе None.
+
+    Комментарий верхнего уровня вырезается из css, остальные — обходятся.
+    """
+    if css.startswith('/*', index):
+        end = _comment_end(css, index)
+        if depth == 0:
+            return css[:index] + css[end:], index
+        return css, end
+    if css[index] in '"\'':
+        return css, _string_end(css, index)
+    return None
+
+
+def split_rules(css):
+    """Разбить CSS одного уровня на пары (прелюдия, тело).
+
+    Для at-правил без блока (@charset, @import) тело — None.
+    Комментарии отбрасываются, строки и вложенные скобки учитываются.
+    """
+    rules = []
+    start = depth = 0
+    body_start = None
+    index = 0
+    while index < len(css):
+        skipped = _skip_comment_or_string(css, index, depth)
+        if skipped is not None:
+            css, index = skipped
+            continue
+        char = css[index]
+        if char == '{':
+            if depth == 0:
+                body_start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append(
+                    (css[start:body_start - 1].strip(), css[body_start:index])
+                )
+                start = index + 1
+        elif char == ';' and depth == 0:
+            statement = css[start:index + 1].strip()
+            if statement:
+                rules.append((statement, None))
+            start = index + 1
+        index += 1
+    return rules
+
+
+def split_selectors(prelude):
+    """Селекторы списка через запятую, не разрывая :not(a, b) и [a=","]."""
+    selectors = []
+    depth = 0
+    start = 0
+    quote = None
+    for index, char in enumerate(prelude):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:index].strip())
+            start = index + 1
+    selectors.append(prelude[start:].strip())
+    return [selector for selector in selectors if selector]
+
+
+def selector_used(selector, classes):
+    required = SELECTOR_CLASS.findall(SELECTOR_IGNORED.sub('', selector))
+    return all(name in classes for name in required)
+
+
+def purge(css, classes):
+    """CSS без правил, селекторам которых не хватает классов из classes."""
+    output = []
+    for prelude, body in split_rules(css):
+        if body is None:
+            output.append(prelude)
+        elif prelude.startswith('@'):
+            if prelude.lower().startswith(NESTED_AT_RULES):
+                inner = purge(body, classes)
+                if inner:
+                    output.append(f'{prelude}{{{inner}}}')
+            else:
+                # @font-face, @keyframes, @page переносятся как есть
+                output.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [
+                selector for selector in split_selectors(prelude)
+                if selector_used(selector, classes)
+            ]
+            if selectors:
+                output.append(f'{",".join(selectors)}{{{body}}}')
+    return '\n'.join(output)
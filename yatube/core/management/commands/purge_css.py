@@ -0,0 +1,57 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+
+from core.css import purge, used_classes
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает из PURGE_CSS_SOURCE только правила для классов из '
+        'шаблонов проекта (PURGE_CSS_OUTPUT) и критический CSS первого '
+        'экрана (CRITICAL_CSS), который встраивается в base.html.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=None,
+            help='Путь статики вместо PURGE_CSS_SOURCE.',
+        )
+
+    def handle(self, *args, source, **options):
+        source = source or settings.PURGE_CSS_SOURCE
+        source_path = finders.find(source)
+        if not source_path:
+            raise CommandError(f'Файл статики {source} не найден.')
+        with open(source_path, encoding='utf-8') as stylesheet:
+            css = stylesheet.read()
+
+        safelist = set(settings.PURGE_CSS_SAFELIST)
+        purged = purge(css, used_classes() | safelist)
+        critical_templates = [
+            get_template(name).origin.name
+            for name in settings.CRITICAL_CSS_TEMPLATES
+        ]
+        critical = purge(
+            purged, used_classes(critical_templates) | safelist
+        )
+
+        directory = settings.STATICFILES_DIRS[0]
+        for name, content in (
+            (settings.PURGE_CSS_OUTPUT, purged),
+            (settings.CRITICAL_CSS, critical),
+        ):
+            path = os.path.join(directory, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as output:
+                output.write(content)
+            self.report(name, len(css.encode()), len(content.encode()))
+
+    def report(self, name, before, after):
+        self.stdout.write(
+            f'{name}: {before} → {after} байт '
+            f'(−{(1 - after / before) * 100 if before else 0:.1f}%)'
+        )
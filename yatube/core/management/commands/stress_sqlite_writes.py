@@ -0,0 +1,216 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+from core.sqlite import WriteQueue, serialize_writes
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, comments INTEGER NOT NULL)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER NOT NULL, '
+    'text TEXT NOT NULL, created REAL NOT NULL)',
+    'CREATE INDEX comment_post ON comment (post_id, created)',
+)
+POSTS = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает SQLite-файл параллельными писателями и читателями через '
+        'соединения Django: настройки по умолчанию против SQLITE_PRAGMAS '
+        'с очередью записи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument(
+            '--operations', type=int, default=200,
+            help='Транзакций на каждого писателя.',
+        )
+        parser.add_argument('--readers', type=int, default=4)
+
+    def handle(self, *args, writers, operations, readers, **options):
+        self.stdout.write(
+            f'Писателей: {writers} по {operations} транзакций, '
+            f'читателей: {readers}'
+        )
+        self.stdout.write(
+            f'{"режим":<12}{"записей/с":>12}{"чтений/с":>12}'
+            f'{"ошибок записи":>16}{"ошибок чтения":>16}'
+        )
+        results = {}
+        for mode in ('default', 'tuned'):
+            with tempfile.TemporaryDirectory() as directory:
+                result = run_stress(
+                    os.path.join(directory, 'stress.sqlite3'),
+                    tuned=mode == 'tuned', writers=writers,
+                    operations=operations, readers=readers,
+                )
+            results[mode] = result
+            self.stdout.write(
+                f'{mode:<12}{result.writes_per_second:>12.1f}'
+                f'{result.reads_per_second:>12.1f}'
+                f'{result.write_errors:>16}{result.read_errors:>16}'
+            )
+        default, tuned = results['default'], results['tuned']
+        if default.writes_per_second:
+            self.stdout.write(
+                'Ускорение записи: ×'
+                f'{tuned.writes_per_second / default.writes_per_second:.2f}'
+            )
+
+
+class StressResult:
+    def __init__(self):
+        self.writes = 0
+        self.reads = 0
+        self.write_errors = 0
+        self.read_errors = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def writes_per_second(self):
+        return self.writes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def reads_per_second(self):
+        return self.reads / self.elapsed if self.elapsed else 0.0
+
+
+@contextmanager
+def _database(path, tuned):
+    """Алиас базы path в django.db.connections на время прогона.
+
+    Соединения открывает сам Django, так что PRAGMA ставит обработчик
+    connection_created (core.sqlite); в режиме default их нет.
+    """
+    alias = f'stress-{uuid.uuid4().hex}'
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+    }
+    connections.ensure_defaults(alias)
+    pragmas = settings.SQLITE_PRAGMAS if tuned else {}
+    try:
+        with override_settings(SQLITE_PRAGMAS=pragmas):
+            yield alias
+    finally:
+        del connections.databases[alias]
+
+
+@contextmanager
+def _connection(alias):
+    """Соединение потока с базой alias, закрываемое на выходе."""
+    connection = connections[alias]
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def _prepare(alias):
+    with _connection(alias) as connection, connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        cursor.executemany(
+            'INSERT INTO post (id, comments) VALUES (%s, 0)',
+            [(post_id,) for post_id in range(1, POSTS + 1)],
+        )
+
+
+def _write(connection, number):
+    """Как add_comment в atomic(): чтение поста, комментарий, счётчик."""
+    post_id = number % POSTS + 1
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.execute('SELECT comments FROM post WHERE id = %s', [post_id])
+        cursor.fetchone()
+        cursor.execute(
+            'INSERT INTO comment (post_id, text, created) '
+            'VALUES (%s, %s, %s)',
+            [post_id, f'Комментарий {number}', time.time()],
+        )
+        cursor.execute(
+            'UPDATE post SET comments = comments + 1 WHERE id = %s',
+            [post_id],
+        )
+
+
+def _writer(alias, tuned, queue, result, offset, operations):
+    with _connection(alias) as connection:
+        for number in range(offset, offset + operations):
+            try:
+                if tuned:
+                    # Очередь, как в SerializedWritesMiddleware
+                    with serialize_writes(
+                        connection, queue, settings.SQLITE_WRITE_QUEUE_TIMEOUT
+                    ):
+                        _write(connection, number)
+                else:
+                    _write(connection, number)
+            except OperationalError:
+                result.add(write_errors=1)
+            else:
+                result.add(writes=1)
+
+
+def _reader(alias, result, done, number):
+    with _connection(alias) as connection:
+        while not done.is_set():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT id, text FROM comment WHERE post_id = %s '
+                        'ORDER BY created DESC LIMIT 20',
+                        [number % POSTS + 1],
+                    )
+                    cursor.fetchall()
+            except OperationalError:
+                result.add(read_errors=1)
+            else:
+                result.add(reads=1)
+            number += 1
+
+
+def run_stress(path, tuned, writers, operations, readers):
+    """Прогнать нагрузку на файле path и вернуть StressResult."""
+    with _database(path, tuned) as alias:
+        _prepare(alias)
+        result = StressResult()
+        queue = WriteQueue()
+        done = threading.Event()
+        writer_threads = [
+            threading.Thread(target=_writer, args=(
+                alias, tuned, queue, result, index * operations, operations
+            ))
+            for index in range(writers)
+        ]
+        reader_threads = [
+            threading.Thread(
+                target=_reader, args=(alias, result, done, index)
+            )
+            for index in range(readers)
+        ]
+        started = time.perf_counter()
+        for thread in writer_threads + reader_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        result.elapsed = time.perf_counter() - started
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+    return result
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.replica import confirm_replica, sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет реплику для чтения копией основной базы через '
+        'SQLite backup API; с --loop повторяет каждые '
+        'REPLICA_SYNC_INTERVAL секунд. Копируется весь файл, так что '
+        'время копии растёт с размером базы; если с прошлой копии база '
+        'не менялась (PRAGMA data_version), копия пропускается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Синхронизировать по расписанию, пока не прервут.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Интервал в секундах вместо REPLICA_SYNC_INTERVAL.',
+        )
+
+    def handle(self, *args, loop, interval, **options):
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        interval = interval or settings.REPLICA_SYNC_INTERVAL
+        # data_version соединения меняется, когда базу изменил кто-то
+        # другой, поэтому следящее соединение живёт весь цикл
+        with closing(sqlite3.connect(source)) as watcher:
+            version = None
+            while True:
+                started = time.perf_counter()
+                version = self._sync(source, watcher, version)
+                elapsed = time.perf_counter() - started
+                if not loop:
+                    return
+                time.sleep(max(interval - elapsed, 0))
+
+    def _sync(self, source, watcher, synced_version):
+        """Скопировать базу, если она менялась; вернуть её data_version."""
+        snapshot = time.time()
+        started = time.perf_counter()
+        version = watcher.execute('PRAGMA data_version').fetchone()[0]
+        target = settings.REPLICA_PATH
+        if version == synced_version and os.path.exists(target):
+            confirm_replica(target, snapshot)
+            self.stdout.write('Реплика актуальна, копия не нужна')
+            return version
+        pages = sync_replica(source, target)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Реплика обновлена: {pages} страниц за {elapsed * 1000:.1f} мс'
+        )
+        return version
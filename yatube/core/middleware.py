@@ -0,0 +1,161 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .replica import routing
+from .sqlite import is_write, serialize_writes
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+# Порядок предпочтения готовых сжатых копий статики
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Имя, в которое ManifestStaticFilesStorage вставляет 12 знаков хэша
+HASHED_NAME = re.compile(
+    r'^(?P<base>.+)\.[0-9a-f]{12}(?P<extension>\.[^./]+)?$'
+)
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме запрещённых через q=0."""
+    encodings = set()
+    for item in header.split(','):
+        encoding, _, params = item.partition(';')
+        name, _, value = params.partition('=')
+        quality = 1.0
+        if name.strip() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                pass
+        if encoding.strip() and quality > 0:
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+def is_hashed(name):
+    """name — копия с хэшем из манифеста статики."""
+    match = HASHED_NAME.match(name)
+    if not match:
+        return False
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    original = match.group('base') + (match.group('extension') or '')
+    return hashed_files.get(original) == name
+
+
+class StaticFilesMiddleware:
+    """Отдача собранной статики из STATIC_ROOT без отдельного веб-сервера.
+
+    Берёт заранее сжатую копию (.br, .gz) по Accept-Encoding. Файлы с
+    хэшем из манифеста не меняются никогда и кэшируются навсегда
+    (immutable), остальные браузер перепроверяет по Last-Modified.
+    Если файла нет, запрос идёт дальше, в том числе к staticfiles
+    runserver при DEBUG.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.method in ('GET', 'HEAD') and settings.STATIC_ROOT
+                and request.path.startswith(settings.STATIC_URL)):
+            response = self.serve(
+                request, request.path[len(settings.STATIC_URL):]
+            )
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        immutable = is_hashed(name)
+        if not immutable and not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size,
+        ):
+            return HttpResponseNotModified()
+        content_type = mimetypes.guess_type(path)[0]
+        encoding = None
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for candidate, suffix in STATIC_ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if immutable:
+            response['Cache-Control'] = (
+                f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+            )
+        else:
+            response['Cache-Control'] = 'public, no-cache'
+            response['Last-Modified'] = http_date(stat.st_mtime)
+        return response
+
+
+class SerializedWritesMiddleware:
+    """Пишущие запросы к SQLite идут через очередь записи процесса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.method in SAFE_METHODS
+                or not settings.SQLITE_SERIALIZE_WRITES
+                or connection.vendor != 'sqlite'):
+            return self.get_response(request)
+        with serialize_writes(
+            connection, timeout=settings.SQLITE_WRITE_QUEUE_TIMEOUT
+        ):
+            return self.get_response(request)
+
+
+class ReadYourWritesMiddleware:
+    """Клиент, который только что писал, какое-то время не читает реплику.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REPLICA_DATABASE:
+            return self.get_response(request)
+        wrote = False
+
+        def wrapper(execute, sql, params, many, context):
+            nonlocal wrote
+            wrote = wrote or is_write(sql)
+            return execute(sql, params, many, context)
+
+        pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES
+        with routing(pinned=pinned), \
+                connections[DEFAULT_DB_ALIAS].execute_wrapper(wrapper):
+            response = self.get_response(request)
+        if wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,136 @@
+"""Чтение лент из локальной реплики SQLite.
+
+Реплика — копия основного файла базы, которую sync_replica снимает
+через online backup API: копия пишется во временный файл рядом и
+атомарно подменяет прежнюю, поэтому читатели реплики не ждут ни
+копирования, ни писателей основной базы. Открытые соединения дочитывают
+старую копию, новые открывают уже свежую.
+
+ReplicaRouter отправляет в реплику только чтение моделей REPLICA_APPS
+внутри представлений, помеченных replica_reads (ленты, профиль, пост).
+Сессии и пользователи всегда читаются из основной базы, запись тоже.
+Клиент, который только что писал, получает cookie REPLICA_PIN_COOKIE и
+следующие REPLICA_PIN_SECONDS читает из основной базы, чтобы сразу
+увидеть свой пост, даже если реплика ещё не догнала её.
+
+Время изменения файла реплики — момент начала снимка: по нему кэш
+страниц (posts.page_cache) решает, успела ли реплика получить изменения.
+Процесс смотрит на файл не чаще раза в SNAPSHOT_CHECK_INTERVAL секунд:
+устаревшее время снимка лишь дольше оставляет чтение в основной базе.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_APPS = ('posts',)
+SNAPSHOT_CHECK_INTERVAL = 1
+
+_state = threading.local()
+# Путь реплики -> (время снимка или None без файла, когда проверено)
+_snapshots = {}
+
+
+def is_available():
+    """Реплика включена и хотя бы раз синхронизирована."""
+    return snapshot_time() is not None
+
+
+@contextmanager
+def routing(replica=False, pinned=None):
+    """Состояние маршрутизации чтения для текущего потока."""
+    previous = getattr(_state, 'replica', False), getattr(
+        _state, 'pinned', False
+    )
+    _state.replica = replica
+    if pinned is not None:
+        _state.pinned = pinned
+    try:
+        yield
+    finally:
+        _state.replica, _state.pinned = previous
+
+
+def snapshot_time():
+    """Момент начала снимка реплики (Unix-время) или None без реплики."""
+    if not settings.REPLICA_DATABASE:
+        return None
+    path = settings.REPLICA_PATH
+    now = time.monotonic()
+    cached = _snapshots.get(path)
+    if cached is not None and now - cached[1] < SNAPSHOT_CHECK_INTERVAL:
+        return cached[0]
+    try:
+        snapshot = os.path.getmtime(path)
+    except OSError:
+        snapshot = None
+    _snapshots[path] = snapshot, now
+    return snapshot
+
+
+def replica_reads(view):
+    """Разрешить представлению читать посты из реплики."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with routing(replica=True):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (getattr(_state, 'replica', False)
+                and not getattr(_state, 'pinned', False)
+                and model._meta.app_label in REPLICA_APPS
+                and is_available()):
+            return settings.REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы, объекты из обеих совместимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def sync_replica(source, target):
+    """Снять копию source в target через backup API; вернуть число страниц.
+    """
+    descriptor, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(target) or '.', prefix='.replica-'
+    )
+    os.close(descriptor)
+    started = time.time()
+    try:
+        with closing(sqlite3.connect(source)) as primary, \
+                closing(sqlite3.connect(temp_path)) as copy:
+            # Одним шагом: в WAL это снимок чтения, писателей он не держит
+            primary.backup(copy)
+            # Соединение только для чтения не может открыть WAL без -shm
+            copy.execute('PRAGMA journal_mode = DELETE')
+            pages = copy.execute('PRAGMA page_count').fetchone()[0]
+        os.utime(temp_path, (started, started))
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    _snapshots[target] = started, time.monotonic()
+    return pages
+
+
+def confirm_replica(target, started):
+    """Основная база не менялась с прошлой копии: реплика target верна
+    на момент started, и копировать её заново не нужно.
+    """
+    os.utime(target, (started, started))
+    _snapshots[target] = started, time.monotonic()
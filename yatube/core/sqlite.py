@@ -0,0 +1,192 @@
+"""Настройка SQLite для работы под нагрузкой.
+
+Каждое новое соединение получает PRAGMA из settings.SQLITE_PRAGMAS:
+WAL, чтобы читатели не ждали писателя, synchronous=NORMAL, время
+ожидания блокировки, размер страничного кэша и mmap.
+
+SQLite допускает одного писателя на файл. Транзакция Django начинается
+как отложенная и берёт блокировку записи только на первом INSERT или
+UPDATE; если к этому моменту другой писатель уже держит её, а эта
+транзакция успела прочитать данные, SQLite сразу отвечает «database is
+locked», не дожидаясь busy_timeout. Поэтому запись внутри процесса идёт
+через очередь WriteQueue: поток берёт её на первом пишущем запросе и
+держит до конца транзакции, так что потоки одного воркера пишут по
+очереди, а не падают друг на друге.
+"""
+import logging
+import re
+import threading
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Запросы, которые не пишут в базу и не открывают транзакцию
+READ_PREFIXES = ('select', 'pragma', 'explain')
+# Точки сохранения вложенных atomic() и откат не пишут. BEGIN же идёт
+# как запись: транзакция, начавшая читать до очереди, потом не сможет
+# писать («database is locked» по устаревшему снимку WAL)
+TRANSACTION_VERBS = ('savepoint', 'release', 'rollback')
+# Слова вне скобок и кавычек: по ним ищется глагол после списка CTE
+CTE_TOKEN = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|[()]|\w+""")
+STATEMENT_VERBS = ('select', 'insert', 'update', 'delete', 'replace')
+# PRAGMA, которые меняют файл базы и недоступны соединению только для чтения
+WRITE_PRAGMAS = ('journal_mode',)
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_read_only(settings_dict):
+    """База открыта URI вида file:...?mode=ro."""
+    name = str(settings_dict['NAME'])
+    if not name.startswith('file:'):
+        return False
+    return parse_qs(urlsplit(name).query).get('mode') == ['ro']
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA для соединений с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = settings.SQLITE_PRAGMAS
+    if is_read_only(connection.settings_dict):
+        pragmas = {
+            name: value for name, value in pragmas.items()
+            if name not in WRITE_PRAGMAS
+        }
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
+
+
+class WriteQueue:
+    """Реентерабельная блокировка, которую потоки получают по очереди.
+
+    threading.Lock не гарантирует порядок, и под нагрузкой один поток
+    может долго не получать блокировку; здесь потоки обслуживаются
+    в порядке прихода по номерам билетов.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self, timeout=None):
+        """Встать в очередь; False, если очередь не дошла за timeout."""
+        me = threading.get_ident()
+        with self._condition:
+            if self._owner == me:
+                self._depth += 1
+                return True
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            served = self._condition.wait_for(
+                lambda: self._serving == ticket, timeout
+            )
+            if not served:
+                # Очередь ждёт этот номер, поэтому его нужно пропустить
+                self._abandoned.add(ticket)
+                return False
+            self._owner = me
+            self._depth = 1
+            return True
+
+    def release(self):
+        with self._condition:
+            if self._owner != threading.get_ident():
+                raise RuntimeError('Очередь записи занята другим потоком.')
+            self._depth -= 1
+            if self._depth:
+                return
+            self._owner = None
+            self._advance()
+
+    def _advance(self):
+        self._serving += 1
+        while self._serving in self._abandoned:
+            self._abandoned.discard(self._serving)
+            self._serving += 1
+        self._condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+write_queue = WriteQueue()
+
+
+def statement_verb(sql):
+    """Первое слово запроса, а для WITH … — глагол после списка CTE."""
+    sql = sql.lstrip().lower()
+    if not sql.startswith('with'):
+        return sql.split(None, 1)[0] if sql else ''
+    depth = 0
+    for token in CTE_TOKEN.findall(sql):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token in STATEMENT_VERBS:
+            return token
+    return 'with'
+
+
+def is_write(sql):
+    verb = statement_verb(sql)
+    return verb not in READ_PREFIXES and verb not in TRANSACTION_VERBS
+
+
+@contextmanager
+def serialize_writes(connection, queue=write_queue, timeout=None):
+    """Вставать в очередь записи на первом пишущем запросе транзакции.
+
+    Чтение до первой записи идёт без очереди. Очередь отпускается, как
+    только транзакция закончилась: после запроса в режиме autocommit,
+    после коммита (on_commit), а после отката — на следующем запросе вне
+    транзакции или на выходе из блока. Если очередь не дошла за timeout,
+    транзакция пишет без неё и полагается на busy_timeout.
+    """
+    state = {'held': False, 'tried': False, 'scheduled': False}
+
+    def release():
+        if state['held']:
+            queue.release()
+        state.update(held=False, tried=False, scheduled=False)
+
+    def wrapper(execute, sql, params, many, context):
+        if not state['tried'] and is_write(sql):
+            state['tried'] = True
+            state['held'] = queue.acquire(timeout)
+            if not state['held']:
+                logger.warning(
+                    'Очередь записи не освободилась за %s с', timeout
+                )
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # atomic() помечает блок уже после своего BEGIN
+            begins = statement_verb(sql) == 'begin'
+            if not connection.in_atomic_block and not begins:
+                release()
+            elif connection.in_atomic_block and state['tried'] \
+                    and not state['scheduled']:
+                state['scheduled'] = True
+                connection.on_commit(release)
+
+    try:
+        with connection.execute_wrapper(wrapper):
+            yield
+    finally:
+        release()
@@ -0,0 +1,121 @@
+"""Файловое хранилище с адресацией по содержимому.
+
+Имя файла — SHA-256 его байтов, поэтому одинаковые загрузки ложатся в
+один файл, а миниатюры sorl, ключи которых строятся из имени, становятся
+общими для всех постов с этой картинкой. Хэш считается в один проход,
+пока загрузка пишется во временный файл рядом с хранилищем; затем файл
+атомарно переносится на место или отбрасывается, если такой уже есть.
+"""
+import gzip
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Статика, которую имеет смысл сжимать: картинки уже сжаты
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.svg', '.ico', '.txt', '.html', '.json', '.xml',
+    '.map', '.eot', '.ttf', '.otf',
+)
+# Сжатая копия пишется, только если она заметно меньше исходника
+MIN_COMPRESSION_RATIO = 0.95
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+
+        os.makedirs(self.location, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=self.location, prefix='.upload-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension
+            )
+            path = self.path(name)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+
+def _compressors():
+    yield 'gzip', '.gz', lambda data: gzip.compress(
+        data, compresslevel=9, mtime=0
+    )
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(
+            data, quality=11
+        )
+
+
+def compressed_siblings(path):
+    """Записать рядом с path версии .gz и .br (если установлен brotli)."""
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    with open(path, 'rb') as source:
+        data = source.read()
+    written = []
+    for encoding, suffix, compress in _compressors():
+        compressed = compress(data)
+        if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
+            written.append(path + suffix)
+        elif os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшем содержимого в имени и готовыми .gz / .br рядом.
+
+    collectstatic кладёт в STATIC_ROOT копии с хэшем в имени и манифест,
+    по которому {% static %} подставляет их в шаблоны, а затем сжимает
+    текстовые файлы заранее: StaticFilesMiddleware отдаёт сжатую копию
+    без сжатия на лету. Файлу, которого нет в манифесте (статика ещё не
+    собрана, например в тестах), ссылка выдаётся без хэша.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in {*paths, *self.hashed_files.values()}:
+            if self.exists(name):
+                compressed_siblings(self.path(name))
@@ -0,0 +1,36 @@
+import os
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+
+register = template.Library()
+
+# {путь: (mtime, содержимое)} критического CSS
+_critical = {}
+
+
+def _read_critical(path):
+    mtime = os.stat(path).st_mtime
+    cached = _critical.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding='utf-8') as stylesheet:
+            cached = _critical[path] = (mtime, stylesheet.read())
+    return cached[1]
+
+
+@register.inclusion_tag('includes/stylesheets.html')
+def stylesheets():
+    """Стили страницы: очищенный bootstrap и встроенный критический CSS.
+
+    Пока purge_css не запускался, подключается исходный
+    PURGE_CSS_SOURCE целиком.
+    """
+    if not finders.find(settings.PURGE_CSS_OUTPUT):
+        return {'href': static(settings.PURGE_CSS_SOURCE)}
+    critical_path = finders.find(settings.CRITICAL_CSS)
+    return {
+        'href': static(settings.PURGE_CSS_OUTPUT),
+        'critical': _read_critical(critical_path) if critical_path else '',
+    }
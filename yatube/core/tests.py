@@ -1,4 +1,45 @@
-from django.test import TestCase
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.templatetags.static import static
+from django.test import (
+    SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.engines.pil_engine import Engine as PILEngine
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from core.cache import SQLiteCache
+from core.css import purge, template_classes, used_classes
+from core import replica, storage
+from core.replica import ReplicaRouter, routing, sync_replica
+from core.management.commands.stress_sqlite_writes import run_stress
+from core.sqlite import WriteQueue, is_write, serialize_writes
+from core.thumbnail_backend import ThumbnailBackend
+from core.thumbnail_engine import Engine
+from core.thumbnail_kvstore import KVStore, thumbnail_name
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +47,604 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SQLitePragmaTests(TestCase):
+    def test_new_connection_gets_pragmas(self):
+        with connection.cursor() as cursor:
+            for name, expected in (
+                ('synchronous', 1),
+                ('busy_timeout', settings.SQLITE_PRAGMAS['busy_timeout']),
+                ('cache_size', settings.SQLITE_PRAGMAS['cache_size']),
+            ):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], expected, name)
+
+
+class WriteQueueTests(TestCase):
+    def test_threads_are_served_in_arrival_order(self):
+        queue = WriteQueue()
+        order = []
+        queue.acquire()
+        threads = []
+        for number in range(5):
+            thread = threading.Thread(
+                target=lambda number=number: (
+                    queue.acquire(), order.append(number), queue.release()
+                )
+            )
+            thread.start()
+            threads.append(thread)
+            # Следующий поток встаёт в очередь после текущего
+            while queue._next_ticket != number + 2:
+                time.sleep(0.001)
+        queue.release()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+    def test_reentrant_and_timeout_skips_ticket(self):
+        queue = WriteQueue()
+        with queue:
+            with queue:
+                pass
+            waited = []
+            thread = threading.Thread(
+                target=lambda: waited.append(queue.acquire(timeout=0.01))
+            )
+            thread.start()
+            thread.join()
+        self.assertEqual(waited, [False])
+
+        # Брошенный билет пропускается, очередь не встаёт
+        self.assertTrue(queue.acquire(timeout=1))
+        queue.release()
+
+    def test_queue_is_taken_on_first_write(self):
+        queue = WriteQueue()
+        with serialize_writes(connection, queue):
+            User.objects.count()
+            self.assertIsNone(queue._owner)
+            User.objects.create(username='writer')
+            self.assertEqual(queue._owner, threading.get_ident())
+        self.assertIsNone(queue._owner)
+
+    def test_cte_is_classified_by_final_verb(self):
+        self.assertFalse(is_write('WITH ids AS (SELECT 1) SELECT * FROM ids'))
+        self.assertTrue(is_write(
+            'WITH ids(id) AS (SELECT 1) '
+            'INSERT INTO posts_group (id) SELECT id FROM ids'
+        ))
+        self.assertTrue(is_write(
+            'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) '
+            'DELETE FROM posts_group WHERE id IN (SELECT x FROM n)'
+        ))
+
+    def test_savepoints_are_not_writes(self):
+        for sql in (
+            'SAVEPOINT "s1_x1"', 'RELEASE SAVEPOINT "s1_x1"',
+            'ROLLBACK TO SAVEPOINT "s1_x1"',
+        ):
+            with self.subTest(sql=sql):
+                self.assertFalse(is_write(sql))
+
+    def test_stress_without_errors_in_tuned_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stress.sqlite3')
+            result = run_stress(
+                path, tuned=True, writers=4, operations=20, readers=1,
+            )
+            # PRAGMA поставил обработчик connection_created
+            with closing(sqlite3.connect(path)) as stress:
+                journal_mode, = stress.execute(
+                    'PRAGMA journal_mode'
+                ).fetchone()
+        self.assertEqual((result.writes, result.write_errors), (80, 0))
+        self.assertEqual(journal_mode, 'wal')
+
+    def test_stress_command_compares_modes(self):
+        out = StringIO()
+        call_command(
+            'stress_sqlite_writes', writers=2, operations=5, readers=1,
+            stdout=out,
+        )
+        self.assertIn('default', out.getvalue())
+        self.assertIn('tuned', out.getvalue())
+
+
+class WriteQueueTransactionTests(TransactionTestCase):
+    def test_queue_is_released_at_commit(self):
+        """Очередь держится до конца транзакции, а не всего блока."""
+        queue = WriteQueue()
+        with serialize_writes(connection, queue):
+            with transaction.atomic():
+                User.objects.create(username='writer')
+                self.assertEqual(queue._owner, threading.get_ident())
+            self.assertIsNone(queue._owner)
+
+            User.objects.create(username='another')
+            self.assertIsNone(queue._owner)
+
+
+class ReplicaTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = os.path.join(directory.name, 'db.sqlite3')
+        self.replica = os.path.join(directory.name, 'db.replica.sqlite3')
+
+    def test_router_sends_only_marked_post_reads_to_replica(self):
+        router = ReplicaRouter()
+        open(self.replica, 'w').close()
+        with override_settings(
+            REPLICA_DATABASE='replica', REPLICA_PATH=self.replica
+        ):
+            self.assertEqual(router.db_for_read(Post), 'default')
+            with routing(replica=True):
+                self.assertEqual(router.db_for_read(Post), 'replica')
+                self.assertEqual(router.db_for_read(User), 'default')
+                self.assertEqual(router.db_for_write(Post), 'default')
+            with routing(pinned=True), routing(replica=True):
+                self.assertEqual(router.db_for_read(Post), 'default')
+            os.remove(self.replica)
+            replica._snapshots.clear()
+            with routing(replica=True):
+                self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+
+    def test_sync_replaces_replica_atomically(self):
+        primary = sqlite3.connect(self.source, isolation_level=None)
+        primary.execute('PRAGMA journal_mode = WAL')
+        primary.execute('CREATE TABLE post (text TEXT)')
+        primary.execute("INSERT INTO post VALUES ('первый')")
+        sync_replica(self.source, self.replica)
+        reader = sqlite3.connect(f'file:{self.replica}?mode=ro', uri=True)
+        primary.execute("INSERT INTO post VALUES ('второй')")
+
+        self.assertEqual(sync_replica(self.source, self.replica), 2)
+        # Старое соединение дочитывает прежнюю копию, новое видит свежую
+        self.assertEqual(
+            reader.execute('SELECT count(*) FROM post').fetchone(), (1,)
+        )
+        fresh = sqlite3.connect(f'file:{self.replica}?mode=ro', uri=True)
+        self.assertEqual(
+            fresh.execute('SELECT count(*) FROM post').fetchone(), (2,)
+        )
+        for each in (primary, reader, fresh):
+            each.close()
+
+    def test_router_checks_replica_file_once_per_interval(self):
+        router = ReplicaRouter()
+        open(self.replica, 'w').close()
+        with override_settings(
+            REPLICA_DATABASE='replica', REPLICA_PATH=self.replica
+        ), routing(replica=True), mock.patch(
+            'core.replica.os.path.getmtime', wraps=os.path.getmtime
+        ) as getmtime:
+            for _ in range(10):
+                self.assertEqual(router.db_for_read(Post), 'replica')
+        self.assertEqual(getmtime.call_count, 1)
+
+    def test_command_skips_copy_of_unchanged_database(self):
+        primary = sqlite3.connect(self.source, isolation_level=None)
+        self.addCleanup(primary.close)
+        primary.execute('CREATE TABLE post (text TEXT)')
+        out = StringIO()
+        # Проход без изменений, запись, затем остановка цикла
+        actions = iter([
+            lambda: None,
+            lambda: primary.execute("INSERT INTO post VALUES ('пост')"),
+        ])
+
+        def sleep(seconds):
+            action = next(actions, None)
+            if action is None:
+                raise KeyboardInterrupt
+            action()
+
+        database = mock.patch.dict(connection.settings_dict, NAME=self.source)
+        with override_settings(REPLICA_PATH=self.replica), database, \
+                mock.patch('time.sleep', sleep):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('sync_replica', loop=True, stdout=out)
+
+        self.assertEqual(out.getvalue().count('Реплика обновлена'), 2)
+        self.assertEqual(out.getvalue().count('копия не нужна'), 1)
+
+    def test_own_write_pins_reads_to_primary(self):
+        user = User.objects.create_user(username='writer')
+        post = Post.objects.create(author=user, text='Текст')
+        self.client.force_login(user)
+        # Файла реплики нет, поэтому чтение идёт в основную базу
+        with override_settings(
+            REPLICA_DATABASE='replica', REPLICA_PATH=self.replica
+        ):
+            response = self.client.get(reverse('posts:index'))
+            self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+            response = self.client.post(
+                reverse('posts:add_comment', args=[post.pk]),
+                {'text': 'Комментарий'},
+            )
+
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+
+class StaticPipelineTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        source = os.path.join(directory.name, 'static')
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as css:
+            css.write('body { margin: 0; }\n' * 200)
+        with open(os.path.join(source, 'robots.txt'), 'w') as robots:
+            robots.write('User-agent: *\n')
+        settings_override = override_settings(
+            STATICFILES_DIRS=[source],
+            STATIC_ROOT=os.path.join(directory.name, 'collected'),
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'
+            ],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed = static('css/site.css')[len(settings.STATIC_URL):]
+
+    def get(self, name, **headers):
+        response = self.client.get(settings.STATIC_URL + name, **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_collectstatic_fingerprints_and_compresses(self):
+        self.assertRegex(self.hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        path = os.path.join(settings.STATIC_ROOT, self.hashed)
+        with open(path, 'rb') as original, \
+                gzip.open(path + '.gz') as compressed:
+            self.assertEqual(compressed.read(), original.read())
+        # Мелкий файл сжимать невыгодно
+        self.assertFalse(os.path.exists(
+            os.path.join(settings.STATIC_ROOT, 'robots.txt.gz')
+        ))
+
+    def test_hashed_file_is_immutable_and_precompressed(self):
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            b'body { margin: 0; }\n' * 200,
+        )
+        plain = self.get(self.hashed)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+    @skipIf(storage.brotli is None, 'brotli не установлен')
+    def test_brotli_sibling_is_served_for_br(self):
+        path = os.path.join(settings.STATIC_ROOT, self.hashed)
+        with open(path, 'rb') as original, open(path + '.br', 'rb') as br:
+            self.assertEqual(
+                storage.brotli.decompress(br.read()), original.read()
+            )
+
+        response = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(
+            storage.brotli.decompress(b''.join(response.streaming_content)),
+            b'body { margin: 0; }\n' * 200,
+        )
+
+    def test_unhashed_file_is_revalidated(self):
+        response = self.get('robots.txt')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+        not_modified = self.get(
+            'robots.txt', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_missing_file_falls_through(self):
+        self.assertEqual(self.get('css/missing.css').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+        # Без манифеста ссылка остаётся без хэша
+        self.assertEqual(
+            static('css/missing.css'), settings.STATIC_URL + 'css/missing.css'
+        )
+
+
+class PurgeCSSTests(TestCase):
+    def test_template_classes_include_branches_and_filters(self):
+        source = (
+            '<a class="nav-link {% if active %}active{% else %}'
+            'text-muted{% endif %} {{ extra }}">'
+            "<p class='{% firstof style \'lead\' %}'>"
+            "{{ field|addclass:'form-control wide' }}"
+        )
+        self.assertEqual(
+            template_classes(source),
+            {'nav-link', 'active', 'text-muted', 'lead', 'form-control',
+             'wide'},
+        )
+
+    def test_every_template_class_survives_purge(self):
+        classes = used_classes()
+        self.assertIn('nav-link', classes)
+        css = ''.join(
+            f'.{name}{{color:red}}@media (min-width:576px)'
+            f'{{.{name}:hover,.unused-{name}{{color:blue}}}}'
+            for name in sorted(classes)
+        ) + '.never-used{color:red}.btn:not(.unused){cursor:pointer}'
+
+        purged = purge(css, classes)
+
+        for name in classes:
+            with self.subTest(name=name):
+                self.assertIn(f'.{name}{{', purged)
+                self.assertIn(f'.{name}:hover{{', purged)
+        self.assertNotIn('never-used', purged)
+        self.assertNotIn('.unused-', purged)
+        self.assertIn('.btn:not(.unused)', purged)
+
+    def test_command_writes_purged_and_critical_css(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        os.makedirs(os.path.join(directory.name, 'css'))
+        with open(os.path.join(
+            directory.name, settings.PURGE_CSS_SOURCE
+        ), 'w') as stylesheet:
+            stylesheet.write(
+                'body{margin:0}.navbar{display:flex}.card{border:1px}'
+                '.carousel{display:none}'
+            )
+        out = StringIO()
+        with override_settings(STATICFILES_DIRS=[directory.name]):
+            call_command('purge_css', stdout=out)
+            cache.clear()
+            response = self.client.get(reverse('posts:index'))
+
+        self.assertIn('bootstrap.purged.css', out.getvalue())
+        self.assertIn('%)', out.getvalue())
+        with open(os.path.join(
+            directory.name, settings.PURGE_CSS_OUTPUT
+        )) as purged, open(os.path.join(
+            directory.name, settings.CRITICAL_CSS
+        )) as critical:
+            self.assertNotIn('carousel', purged.read())
+            # Карточки постов — ниже первого экрана
+            self.assertEqual(
+                critical.read(), 'body{margin:0}\n.navbar{display:flex}'
+            )
+        self.assertContains(response, '<style>body{margin:0}')
+        self.assertContains(response, 'css/bootstrap.purged.css')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_get_set_and_delete(self):
+        self.cache.set('key', {'value': [1, 2]})
+
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.assertTrue(self.cache.has_key('key'))
+
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_get_many_and_set_many(self):
+        self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+
+        self.assertEqual(
+            self.cache.get_many(['a', 'c', 'missing']), {'a': 1, 'c': 3}
+        )
+
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': 3})
+
+    def test_timeouts(self):
+        """Просроченные записи не возвращаются, touch продлевает жизнь."""
+        self.cache.set('short', 1, timeout=10)
+        self.cache.set('forever', 2, timeout=None)
+        self.cache.set('touched', 3, timeout=10)
+        self.cache.touch('touched', timeout=100)
+
+        with mock.patch('time.time', return_value=time.time() + 50):
+            self.assertIsNone(self.cache.get('short'))
+            self.assertEqual(self.cache.get('forever'), 2)
+            self.assertEqual(self.cache.get('touched'), 3)
+            self.assertTrue(self.cache.add('short', 4))
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 10))
+
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_shared_between_instances(self):
+        """Два экземпляра (как два воркера) видят один и тот же кэш."""
+        other = self.make_cache()
+
+        self.cache.set('shared', 'value')
+
+        self.assertEqual(other.get('shared'), 'value')
+        other.clear()
+        self.assertIsNone(self.cache.get('shared'))
+
+    def test_evicts_least_recently_used_entries(self):
+        """При превышении MAX_ENTRIES вытесняются давно не читанные."""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, ACCESS_GRANULARITY=0
+        )
+        for number, key in enumerate('abc'):
+            with mock.patch('time.time', return_value=1000 + number):
+                cache.set(key, key, timeout=None)
+        with mock.patch('time.time', return_value=1010):
+            cache.get('a')
+        with mock.patch('time.time', return_value=1020):
+            cache.set('d', 'd', timeout=None)
+
+        self.assertEqual(
+            cache.get_many('abcd'), {'a': 'a', 'c': 'c', 'd': 'd'}
+        )
+
+    def test_size_cap(self):
+        cache = self.make_cache(MAX_SIZE=3000)
+
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 1000)
+
+        self.assertLessEqual(cache.stats()['size'], 3000)
+        self.assertEqual(cache.get('key9'), 'x' * 1000)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailKVStoreTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.names = []
+        for number in range(3):
+            buffer = BytesIO()
+            Image.new('RGB', (100, 50), 'red').save(buffer, 'JPEG')
+            name = default_storage.save(
+                f'posts/kv{number}.jpg', ContentFile(buffer.getvalue())
+            )
+            get_thumbnail(name, '20x10', crop='center')
+            self.names.append(name)
+        cache.clear()
+
+    def test_prefetch_loads_page_in_one_query(self):
+        """Миниатюры страницы выбираются одним запросом, затем из LRU."""
+        store = KVStore()
+        thumbnails = [
+            thumbnail_name(name, '20x10', crop='center')
+            for name in self.names
+        ]
+
+        with self.assertNumQueries(1):
+            store.prefetch(thumbnails)
+        with mock.patch.object(default, 'kvstore', store):
+            with self.assertNumQueries(0):
+                for name in self.names:
+                    get_thumbnail(name, '20x10', crop='center')
+
+        self.assertEqual(store.stats()['db'], 3)
+        self.assertEqual(store.stats()['lru'], 3)
+
+    def test_prefetch_uses_shared_cache(self):
+        thumbnails = [
+            thumbnail_name(name, '20x10', crop='center')
+            for name in self.names + ['posts/missing.jpg']
+        ]
+        KVStore().prefetch(thumbnails)
+        store = KVStore()
+
+        with self.assertNumQueries(0):
+            store.prefetch(thumbnails)
+
+        self.assertEqual(store.stats()['cache'], 4)
+
+    def test_miss_is_not_kept_in_lru(self):
+        """Миниатюры, построенные другим процессом, видны сразу."""
+        key = add_prefix('thumbnail-built-elsewhere')
+        store = KVStore()
+        self.assertIsNone(store._get_raw(key))
+
+        KVStore()._set_raw(key, '{"name": "built.jpg"}')
+
+        self.assertEqual(store._get_raw(key), '{"name": "built.jpg"}')
+
+
+def make_jpeg_file(size=(2000, 1000)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+class ThumbnailEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.options = dict(default.backend.default_options)
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        """Для маленькой миниатюры JPEG декодируется сразу в 1/8."""
+        engine = Engine()
+        image = engine.get_image(make_jpeg_file())
+
+        engine.draft(image, [((200, 100), self.options)])
+        image.load()
+
+        self.assertEqual(image.size, (250, 125))
+
+    def test_thumbnail_matches_stock_engine_size(self):
+        for engine in (PILEngine(), Engine()):
+            with self.subTest(engine=type(engine).__module__):
+                image = engine.get_image(make_jpeg_file())
+
+                thumbnail = engine.create(
+                    image, (320, 113), {**self.options, 'crop': 'center'}
+                )
+
+                self.assertEqual(thumbnail.size, (320, 113))
+
+    def test_large_target_is_not_drafted(self):
+        engine = Engine()
+        image = engine.get_image(make_jpeg_file())
+
+        engine.draft(image, [((1500, 750), self.options)])
+        image.load()
+
+        self.assertEqual(image.size, (2000, 1000))
+
+
+class ThumbnailBackendTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(dir=settings.BASE_DIR)
+        self.addCleanup(directory.cleanup)
+        media = self.settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        self.name = default_storage.save('posts/big.jpg', make_jpeg_file())
+        self.specs = [
+            ('320x113', {'crop': 'center'}),
+            ('960x339', {'crop': 'center'}),
+        ]
+
+    def test_all_sizes_from_one_decode(self):
+        """Все варианты строятся из одного декодированного исходника."""
+        backend = ThumbnailBackend()
+
+        with mock.patch.object(
+            default.engine, 'get_image', wraps=default.engine.get_image
+        ) as get_image:
+            thumbnails = backend.get_thumbnails(self.name, self.specs)
+            backend.get_thumbnails(self.name, self.specs)
+
+        self.assertEqual(get_image.call_count, 1)
+        self.assertEqual(
+            [(thumbnail.x, thumbnail.y) for thumbnail in thumbnails],
+            [(320, 113), (960, 339)],
+        )
+        self.assertEqual(
+            thumbnails[1].name,
+            thumbnail_name(self.name, '960x339', crop='center'),
+        )
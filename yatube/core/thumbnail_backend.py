@@ -0,0 +1,79 @@
+"""Бэкенд sorl.thumbnail с пакетным построением миниатюр.
+
+get_thumbnail() читает и декодирует исходник заново для каждого размера.
+get_thumbnails() строит все недостающие варианты картинки из одного
+декодированного исходника — в масштабе самого крупного из них.
+"""
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as SorlThumbnailBackend
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import toint
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from .thumbnail_kvstore import thumbnail_options
+
+
+class ThumbnailBackend(SorlThumbnailBackend):
+    def get_thumbnails(self, file_, specs):
+        """Миниатюры file_ для каждой пары (geometry_string, options)."""
+        source = ImageFile(file_)
+        thumbnails = []
+        missing = []
+        jobs = []
+        for geometry_string, options in specs:
+            options = thumbnail_options(source, options)
+            thumbnail = ImageFile(
+                self._get_thumbnail_filename(source, geometry_string, options),
+                default.storage,
+            )
+            cached = default.kvstore.get(thumbnail)
+            if cached:
+                thumbnails.append(cached)
+                continue
+            thumbnails.append(thumbnail)
+            missing.append(thumbnail)
+            if (thumbnail_settings.THUMBNAIL_FORCE_OVERWRITE
+                    or not thumbnail.exists()):
+                jobs.append((geometry_string, options, thumbnail))
+        if jobs:
+            self._create_thumbnails(source, jobs)
+        if missing:
+            default.kvstore.get_or_set(source)
+        for thumbnail in missing:
+            default.kvstore.set(thumbnail, source)
+        return thumbnails
+
+    def _create_thumbnails(self, source, jobs):
+        engine = default.engine
+        source_image = engine.get_image(source)
+        try:
+            image_info = engine.get_image_info(source_image)
+            source.set_size(engine.get_image_size(source_image))
+            draft = getattr(engine, 'draft', None)
+            if draft is not None:
+                draft(source_image, [
+                    (self._largest_geometry(
+                        geometry_string,
+                        engine.get_image_ratio(source_image, options),
+                    ), options)
+                    for geometry_string, options, _ in jobs
+                ])
+            for geometry_string, options, thumbnail in jobs:
+                options['image_info'] = image_info
+                self._create_thumbnail(
+                    source_image, geometry_string, options, thumbnail
+                )
+                self._create_alternative_resolutions(
+                    source_image, geometry_string, options, thumbnail.name
+                )
+        finally:
+            engine.cleanup(source_image)
+
+    @staticmethod
+    def _largest_geometry(geometry_string, ratio):
+        x, y = parse_geometry(geometry_string, ratio)
+        resolution = max(
+            (1, *thumbnail_settings.THUMBNAIL_ALTERNATIVE_RESOLUTIONS)
+        )
+        return toint(x * resolution), toint(y * resolution)
@@ -0,0 +1,73 @@
+"""Движок sorl.thumbnail с уменьшенным декодированием JPEG.
+
+Штатный PIL-движок полностью декодирует исходник, даже если из 4000px
+фотографии нужна карточка шириной 320px. Здесь до загрузки пикселей
+вызывается Image.draft(): декодер JPEG сразу отдаёт картинку в масштабе
+1/2, 1/4 или 1/8, но не меньше DRAFT_GAP размеров самой крупной нужной
+миниатюры. Дальше resize() сначала уменьшает картинку в целое число раз
+через reduce() и только последние REDUCING_GAP раза сглаживает фильтром.
+"""
+import math
+
+from PIL import Image
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.engines.pil_engine import Engine as PILEngine
+
+# Масштабирование в декодере JPEG само усредняет блоки DCT, поэтому
+# декодированной картинке достаточно быть не меньше миниатюры
+DRAFT_GAP = 1.0
+REDUCING_GAP = 2.0
+
+
+class Engine(PILEngine):
+    def create(self, image, geometry, options):
+        # Первый вызов для исходника задаёт масштаб и для миниатюр
+        # повышенного разрешения, которые sorl строит из него же
+        resolutions = (
+            1, *thumbnail_settings.THUMBNAIL_ALTERNATIVE_RESOLUTIONS
+        )
+        self.draft(image, [
+            ((geometry[0] * resolution, geometry[1] * resolution), options)
+            for resolution in resolutions
+        ])
+        return super().create(image, geometry, options)
+
+    def draft(self, image, targets):
+        """Уменьшить декодирование image под самую крупную из targets.
+
+        targets — пары (geometry, options) с уже разобранной геометрией.
+        Картинка, пиксели которой уже загружены, не меняется.
+        """
+        if image.format != 'JPEG' or any(
+            options['cropbox'] for _, options in targets
+        ):
+            return
+        x_image, y_image = map(float, self.get_image_size(image))
+        if self.flip_dimensions(image):
+            x_image, y_image = y_image, x_image
+        factor = max(
+            self._calculate_scaling_factor(x_image, y_image, geometry, options)
+            for geometry, options in targets
+        ) * DRAFT_GAP
+        if factor >= 1:
+            return
+        # Коэффициент один для обеих осей, поэтому поворот по EXIF
+        # на размер запроса не влияет
+        x_raw, y_raw = self.get_image_size(image)
+        image.draft(
+            image.mode, (math.ceil(x_raw * factor), math.ceil(y_raw * factor))
+        )
+
+    def colorspace(self, image, geometry, options):
+        # Штатный движок копирует RGB-картинку через convert('RGB'). Копия
+        # нужна, только если дальше картинка меняется на месте (rounded).
+        if (options['colorspace'] == 'RGB' and image.mode == 'RGB'
+                and not options.get('rounded')):
+            return image
+        return super().colorspace(image, geometry, options)
+
+    def _scale(self, image, width, height):
+        return image.resize(
+            (width, height), resample=Image.ANTIALIAS,
+            reducing_gap=REDUCING_GAP,
+        )
@@ -0,0 +1,144 @@
+"""Хранилище ключей sorl.thumbnail с пакетной предвыборкой.
+
+Штатный cached_db KVStore ходит в кэш (и при промахе — в базу) отдельно
+для каждого тега {% thumbnail %}. Здесь перед общим кэшем стоит LRU в
+памяти процесса, а prefetch() загружает записи всех миниатюр страницы
+одним get_many и одним запросом к базе для оставшихся промахов.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+def thumbnail_options(source, options):
+    """Опции миниатюры с умолчаниями — так же, как в get_thumbnail()."""
+    options = dict(options)
+    backend = default.backend
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_name(file_, geometry_string, **options):
+    """Имя файла миниатюры — так же, как его вычисляет get_thumbnail()."""
+    source = ImageFile(file_)
+    return default.backend._get_thumbnail_filename(
+        source, geometry_string, thumbnail_options(source, options)
+    )
+
+
+class KVStore(CachedDBKVStore):
+    def __init__(self):
+        super().__init__()
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def stats(self):
+        """Счётчики попаданий: lru, cache, db и промахи (miss)."""
+        return dict(self.counters)
+
+    def prefetch(self, names):
+        """Загрузить записи миниатюр с именами names одним заходом."""
+        raw_keys = [
+            add_prefix(ImageFile(name, default.storage).key)
+            for name in names
+        ]
+        missing = [key for key in raw_keys if self._lru_get(key) is None]
+        if not missing:
+            return
+        values = self.cache.get_many(missing)
+        self.counters['cache'] += len(values)
+        rest = [key for key in missing if key not in values]
+        if rest:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=rest
+            ).values_list('key', 'value'))
+            self.counters['db'] += len(found)
+            self.counters['miss'] += len(rest) - len(found)
+            fetched = {key: found.get(key, EMPTY_VALUE) for key in rest}
+            self.cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        for key, value in values.items():
+            self._lru_set(key, value)
+
+    def _get_raw(self, key):
+        value = self._lru_get(key)
+        if value is not None:
+            self.counters['lru'] += 1
+        else:
+            value = self.cache.get(key)
+            if value is not None:
+                self.counters['cache'] += 1
+            else:
+                try:
+                    value = KVStoreModel.objects.get(key=key).value
+                    self.counters['db'] += 1
+                except KVStoreModel.DoesNotExist:
+                    value = EMPTY_VALUE
+                    self.counters['miss'] += 1
+                self.cache.set(
+                    key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+                )
+            self._lru_set(key, value)
+        if value == EMPTY_VALUE:
+            return None
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._lru_set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        with self._lock:
+            for key in keys:
+                self._lru.pop(key, None)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        with self._lock:
+            self._lru.clear()
+
+    def _lru_get(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return value
+
+    def _lru_set(self, key, value):
+        # Промахи в LRU не держим: миниатюры может построить другой
+        # процесс, и его запись видна только через общий кэш
+        if value == EMPTY_VALUE:
+            return
+        expires = time.monotonic() + settings.THUMBNAIL_LRU_TIMEOUT
+        with self._lock:
+            self._lru[key] = (expires, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > settings.THUMBNAIL_LRU_SIZE:
+                self._lru.popitem(last=False)
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from .models import Post, Group, Comment
+from .search import filter_queryset
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -14,6 +15,14 @@ class PostAdmin(admin.ModelAdmin):
     # Это свойство сработает для всех колонок: где пусто — там будет эта строка
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по FTS5-индексу (с шардами — в каждом), а не LIKE по таблице
+        if not search_term:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return filter_queryset(queryset, search_term), False
+
 
 # При регистрации модели Post источником конфигурации для неё назначаем
 # класс PostAdmin
@@ -0,0 +1,249 @@
+"""Автодополнение имён авторов и групп.
+
+Процесс держит в памяти отсортированный список ключей: логины, полные
+имена и названия групп в нижнем регистре, а для имён и названий ещё и
+хвосты с начала каждого слова («петров» для «Иван Петров»). Префикс
+ищется бинарным поиском через bisect, так что запрос к БД на каждое
+нажатие клавиши не нужен.
+
+Сигналы User и Group после коммита дописывают изменение одной записи
+в журнал в общем кэше: номер изменения выдаёт cache.incr. Процесс,
+заметивший новые номера, применяет их к своему индексу без запросов
+к БД. Целиком по таблицам индекс строится при первом обращении, при
+смене поколения NAMESPACE и если журнал не удаётся дочитать.
+"""
+import bisect
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from . import page_cache
+from .models import Group, User
+
+NAMESPACE = 'autocomplete'
+SEQUENCE_KEY = 'autocomplete:sequence'
+CHANGE_KEY = 'autocomplete:change:{}'
+# Журнал длиннее этого дешевле перестроить, чем дочитывать
+MAX_REPLAY = 1000
+CHANGE_TIMEOUT = 60 * 60
+# Символ больше любого в ключах: верхняя граница диапазона префикса
+SENTINEL = '\U0010ffff'
+
+_index = None
+
+
+class Entry:
+    __slots__ = ('kind', 'value', 'label')
+
+    def __init__(self, kind, value, label):
+        self.kind = kind
+        self.value = value
+        self.label = label
+
+    def url(self):
+        if self.kind == 'user':
+            return reverse('posts:profile', args=[self.value])
+        return reverse('posts:group_list', args=[self.value])
+
+    def as_dict(self):
+        return {
+            'type': self.kind,
+            'value': self.value,
+            'label': self.label,
+            'url': self.url(),
+        }
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def _word_suffixes(text):
+    """Сам текст и его хвосты, начинающиеся с каждого следующего слова."""
+    words = normalize(text).split(' ')
+    return {' '.join(words[start:]) for start in range(len(words))} - {''}
+
+
+class PrefixIndex:
+    """Индекс: отсортированный список (ключ, вид, значение, запись).
+
+    Вид и значение делают элементы уникальными, так что записи между
+    собой не сравниваются. items — ключи каждой записи, чтобы убрать её
+    точечно. sequence — номер последнего изменения журнала, учтённого
+    в индексе. Изменения и поиск идут под блокировкой индекса.
+    """
+
+    def __init__(self, generation, items, sequence=0):
+        self.generation = generation
+        self.sequence = sequence
+        self.lock = threading.Lock()
+        self.items = {
+            (entry.kind, entry.value): (entry, keys) for entry, keys in items
+        }
+        self.pairs = sorted(
+            (
+                (key, entry.kind, entry.value, entry)
+                for entry, keys in items for key in keys
+            ),
+            key=lambda pair: pair[:3],
+        )
+
+    def search(self, prefix, limit):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        with self.lock:
+            start = bisect.bisect_left(self.pairs, (prefix,))
+            stop = bisect.bisect_left(
+                self.pairs, (prefix + SENTINEL,), lo=start
+            )
+            for *_, entry in self.pairs[start:stop]:
+                # Автор может совпасть и по логину, и по имени
+                if entry in seen:
+                    continue
+                seen.add(entry)
+                found.append(entry)
+                if len(found) == limit:
+                    break
+        return found
+
+    def apply(self, changes, sequence):
+        """Применить изменения журнала с номерами до sequence включительно.
+
+        changes идут подряд и заканчиваются номером sequence, изменение —
+        (вид, прежнее значение, новая запись или None), см. user_changed
+        и group_changed. Уже учтённые номера пропускаются. False, если
+        между учтёнными и changes есть пропуск.
+        """
+        first = sequence - len(changes) + 1
+        with self.lock:
+            if first > self.sequence + 1:
+                return False
+            for kind, previous, item in changes[self.sequence + 1 - first:]:
+                self._remove(kind, previous)
+                if item is not None:
+                    value, label, keys = item
+                    self._remove(kind, value)
+                    self._add(Entry(kind, value, label), keys)
+            self.sequence = max(self.sequence, sequence)
+        return True
+
+    def _add(self, entry, keys):
+        self.items[entry.kind, entry.value] = entry, keys
+        for key in keys:
+            bisect.insort(self.pairs, (key, entry.kind, entry.value, entry))
+
+    def _remove(self, kind, value):
+        found = self.items.pop((kind, value), None)
+        if found is None:
+            return
+        for key in found[1]:
+            del self.pairs[bisect.bisect_left(self.pairs, (key, kind, value))]
+
+
+def _user_item(username, first_name, last_name):
+    full_name = f'{first_name} {last_name}'.strip()
+    label = f'{full_name} ({username})' if full_name else username
+    return username, label, {normalize(username)} | _word_suffixes(full_name)
+
+
+def _group_item(slug, title):
+    return slug, title, {normalize(slug)} | _word_suffixes(title)
+
+
+def build(generation, sequence=0):
+    items = []
+    users = User.objects.values_list('username', 'first_name', 'last_name')
+    groups = Group.objects.values_list('slug', 'title')
+    for kind, rows, make_item in (
+        ('user', users, _user_item), ('group', groups, _group_item)
+    ):
+        for row in rows.iterator():
+            value, label, keys = make_item(*row)
+            items.append((Entry(kind, value, label), keys))
+    return PrefixIndex(generation, items, sequence)
+
+
+def _replay(index, sequence):
+    """Дочитать журнал до sequence; False, если его не хватает."""
+    if not 0 <= sequence - index.sequence <= MAX_REPLAY:
+        return False
+    keys = [
+        CHANGE_KEY.format(number)
+        for number in range(index.sequence + 1, sequence + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) < len(keys):
+        return False
+    return index.apply([changes[key] for key in keys], sequence)
+
+
+def get_index():
+    """Индекс с учётом журнала; перестраивается, если поколение сменилось
+    или журнал не дочитать.
+    """
+    global _index
+    generation = page_cache.get_generations([NAMESPACE])[NAMESPACE]
+    sequence = cache.get(SEQUENCE_KEY, 0)
+    index = _index
+    if index is None or index.generation != generation:
+        index = _index = build(generation, sequence)
+    elif sequence != index.sequence and not _replay(index, sequence):
+        index = _index = build(generation, sequence)
+    return index
+
+
+def _append(change):
+    cache.add(SEQUENCE_KEY, 0, None)
+    sequence = cache.incr(SEQUENCE_KEY)
+    # Пока изменение не записано, читатель его не найдёт и перестроит
+    # индекс по уже закоммиченным таблицам
+    cache.set(CHANGE_KEY.format(sequence), change, CHANGE_TIMEOUT)
+    return sequence
+
+
+def _commit(change):
+    sequence = _append(change)
+    index = _index
+    # Свой индекс, если он не отстал от журнала, обновляется сразу;
+    # отставший дочитает журнал при следующем обращении
+    if index is not None:
+        index.apply([change], sequence)
+
+
+def _publish(change):
+    """Учесть изменение одной записи во всех процессах после коммита.
+
+    До коммита изменение не видно никому, и своему процессу тоже: иначе
+    откат транзакции оставил бы его в индексе.
+    """
+    transaction.on_commit(lambda: _commit(change))
+
+
+def user_changed(user, previous_username=None):
+    _publish(('user', previous_username or user.username, _user_item(
+        user.username, user.first_name, user.last_name
+    )))
+
+
+def user_deleted(user):
+    _publish(('user', user.username, None))
+
+
+def group_changed(group, previous_slug=None):
+    _publish((
+        'group', previous_slug or group.slug,
+        _group_item(group.slug, group.title),
+    ))
+
+
+def group_deleted(group):
+    _publish(('group', group.slug, None))
+
+
+def complete(prefix, limit):
+    return get_index().search(prefix, limit)
@@ -0,0 +1,353 @@
+"""Замер задержки представлений posts на сгенерированных данных.
+
+seed() наполняет пустую базу пользователями, группами, постами,
+подписками и комментариями пачками bulk_create, минуя сигналы, и затем
+строит производные данные: инбоксы подписок и счётчики авторов
+(поисковый индекс заполняют триггеры). Популярность авторов неравномерна:
+небольшая часть пишет и собирает подписчиков больше остальных.
+
+measure() запрашивает каждый адрес posts.urls тестовым клиентом и
+собирает время, число запросов к базе и размер ответа. Записи
+представлений откатываются, так что повторный прогон идёт на тех же
+данных.
+"""
+import random
+import statistics
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import AuthorStats, Comment, FeedEntry, Follow, Group, Post
+from .stats import count_stats
+
+User = get_user_model()
+
+DEFAULT_SIZES = {
+    'users': 1000,
+    'groups': 20,
+    'posts': 10000,
+    'follows': 20,
+    'comments': 20000,
+}
+WORDS = (
+    'утро', 'город', 'река', 'кофе', 'поезд', 'книга', 'музыка', 'лес',
+    'море', 'код', 'кошка', 'дождь', 'снег', 'горы', 'театр', 'футбол',
+    'рецепт', 'отпуск', 'работа', 'друзья', 'вечер', 'фильм', 'сад', 'мост',
+)
+# Посты и комментарии разбросаны по последнему году
+PERIOD = timedelta(days=365)
+PERCENTILES = (50, 95, 99)
+
+Target = namedtuple('Target', 'reader author post_id slug word stranger')
+Scenario = namedtuple('Scenario', 'name method login args data')
+
+# Кто входит в систему: None — аноним, 'reader' — подписчик,
+# 'author' — автор поста. args и data строятся по цели замера.
+SCENARIOS = (
+    Scenario('index', 'get', None, lambda t: [], lambda t: {}),
+    Scenario('group_list', 'get', None, lambda t: [t.slug], lambda t: {}),
+    Scenario('profile', 'get', None, lambda t: [t.author], lambda t: {}),
+    Scenario(
+        'post_detail', 'get', None, lambda t: [t.post_id], lambda t: {}
+    ),
+    Scenario(
+        'post_comments', 'get', None, lambda t: [t.post_id], lambda t: {}
+    ),
+    Scenario('search', 'get', None, lambda t: [], lambda t: {'q': t.word}),
+    Scenario(
+        'autocomplete', 'get', None,
+        lambda t: [], lambda t: {'q': t.author[:3]},
+    ),
+    Scenario('follow_index', 'get', 'reader', lambda t: [], lambda t: {}),
+    Scenario('post_create', 'get', 'reader', lambda t: [], lambda t: {}),
+    Scenario(
+        'post_edit', 'get', 'author', lambda t: [t.post_id], lambda t: {}
+    ),
+    Scenario(
+        'add_comment', 'post', 'reader',
+        lambda t: [t.post_id], lambda t: {'text': f'Ответ: {t.word}'},
+    ),
+    # Подписка и отписка на одного и того же автора возвращают данные
+    # в прежнее состояние и внутри прогона
+    Scenario(
+        'profile_follow', 'get', 'reader',
+        lambda t: [t.stranger], lambda t: {},
+    ),
+    Scenario(
+        'profile_unfollow', 'get', 'reader',
+        lambda t: [t.stranger], lambda t: {},
+    ),
+)
+
+
+def _skewed(rng, size):
+    """Индекс от 0 до size - 1, маленькие выпадают заметно чаще."""
+    return int(size * rng.random() ** 2)
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _bulk_create(model, objects, batch_size):
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            break
+        model.objects.bulk_create(batch)
+
+
+@contextmanager
+def _explicit_dates(*fields):
+    """Отключить auto_now_add, чтобы записать даты из прошлого."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _fill_inboxes():
+    """Инбоксы подписчиков: последние FEED_INBOX_LIMIT постов подписок."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedEntry._meta.db_table} '
+            f'(user_id, post_id, author_id, pub_date) '
+            f'SELECT user_id, post_id, author_id, pub_date FROM ('
+            f'SELECT follow.user_id, post.id AS post_id, post.author_id, '
+            f'post.pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY follow.user_id '
+            f'ORDER BY post.pub_date DESC, post.id DESC) AS position '
+            f'FROM {Follow._meta.db_table} AS follow '
+            f'JOIN {Post._meta.db_table} AS post '
+            f'ON post.author_id = follow.author_id'
+            f') WHERE position <= %s',
+            [settings.FEED_INBOX_LIMIT],
+        )
+
+
+def _fill_stats(user_ids, batch_size):
+    for start in range(0, len(user_ids), batch_size):
+        counts = count_stats(user_ids[start:start + batch_size])
+        AuthorStats.objects.bulk_create(
+            AuthorStats(author_id=author_id, **values)
+            for author_id, values in counts.items()
+        )
+
+
+def seed(sizes, seed=0, batch_size=1000):
+    """Наполнить пустую базу данными размеров sizes (см. DEFAULT_SIZES).
+
+    sizes['follows'] — подписок на одного пользователя. Возвращает число
+    созданных строк каждой таблицы.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    users, groups = sizes['users'], sizes['groups']
+    if users < 2:
+        raise ValueError('Нужно хотя бы два пользователя.')
+    with transaction.atomic():
+        _bulk_create(User, (
+            User(username=f'user{number}', password='!')
+            for number in range(users)
+        ), batch_size)
+        _bulk_create(Group, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'group-{number}',
+                description=_text(rng, 12),
+            )
+            for number in range(groups)
+        ), batch_size)
+        user_ids = list(
+            User.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        group_ids = list(
+            Group.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        with _explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            _bulk_create(Post, (
+                Post(
+                    author_id=user_ids[_skewed(rng, users)],
+                    group_id=(
+                        rng.choice(group_ids)
+                        if group_ids and rng.random() < 0.5 else None
+                    ),
+                    text=_text(rng, rng.randint(5, 60)),
+                    pub_date=now - PERIOD * rng.random(),
+                )
+                for _ in range(sizes['posts'])
+            ), batch_size)
+            post_ids = list(
+                Post.objects.order_by('pk').values_list('pk', flat=True)
+            )
+            if post_ids:
+                _bulk_create(Comment, (
+                    Comment(
+                        post_id=post_ids[-1 - _skewed(rng, len(post_ids))],
+                        author_id=rng.choice(user_ids),
+                        text=_text(rng, rng.randint(3, 30)),
+                        created=now - PERIOD * rng.random(),
+                    )
+                    for _ in range(sizes['comments'])
+                ), batch_size)
+        follows_per_user = min(sizes['follows'], users - 1)
+        _bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in _followed(rng, user_id, user_ids,
+                                       follows_per_user)
+        ), batch_size)
+        _fill_inboxes()
+        _fill_stats(user_ids, batch_size)
+    return {
+        model._meta.db_table: model.objects.count()
+        for model in (User, Group, Post, Comment, Follow, FeedEntry)
+    }
+
+
+def _followed(rng, user_id, user_ids, count):
+    authors = set()
+    while len(authors) < count:
+        author_id = user_ids[_skewed(rng, len(user_ids))]
+        if author_id != user_id:
+            authors.add(author_id)
+    return authors
+
+
+def targets(samples, seed=0):
+    """Цели замеров: читатель, пост с автором, группа, слово поиска и
+    автор, на которого читатель ещё не подписан.
+    """
+    rng = random.Random(seed)
+    max_post_id = Post.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first()
+    if max_post_id is None:
+        raise ValueError('В базе нет постов.')
+    slugs = list(Group.objects.values_list('slug', flat=True)) or ['']
+    user_count = User.objects.count()
+    chosen = []
+    used = set()
+    for _ in range(samples * 20):
+        if len(chosen) == samples:
+            break
+        post = Post.objects.filter(
+            pk__gte=rng.randint(1, max_post_id)
+        ).order_by('pk').values_list('pk', 'author__username').first()
+        reader = User.objects.order_by('pk')[rng.randrange(user_count)]
+        followed = reader.follower.values_list('author_id', flat=True)
+        stranger = User.objects.exclude(pk=reader.pk).exclude(
+            pk__in=followed
+        ).order_by('pk')
+        stranger = stranger[rng.randrange(stranger.count())] if (
+            stranger.exists()
+        ) else None
+        if post is None or stranger is None:
+            continue
+        if (reader.pk, stranger.pk) in used:
+            continue
+        used.add((reader.pk, stranger.pk))
+        chosen.append(Target(
+            reader=reader,
+            author=post[1],
+            post_id=post[0],
+            slug=rng.choice(slugs),
+            word=rng.choice(WORDS),
+            stranger=stranger.username,
+        ))
+    if len(chosen) < samples:
+        raise ValueError('Не хватает пользователей для стольких замеров.')
+    return chosen
+
+
+def percentile(samples, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
+
+
+def measure(chosen, scenarios=SCENARIOS, warm=False):
+    """Прогнать сценарии по целям chosen и собрать сводку по каждому.
+
+    Без warm кэш очищается перед каждым запросом (вне замера), то есть
+    меряется работа с базой. Все записи представлений откатываются.
+    """
+    results = {}
+    with transaction.atomic():
+        for scenario in scenarios:
+            timings, queries, sizes = [], [], []
+            for target in chosen:
+                client = Client()
+                if scenario.login == 'reader':
+                    client.force_login(target.reader)
+                elif scenario.login == 'author':
+                    client.force_login(User.objects.get(
+                        username=target.author
+                    ))
+                url = reverse(f'posts:{scenario.name}',
+                              args=scenario.args(target))
+                data = scenario.data(target)
+                if not warm:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = getattr(client, scenario.method)(url, data)
+                    elapsed = time.perf_counter() - started
+                if response.status_code >= 400:
+                    raise RuntimeError(
+                        f'{scenario.name}: {url} вернул '
+                        f'{response.status_code}'
+                    )
+                timings.append(elapsed * 1000)
+                queries.append(len(context.captured_queries))
+                sizes.append(len(response.content))
+            results[scenario.name] = {
+                **{
+                    f'p{percent}': round(percentile(timings, percent), 2)
+                    for percent in PERCENTILES
+                },
+                'queries': round(statistics.mean(queries), 1),
+                'bytes': round(statistics.mean(sizes)),
+            }
+        transaction.set_rollback(True)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Ухудшения относительно baseline: [(сценарий, метрика, было, стало)].
+
+    Задержка p95 и размер ответа сравниваются с допуском tolerance
+    (доля), число запросов — точно.
+    """
+    found = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, allowed in (
+            ('p95', previous.get('p95', 0) * (1 + tolerance)),
+            ('bytes', previous.get('bytes', 0) * (1 + tolerance)),
+            ('queries', previous.get('queries', 0)),
+        ):
+            if metric in previous and current[metric] > allowed:
+                found.append((name, metric, previous[metric],
+                              current[metric]))
+    return found
@@ -0,0 +1,61 @@
+"""Счётчики ссылок на файлы картинок постов.
+
+Картинки лежат под хэшем содержимого (core.storage), и один файл может
+принадлежать многим постам. Файл, его варианты и миниатюры удаляются,
+только когда уходит последний ссылающийся на него пост.
+"""
+import logging
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from sorl.thumbnail import delete as delete_thumbnails
+
+from .models import ImageBlob
+from .uploads import delete_variants
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name):
+    """Учесть ещё одну ссылку на файл."""
+    if not name:
+        return
+    if ImageBlob.objects.filter(name=name).update(
+        references=F('references') + 1
+    ):
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, references=1)
+    except IntegrityError:
+        # Запись успел создать параллельный запрос
+        ImageBlob.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def release(name):
+    """Снять ссылку; за последней ссылкой удалить и сам файл."""
+    if not name:
+        return
+    ImageBlob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    deleted, _ = ImageBlob.objects.filter(name=name, references=0).delete()
+    if deleted:
+        # Файлы удаляются после фиксации: при откате пост снова на них
+        # ссылается
+        transaction.on_commit(partial(_delete_files, name))
+
+
+def _delete_files(name):
+    # Пока транзакция фиксировалась, те же байты могли загрузить снова
+    if ImageBlob.objects.filter(name=name).exists():
+        return
+    # Ошибка уборки не должна ронять запрос, удаливший пост
+    try:
+        delete_thumbnails(name)
+        delete_variants(name)
+    except Exception:
+        logger.exception('Не удалось удалить файлы картинки %s', name)
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import connections, router
+
+from .models import FeedEntry, Follow, Post
+
+
+def fan_out_post(post):
+    """Разложить новый пост во входящие ленты подписчиков автора.
+
+    Длина ленты ограничивается здесь же, при записи: ленты тех, кто их не
+    читает, тоже не должны расти сверх FEED_INBOX_LIMIT.
+    """
+    subscriptions = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    followers = list(subscriptions)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ),
+        ignore_conflicts=True,
+    )
+    if followers:
+        trim_inboxes(subscriptions)
+
+
+def backfill_inbox(user_id, author_id):
+    """Добавить в ленту подписчика последние посты нового автора."""
+    recent = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.FEED_INBOX_BACKFILL]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in recent
+        ),
+        ignore_conflicts=True,
+    )
+    trim_inbox(user_id)
+
+
+def prune_inbox(user_id, author_id):
+    """Убрать из ленты подписчика посты автора, от которого он отписался."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def trim_inbox(user_id):
+    """Оставить в ленте не больше FEED_INBOX_LIMIT самых свежих записей."""
+    boundary = FeedEntry.objects.filter(user_id=user_id).values_list(
+        'pub_date', 'post_id'
+    )[settings.FEED_INBOX_LIMIT:settings.FEED_INBOX_LIMIT + 1]
+    for pub_date, post_id in boundary:
+        FeedEntry.objects.filter(user_id=user_id).filter(
+            pub_date__lte=pub_date
+        ).exclude(pub_date=pub_date, post_id__gt=post_id).delete()
+
+
+def trim_inboxes(user_ids):
+    """То же, что trim_inbox, для всех лент из подзапроса user_ids.
+
+    Одна команда DELETE на любое число подписчиков: место записи в ленте
+    считает оконная функция.
+    """
+    table = FeedEntry._meta.db_table
+    subquery, params = user_ids.query.sql_with_params()
+    database = router.db_for_write(FeedEntry)
+    with connections[database].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM ('
+            f'SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+            f') AS position FROM {table} WHERE user_id IN ({subquery})'
+            f') WHERE position > %s)',
+            [*params, settings.FEED_INBOX_LIMIT],
+        )
+
+
+def inbox_entries(user):
+    return FeedEntry.objects.filter(user=user).only('post', 'pub_date')
@@ -1,9 +1,15 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
 
 from .models import Post, Comment
+from .uploads import normalize_image, store_variants
 
 
 class PostForm(forms.ModelForm):
+    # Результат нормализации новой картинки, см. clean_image
+    normalized_image = None
+
     class Meta:
         # На основе какой модели создаётся класс формы
         model = Post
@@ -21,6 +27,26 @@ class PostForm(forms.ModelForm):
         # даже если не изменил их
         return data
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Нормализуем только новую загрузку, а не уже сохранённый файл
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            self.normalized_image = normalize_image(image)
+        except Image.DecompressionBombError:
+            raise forms.ValidationError('Картинка слишком большая')
+        except (OSError, ValueError):
+            raise forms.ValidationError('Не удалось обработать картинку')
+        return self.normalized_image.master
+
+    def save_image_variants(self):
+        """Записать варианты картинки рядом с сохранённым мастером."""
+        if self.normalized_image is not None and self.instance.image:
+            store_variants(
+                self.instance.image.name, self.normalized_image.variants
+            )
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,66 @@
+"""Кэш отрисованных карточек постов.
+
+Ключ карточки строится из шаблона, id поста и версии — отпечатка всех
+полей, которые выводит карточка (текст, дата, картинка, имя автора,
+группа). Любое их изменение даёт новый ключ, поэтому старые фрагменты
+не нужно удалять: они просто вытесняются из кэша по времени жизни.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .thumbnails import prefetch_thumbnails, thumbnails_ready
+
+CARD_KEY = 'post_card:{template}:{pk}:{version}'
+
+
+def card_version(post):
+    author = post.author
+    group = post.group
+    fields = (
+        post.text,
+        post.pub_date.isoformat(),
+        str(post.image),
+        author.username,
+        author.get_full_name(),
+        group.slug if group else '',
+        group.title if group else '',
+    )
+    return hashlib.md5('\x1f'.join(fields).encode()).hexdigest()
+
+
+def card_key(post, template_name):
+    return CARD_KEY.format(
+        template=template_name, pk=post.pk, version=card_version(post)
+    )
+
+
+def render_cards(posts, template_name):
+    """Пары (пост, html) для страницы: один get_many, рендер только промахов.
+    """
+    posts = list(posts)
+    keys = [card_key(post, template_name) for post in posts]
+    fragments = cache.get_many(keys)
+    misses = [
+        (post, key) for post, key in zip(posts, keys) if key not in fragments
+    ]
+    prefetch_thumbnails(post.image for post, _ in misses)
+    missing = {
+        key: render_to_string(template_name, {'post': post})
+        for post, key in misses
+    }
+    # Карточку, где миниатюры ещё не готовы, не кэшируем, чтобы после их
+    # построения она перерисовалась с srcset
+    ready = {
+        key: missing[key] for post, key in misses
+        if not post.image or thumbnails_ready(post.image)
+    }
+    if ready:
+        cache.set_many(ready, settings.POST_CARD_CACHE_TIMEOUT)
+    fragments.update(missing)
+    return [
+        (post, mark_safe(fragments[key])) for post, key in zip(posts, keys)
+    ]
@@ -0,0 +1,153 @@
+import os
+import statistics
+import time
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw
+from sorl.thumbnail.engines.pil_engine import Engine as PILEngine
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+from core.thumbnail_engine import Engine as DraftEngine
+from core.thumbnail_kvstore import thumbnail_options
+from posts.thumbnails import THUMBNAIL_SPECS
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает штатный PIL-движок sorl.thumbnail с движком проекта '
+        'на наборе картинок: время построения всех вариантов одной картинки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Файлы или каталоги с картинками.',
+        )
+        parser.add_argument(
+            '--generate', type=int, default=5,
+            help='Сколько картинок сгенерировать, если paths не заданы.',
+        )
+        parser.add_argument('--size', default='4000x3000')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, paths, generate, size, repeat, **options):
+        if paths:
+            corpus = [
+                (os.path.basename(path), open(path, 'rb').read())
+                for path in self._image_paths(paths)
+            ]
+        else:
+            width, height = map(int, size.split('x'))
+            corpus = [
+                (f'sample-{number}.jpg', _sample_jpeg(width, height, number))
+                for number in range(generate)
+            ]
+        if not corpus:
+            raise CommandError('Не найдено ни одной картинки.')
+
+        stock = self._measure(corpus, repeat, _stock_run)
+        draft = self._measure(corpus, repeat, _draft_run)
+        self.stdout.write(
+            f'Картинок: {len(corpus)}, вариантов на картинку: '
+            f'{len(THUMBNAIL_SPECS)}, повторов: {repeat}'
+        )
+        self.stdout.write(
+            f'{"картинка":<24}{"штатный, мс":>14}{"проекта, мс":>14}'
+        )
+        for (name, _), stock_time, draft_time in zip(corpus, stock, draft):
+            self.stdout.write(
+                f'{name:<24}{stock_time * 1000:>14.1f}'
+                f'{draft_time * 1000:>14.1f}'
+            )
+        total_stock, total_draft = sum(stock), sum(draft)
+        self.stdout.write(
+            f'Итого: {total_stock * 1000:.1f} мс против '
+            f'{total_draft * 1000:.1f} мс, '
+            f'ускорение ×{total_stock / total_draft:.2f}'
+        )
+
+    @staticmethod
+    def _image_paths(paths):
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    for name in sorted(files):
+                        if name.lower().endswith(IMAGE_EXTENSIONS):
+                            yield os.path.join(root, name)
+            else:
+                yield path
+
+    @staticmethod
+    def _measure(corpus, repeat, run):
+        """Медиана времени run() по повторам для каждой картинки."""
+        timings = []
+        for name, data in corpus:
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run(name, data)
+                samples.append(time.perf_counter() - started)
+            timings.append(statistics.median(samples))
+        return timings
+
+
+def _specs(name):
+    source = ImageFile(name)
+    return [
+        (geometry, thumbnail_options(source, options))
+        for geometry, options in THUMBNAIL_SPECS
+    ]
+
+
+def _render(engine, image, geometry_string, options):
+    ratio = engine.get_image_ratio(image, options)
+    thumbnail = engine.create(
+        image, parse_geometry(geometry_string, ratio), options
+    )
+    engine._get_raw_data(
+        thumbnail, options['format'], options['quality'],
+        image_info=engine.get_image_info(image),
+    )
+
+
+def _stock_run(name, data):
+    # Как get_thumbnail(): исходник декодируется для каждого варианта
+    engine = PILEngine()
+    for geometry_string, options in _specs(name):
+        image = engine.get_image(ContentFile(data))
+        _render(engine, image, geometry_string, options)
+
+
+def _draft_run(name, data):
+    # Как ThumbnailBackend.get_thumbnails(): один исходник на все варианты
+    engine = DraftEngine()
+    specs = _specs(name)
+    image = engine.get_image(ContentFile(data))
+    engine.draft(image, [
+        (parse_geometry(geometry_string,
+                        engine.get_image_ratio(image, options)), options)
+        for geometry_string, options in specs
+    ])
+    for geometry_string, options in specs:
+        _render(engine, image, geometry_string, options)
+
+
+def _sample_jpeg(width, height, seed):
+    """Фотоподобная картинка: градиент с фигурами, чтобы JPEG не был пуст.
+    """
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    step = max(width, height) // 12
+    for number in range(24):
+        x = (number * 7919 + seed * 104729) % width
+        y = (number * 6271 + seed * 1299709) % height
+        color = ((number * 53) % 256, (seed * 97) % 256, (number * 31) % 256)
+        draw.ellipse((x, y, x + step, y + step), fill=color)
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
@@ -0,0 +1,121 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from posts import benchmark
+from posts.models import Post
+
+# Свой кэш и одна база: реплика и шарды в замер не входят
+BENCHMARK_SETTINGS = {
+    'CACHES': {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }},
+    'REPLICA_DATABASE': None,
+    'POST_SHARDS': (),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку представлений posts на сгенерированной базе: '
+        'p50/p95/p99, запросы и размер ответа, сравнение с базовой линией.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument(
+            '--database-file',
+            default=os.path.join(settings.BASE_DIR, 'benchmark.sqlite3'),
+            help='SQLite-файл с данными; создаётся и наполняется, '
+                 'если его ещё нет.',
+        )
+        parser.add_argument(
+            '--reseed', action='store_true',
+            help='Пересоздать базу, даже если файл уже есть.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--samples', type=int, default=50,
+            help='Запросов на каждый адрес.',
+        )
+        parser.add_argument(
+            '--warm', action='store_true',
+            help='Не очищать кэш между запросами.',
+        )
+        parser.add_argument(
+            '--baseline',
+            default=os.path.join(settings.BASE_DIR, 'benchmark.json'),
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать результат как новую базовую линию.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост p95 и размера ответа, доля.',
+        )
+
+    def handle(self, *args, database_file, reseed, seed, batch_size,
+               samples, warm, baseline, save_baseline, tolerance,
+               **options):
+        sizes = {name: options[name] for name in benchmark.DEFAULT_SIZES}
+        if reseed and os.path.exists(database_file):
+            os.remove(database_file)
+        self._use_database(database_file)
+        with override_settings(**BENCHMARK_SETTINGS):
+            call_command('migrate', verbosity=0)
+            if not Post.objects.exists():
+                self.stdout.write('Наполнение базы…')
+                counts = benchmark.seed(sizes, seed, batch_size)
+                self.stdout.write(', '.join(
+                    f'{table}: {count}' for table, count in counts.items()
+                ))
+            try:
+                results = benchmark.measure(
+                    benchmark.targets(samples, seed), warm=warm
+                )
+            except (ValueError, RuntimeError) as error:
+                raise CommandError(error)
+        previous = {}
+        if os.path.exists(baseline):
+            with open(baseline, encoding='utf-8') as stored:
+                previous = json.load(stored)
+        self._report(results, previous)
+        if save_baseline:
+            with open(baseline, 'w', encoding='utf-8') as stored:
+                json.dump(results, stored, indent=2, sort_keys=True)
+            self.stdout.write(f'Базовая линия записана в {baseline}')
+            return
+        found = benchmark.regressions(results, previous, tolerance)
+        for name, metric, before, after in found:
+            self.stderr.write(f'{name}: {metric} {before} → {after}')
+        if found:
+            raise CommandError(f'Ухудшений: {len(found)}')
+
+    @staticmethod
+    def _use_database(path):
+        """Переключить основное соединение на отдельный файл."""
+        connection = connections['default']
+        connection.close()
+        connection.settings_dict['NAME'] = path
+
+    def _report(self, results, previous):
+        self.stdout.write(
+            f'{"адрес":<18}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}'
+            f'{"запросов":>10}{"байт":>10}{"p95 было":>10}'
+        )
+        for name, result in results.items():
+            before = previous.get(name, {}).get('p95', '—')
+            self.stdout.write(
+                f'{name:<18}{result["p50"]:>10.1f}{result["p95"]:>10.1f}'
+                f'{result["p99"]:>10.1f}{result["queries"]:>10}'
+                f'{result["bytes"]:>10}{before:>10}'
+            )
@@ -0,0 +1,59 @@
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import shards
+from posts.models import Post
+from posts.thumbnails import build_thumbnails
+from posts.uploads import is_normalized, normalize_image, store_variants
+
+
+class Command(BaseCommand):
+    help = 'Нормализует картинки уже опубликованных постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Обработать и уже нормализованные картинки.',
+        )
+
+    def handle(self, *args, force, **options):
+        names = {
+            name
+            for queryset in shards.each(
+                Post.objects.exclude(image='').order_by().values_list(
+                    'image', flat=True
+                ).distinct()
+            )
+            for name in queryset
+        }
+        image_field = Post._meta.get_field('image')
+        processed = 0
+        timings = Counter()
+        for name in sorted(names):
+            if not default_storage.exists(name):
+                self.stderr.write(f'Файл не найден: {name}')
+                continue
+            if not force and is_normalized(name):
+                continue
+            with default_storage.open(name) as file_:
+                result = normalize_image(file_)
+            new_name = image_field.storage.save(
+                image_field.generate_filename(None, result.master.name),
+                result.master,
+            )
+            store_variants(new_name, result.variants)
+            # save(), а не update(): сигналы сбросят кэши страниц и снимут
+            # ссылки на старый файл, а за последней удалят и его
+            for queryset in shards.each(Post.objects.filter(image=name)):
+                for post in queryset:
+                    post.image = new_name
+                    post.save(update_fields=['image'])
+            build_thumbnails(new_name)
+            timings.update(result.timings)
+            processed += 1
+        self.stdout.write(f'Нормализовано картинок: {processed}')
+        for step, seconds in timings.items():
+            self.stdout.write(f'  {step}: {seconds * 1000:.1f} мс')
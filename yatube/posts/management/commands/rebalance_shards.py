@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from posts import shards
+from posts.models import Comment, FeedEntry, Group, Post, PostDirectory, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает посты с комментариями по шардам POST_SHARDS: '
+        'копирует туда пользователей и группы, заносит старые посты '
+        'в каталог и переносит посты, лежащие не в шарде своего автора.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', default=[],
+            help=(
+                'Ещё база, из которой забрать все посты: основная при '
+                'включении шардирования или выводимый шард.'
+            ),
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, source, batch_size, **options):
+        if not shards.enabled():
+            raise CommandError('POST_SHARDS пуст: шардирование выключено.')
+        for model in (User, Group):
+            self.replicate(model, batch_size)
+        sources = list(dict.fromkeys([*source, *settings.POST_SHARDS]))
+        # Сначала каталог: после этого новые id уже не пересекутся
+        # со старыми постами, которые ещё не перенесены
+        for alias in sources:
+            self.fill_directory(alias, batch_size)
+        for alias in sources:
+            posts, comments = self.drain(alias, batch_size)
+            self.stdout.write(
+                f'{alias}: перенесено постов {posts}, '
+                f'комментариев {comments}'
+            )
+
+    @staticmethod
+    def _batches(queryset, batch_size):
+        last_id = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_id).order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return
+            last_id = batch[-1].pk
+            yield batch
+
+    def replicate(self, model, batch_size):
+        queryset = model._base_manager.using(DEFAULT_DB_ALIAS)
+        for batch in self._batches(queryset, batch_size):
+            shards.replicate(batch)
+
+    def fill_directory(self, alias, batch_size):
+        rows = Post._base_manager.using(alias).only('pk', 'author_id')
+        for batch in self._batches(rows, batch_size):
+            PostDirectory.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+                [
+                    PostDirectory(pk=post.pk, author_id=post.author_id)
+                    for post in batch
+                ],
+                ignore_conflicts=True,
+            )
+
+    def drain(self, source, batch_size):
+        """Перенести из source посты, чей шард — другая база."""
+        moved_posts = moved_comments = 0
+        queryset = Post._base_manager.using(source)
+        for batch in self._batches(queryset, batch_size):
+            targets = {}
+            for post in batch:
+                target = shards.shard_for_author(post.author_id)
+                if target != source:
+                    targets.setdefault(target, []).append(post)
+            for target, posts in targets.items():
+                moved_comments += self.move(source, target, posts)
+                moved_posts += len(posts)
+        return moved_posts, moved_comments
+
+    @staticmethod
+    def move(source, target, posts):
+        """Скопировать посты с комментариями в target и удалить из source.
+
+        Базы разные, поэтому общей транзакции нет: сначала пишется копия,
+        потом удаляется оригинал. Если команда упала между шагами,
+        повторный запуск заменит неполную копию заново.
+        """
+        ids = [post.pk for post in posts]
+        comments = list(
+            Comment._base_manager.using(source).filter(post_id__in=ids)
+        )
+        with transaction.atomic(using=target):
+            Comment._base_manager.using(target).filter(
+                post_id__in=ids
+            )._raw_delete(target)
+            Post._base_manager.using(target).filter(
+                pk__in=ids
+            )._raw_delete(target)
+            Post._base_manager.using(target).bulk_create(posts)
+            # id комментариев локальны для шарда; на них никто не ссылается
+            for comment in comments:
+                comment.pk = None
+            Comment._base_manager.using(target).bulk_create(comments)
+        # Без сигналов: пост не удаляется, а переезжает
+        with transaction.atomic(using=source):
+            for model, field in (
+                (Comment, 'post_id'), (FeedEntry, 'post_id'), (Post, 'pk')
+            ):
+                model._base_manager.using(source).filter(
+                    **{f'{field}__in': ids}
+                )._raw_delete(source)
+        return len(comments)
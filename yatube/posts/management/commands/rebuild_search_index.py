@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов, комментариев и групп.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, chunk_size, **options):
+        counts = rebuild_index(chunk_size)
+        self.stdout.write(
+            'Проиндексировано: ' + ', '.join(
+                f'{kind} — {count}' for kind, count in counts.items()
+            )
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import AuthorStats, User
+from posts.stats import STAT_FIELDS, count_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики AuthorStats пачками и исправляет дрейф.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        fixed = created = 0
+        last_id = 0
+        while True:
+            batch = list(user_ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            counts = count_stats(batch)
+            existing = AuthorStats.objects.in_bulk(batch)
+            changed = []
+            for author_id, values in counts.items():
+                stats = existing.get(author_id)
+                if stats is None:
+                    continue
+                if any(getattr(stats, field) != values[field]
+                       for field in STAT_FIELDS):
+                    for field in STAT_FIELDS:
+                        setattr(stats, field, values[field])
+                    changed.append(stats)
+            missing = [
+                AuthorStats(author_id=author_id, **values)
+                for author_id, values in counts.items()
+                if author_id not in existing
+            ]
+            AuthorStats.objects.bulk_update(changed, STAT_FIELDS)
+            AuthorStats.objects.bulk_create(missing, ignore_conflicts=True)
+            fixed += len(changed)
+            created += len(missing)
+        self.stdout.write(
+            f'Исправлено: {fixed}, создано: {created}'
+        )
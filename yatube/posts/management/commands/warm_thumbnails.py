@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import shards
+from posts.models import Post
+from posts.thumbnails import build_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для картинок уже опубликованных постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, workers, **options):
+        names = sorted({
+            name
+            for queryset in shards.each(
+                Post.objects.exclude(image='').order_by().values_list(
+                    'image', flat=True
+                ).distinct()
+            )
+            for name in queryset.iterator()
+        })
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(build_thumbnails, names))
+        else:
+            results = [build_thumbnails(name) for name in names]
+        self.stdout.write(
+            f'Обработано картинок: {len(results)}, '
+            f'построено: {sum(results)}'
+        )
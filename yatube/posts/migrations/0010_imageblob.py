@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-17 07:06
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_image_blobs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    db = schema_editor.connection.alias
+    counts = Post.objects.using(db).exclude(image='').order_by().values(
+        'image'
+    ).annotate(references=Count('pk'))
+    ImageBlob.objects.using(db).bulk_create(
+        ImageBlob(name=row['image'], references=row['references'])
+        for row in counts.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_comment_post_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(
+            backfill_image_blobs, migrations.RunPython.noop
+        ),
+    ]
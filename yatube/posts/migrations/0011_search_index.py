@@ -0,0 +1,91 @@
+from django.db import migrations
+
+# rowid записи индекса — pk * 3 + вид: 0 — пост, 1 — комментарий, 2 — группа
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    "title, body, tokenize = 'unicode61 remove_diacritics 2')",
+
+    """CREATE TRIGGER posts_search_post_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_search (rowid, title, body)
+        VALUES (new.id * 3, '', new.text);
+    END""",
+    """CREATE TRIGGER posts_search_post_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 3;
+        INSERT INTO posts_search (rowid, title, body)
+        VALUES (new.id * 3, '', new.text);
+    END""",
+    """CREATE TRIGGER posts_search_post_delete
+    AFTER DELETE ON posts_post BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 3;
+    END""",
+
+    """CREATE TRIGGER posts_search_comment_insert
+    AFTER INSERT ON posts_comment BEGIN
+        INSERT INTO posts_search (rowid, title, body)
+        VALUES (new.id * 3 + 1, '', new.text);
+    END""",
+    """CREATE TRIGGER posts_search_comment_update
+    AFTER UPDATE OF text ON posts_comment BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 3 + 1;
+        INSERT INTO posts_search (rowid, title, body)
+        VALUES (new.id * 3 + 1, '', new.text);
+    END""",
+    """CREATE TRIGGER posts_search_comment_delete
+    AFTER DELETE ON posts_comment BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 3 + 1;
+    END""",
+
+    """CREATE TRIGGER posts_search_group_insert
+    AFTER INSERT ON posts_group BEGIN
+        INSERT INTO posts_search (rowid, title, body)
+        VALUES (new.id * 3 + 2, new.title, new.description);
+    END""",
+    """CREATE TRIGGER posts_search_group_update
+    AFTER UPDATE OF title, description ON posts_group BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 3 + 2;
+        INSERT INTO posts_search (rowid, title, body)
+        VALUES (new.id * 3 + 2, new.title, new.description);
+    END""",
+    """CREATE TRIGGER posts_search_group_delete
+    AFTER DELETE ON posts_group BEGIN
+        DELETE FROM posts_search WHERE rowid = old.id * 3 + 2;
+    END""",
+
+    """INSERT INTO posts_search (rowid, title, body)
+    SELECT id * 3, '', text FROM posts_post""",
+    """INSERT INTO posts_search (rowid, title, body)
+    SELECT id * 3 + 1, '', text FROM posts_comment""",
+    """INSERT INTO posts_search (rowid, title, body)
+    SELECT id * 3 + 2, title, description FROM posts_group""",
+)
+DROP_SQL = (
+    *(
+        f'DROP TRIGGER IF EXISTS posts_search_{model}_{action}'
+        for model in ('post', 'comment', 'group')
+        for action in ('insert', 'update', 'delete')
+    ),
+    'DROP TABLE IF EXISTS posts_search',
+)
+
+
+def run_sql(statements):
+    def run(apps, schema_editor):
+        # FTS5 есть только в SQLite
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_imageblob'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
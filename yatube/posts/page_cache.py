@@ -0,0 +1,171 @@
+"""Поколенческий кэш страниц лент.
+
+Каждая страница зависит от набора пространств имён (главная, группа,
+автор). Ключ кэша страницы включает текущие номера поколений этих
+пространств, а сигналы моделей сдвигают поколение при изменении данных.
+Поэтому время жизни кэша может быть большим: страница перерисовывается
+только тогда, когда изменилось то, что на ней показано.
+
+Поколение сдвигается сразу после записи в основную базу, а реплика
+догоняет её позже. Пока снимок реплики старше поколений страницы,
+страница читается из основной базы: иначе устаревшая версия легла бы
+в кэш под новым поколением и отдавалась бы с его ETag.
+"""
+import hashlib
+import secrets
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
+
+from core import replica
+
+GENERATION_KEY = 'generation:{}'
+# Поколение сдвигается в сигнале, до коммита: снимок реплики должен
+# начаться хотя бы на столько секунд позже, чтобы застать запись
+REPLICA_COMMIT_MARGIN = 1
+INDEX_NAMESPACE = 'index'
+USERS_NAMESPACE = 'users'
+
+
+def group_namespace(slug):
+    return f'group:{slug}'
+
+
+def author_namespace(username):
+    return f'author:{username}'
+
+
+def post_namespace(post_id):
+    return f'post:{post_id}'
+
+
+def new_generation():
+    """Поколение: время в микросекундах плюс случайный суффикс."""
+    return f'{time.time_ns() // 1000:x}.{secrets.token_hex(2)}'
+
+
+def generation_timestamp(generation):
+    """Момент выдачи поколения, Unix-время в секундах."""
+    return int(generation.split('.', 1)[0], 16) / 10 ** 6
+
+
+def generation_time(generation):
+    """Момент, когда поколение было выдано (UTC, с точностью до секунды)."""
+    return datetime.fromtimestamp(
+        int(generation_timestamp(generation)), timezone.utc
+    )
+
+
+def replica_is_current(generations):
+    """Снимок реплики сделан после последнего из поколений generations."""
+    snapshot = replica.snapshot_time()
+    return snapshot is not None and snapshot > max(
+        map(generation_timestamp, generations), default=0
+    ) + REPLICA_COMMIT_MARGIN
+
+
+def get_generations(namespaces):
+    """Текущие поколения пространств имён за одно обращение к кэшу."""
+    keys = {GENERATION_KEY.format(name): name for name in namespaces}
+    cached = cache.get_many(keys)
+    missing = {key: new_generation() for key in keys if key not in cached}
+    if missing:
+        cache.set_many(missing, None)
+        cached.update(missing)
+    return {keys[key]: generation for key, generation in cached.items()}
+
+
+def bump(*namespaces):
+    """Сдвинуть поколения: все зависящие страницы станут промахом."""
+    cache.set_many(
+        {GENERATION_KEY.format(name): new_generation()
+         for name in namespaces if name},
+        None,
+    )
+
+
+def _primary_unless_replica_current(generations):
+    """Читать из основной базы, пока реплика не догнала generations."""
+    if replica_is_current(generations):
+        return nullcontext()
+    return replica.routing(pinned=True)
+
+
+def cache_page_by_generation(timeout, namespaces):
+    """cache_page, ключ которого включает поколения namespaces(**kwargs).
+
+    В ключе и пользователь: декоратор работает до SessionMiddleware,
+    и Vary: Cookie ещё не выставлен, а страница показывает имя в шапке
+    и кнопку подписки.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            names = namespaces(**kwargs)
+            generations = get_generations(names)
+            key_prefix = f'page:{request.user.pk or ""}:' + '|'.join(
+                generations[name] for name in names
+            )
+            cached_view = cache_page(timeout, key_prefix=key_prefix)(view)
+            with _primary_unless_replica_current(generations.values()):
+                return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def conditional_by_generation(namespaces, vary_on_csrf=False):
+    """Conditional GET по поколениям namespaces(**kwargs).
+
+    ETag — хэш поколений и пользователя, Last-Modified — время самого
+    свежего поколения. Оба считаются до представления одним обращением
+    к кэшу, и на совпавший If-None-Match / If-Modified-Since отдаётся
+    304 без запросов к постам и без рендеринга. Ответ помечается no-cache:
+    проверка дешёвая, поэтому клиент переспрашивает каждый раз, а не
+    держит страницу max-age от cache_page.
+
+    vary_on_csrf — для страниц с формами: в ETag входит и CSRF-cookie,
+    иначе после повторного входа клиент получил бы 304 на страницу со
+    старым токеном, и отправка формы не прошла бы проверку.
+    """
+    def generations(request, kwargs):
+        if not hasattr(request, '_page_generations'):
+            request._page_generations = get_generations(namespaces(**kwargs))
+        return request._page_generations
+
+    def etag(request, *args, **kwargs):
+        payload = '|'.join([
+            *sorted(generations(request, kwargs).values()),
+            str(request.user.pk or ''),
+            request.META.get('CSRF_COOKIE', '') if vary_on_csrf else '',
+        ])
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        # Время не различает пользователей: вошедшим хватает ETag
+        if request.user.is_authenticated:
+            return None
+        return max(map(generation_time, generations(request, kwargs).values()))
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with _primary_unless_replica_current(
+                generations(request, kwargs).values()
+            ):
+                response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True, max_age=0)
+            if response.has_header('Expires'):
+                del response['Expires']
+            return response
+        return wrapper
+    return decorator
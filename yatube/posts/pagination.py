@@ -0,0 +1,141 @@
+import base64
+import json
+
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Номера страниц не известны, зато известны курсоры соседних страниц.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (keyset) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием на поля сортировки последней показанной
+    записи, поэтому глубина листания не влияет на стоимость запроса,
+    а новые записи не сдвигают уже открытые страницы.
+    """
+
+    cursor_param = 'cursor'
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def get_page(self, cursor):
+        """Вернуть страницу по курсору.
+
+        Испорченный курсор — InvalidCursor, а не первая страница: иначе
+        подгрузка комментариев повторила бы уже показанные.
+        """
+        return self.page(cursor)
+
+    def page(self, cursor):
+        if not cursor:
+            return self._page_after(None)
+        direction, values = self.decode_cursor(cursor)
+        if direction == 'next':
+            return self._page_after(values)
+        return self._page_before(values)
+
+    def _rows(self, ordering, values):
+        """Первые per_page + 1 записей строго после values в порядке
+        ordering; без values — с начала.
+        """
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(ordering, values))
+        return list(queryset[:self.per_page + 1])
+
+    def _page_after(self, values):
+        rows = self._rows(self.ordering, values)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=self._cursor_for('next', rows[-1])
+            if has_more else None,
+            previous_cursor=self._cursor_for('prev', rows[0])
+            if values is not None and rows else None,
+        )
+
+    def _page_before(self, values):
+        reverse_ordering = tuple(_reverse(field) for field in self.ordering)
+        rows = self._rows(reverse_ordering, values)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=self._cursor_for('next', rows[-1]) if rows else None,
+            previous_cursor=self._cursor_for('prev', rows[0])
+            if has_more else None,
+        )
+
+    @staticmethod
+    def _seek(ordering, values):
+        """Условие «строго после values» для лексикографического порядка."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _cursor_for(self, direction, obj):
+        values = [
+            self._field(field).value_to_string(obj) for field in self.ordering
+        ]
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor.encode())
+            direction, raw_values = json.loads(payload)
+            if direction not in ('next', 'prev'):
+                raise ValueError(direction)
+            if len(raw_values) != len(self.ordering):
+                raise ValueError(raw_values)
+            values = [
+                self._field(field).to_python(value)
+                for field, value in zip(self.ordering, raw_values)
+            ]
+        except Exception as error:
+            raise InvalidCursor(cursor) from error
+        return direction, values
+
+    def _field(self, field):
+        name = field.lstrip('-')
+        meta = self.object_list.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+
+def _reverse(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
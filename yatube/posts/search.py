@@ -0,0 +1,255 @@
+"""Полнотекстовый поиск по постам, комментариям и группам на SQLite FTS5.
+
+Индекс posts_search создаётся миграцией 0011 и поддерживается триггерами
+базы, поэтому в него попадают и bulk_create, и update(). rowid записи —
+pk * 3 + номер вида из KINDS: по нему триггеры удаляют и обновляют записи
+без просмотра индекса, а выдача без лишних столбцов знает, что искать.
+
+С шардами у каждого шарда свой индекс: посты и комментарии ищутся во
+всех шардах, группы — только в основной базе (их копии в шардах не
+ищутся, чтобы не повторяться), а выдачи сливаются по bm25.
+"""
+import heapq
+import re
+from itertools import islice
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import CharField, F, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import shards
+from .models import Comment, Group, Post
+
+TABLE = 'posts_search'
+KINDS = ('post', 'comment', 'group')
+# Вес заголовка группы выше веса текста
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+# Маркеры совпадений в snippet(): текст экранируется, потом они
+# заменяются на <mark>
+MARK_START = '\x02'
+MARK_END = '\x03'
+# Модель, поле заголовка и поле текста для каждого вида из KINDS
+SOURCES = (
+    (Post, None, 'text'),
+    (Comment, None, 'text'),
+    (Group, 'title', 'description'),
+)
+
+
+def match_expression(query):
+    """Запрос пользователя в выражение MATCH: все слова, последнее — префикс.
+
+    Слова берутся в кавычки, поэтому синтаксис FTS5 из запроса
+    (OR, NEAR, скобки, двоеточия) не интерпретируется.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _kind_condition(kinds):
+    codes = ', '.join(str(KINDS.index(kind)) for kind in kinds)
+    return f'rowid %% 3 IN ({codes})'
+
+
+def _sources(kinds):
+    """[(алиас базы, виды из kinds, которые ищутся в её индексе)]."""
+    sources = {}
+    for kind in kinds:
+        aliases = (
+            (DEFAULT_DB_ALIAS,) if kind == 'group' else shards.aliases()
+        )
+        for alias in aliases:
+            sources.setdefault(alias, []).append(kind)
+    return [(alias, tuple(found)) for alias, found in sources.items()]
+
+
+def _where(kinds):
+    sql = f'{TABLE} MATCH %s'
+    if set(kinds) != set(KINDS):
+        sql += ' AND ' + _kind_condition(kinds)
+    return sql
+
+
+class SearchHit:
+    """Найденный объект, его вид и фрагмент текста с подсветкой."""
+
+    __slots__ = ('kind', 'object', 'snippet', 'rank')
+
+    def __init__(self, kind, object, snippet, rank):
+        self.kind = kind
+        self.object = object
+        self.snippet = snippet
+        self.rank = rank
+
+
+class SearchResults:
+    """Выдача, упорядоченная по bm25, для Paginator.
+
+    len() — один COUNT по индексу каждой базы, срез — одна страница из
+    индексов и по запросу на каждый вид найденных объектов в каждой базе.
+    """
+
+    def __init__(self, query, kinds=KINDS):
+        self.expression = match_expression(query)
+        self.kinds = tuple(kinds)
+        self.sources = _sources(self.kinds)
+        self._count = None
+
+    def __len__(self):
+        if self.expression is None:
+            return 0
+        if self._count is None:
+            self._count = 0
+            for alias, kinds in self.sources:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT COUNT(*) FROM {TABLE} WHERE {_where(kinds)}',
+                        [self.expression],
+                    )
+                    self._count += cursor.fetchone()[0]
+        return self._count
+
+    def count(self):
+        return len(self)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if self.expression is None:
+            return []
+        start = index.start or 0
+        if len(self.sources) == 1:
+            (alias, kinds), = self.sources
+            return _hydrate(self._rows(alias, kinds, start, index.stop))
+        # Из каждой базы — первые stop строк, дальше общее слияние
+        merged = heapq.merge(
+            *(
+                self._rows(alias, kinds, 0, index.stop)
+                for alias, kinds in self.sources
+            ),
+            key=lambda row: row[3],
+        )
+        return _hydrate(list(islice(merged, start, index.stop)))
+
+    def _rows(self, alias, kinds, start, stop):
+        """[(алиас, rowid, фрагмент, ранг)] из индекса базы alias."""
+        limit = -1 if stop is None else max(stop - start, 0)
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, '
+                f'snippet({TABLE}, -1, %s, %s, %s, %s), '
+                f'bm25({TABLE}, %s, %s) AS rank '
+                f'FROM {TABLE} WHERE {_where(kinds)} '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [MARK_START, MARK_END, '…', SNIPPET_TOKENS,
+                 TITLE_WEIGHT, BODY_WEIGHT, self.expression, limit, start],
+            )
+            return [(alias, *row) for row in cursor.fetchall()]
+
+
+def _hydrate(rows):
+    ids = {}
+    for alias, rowid, _, _ in rows:
+        ids.setdefault((alias, KINDS[rowid % 3]), []).append(rowid // 3)
+    querysets = {
+        'post': Post.objects.select_related('author', 'group'),
+        'comment': Comment.objects.select_related('author'),
+        'group': Group.objects.all(),
+    }
+    objects = {
+        (alias, kind): querysets[kind].using(alias).in_bulk(pks)
+        for (alias, kind), pks in ids.items()
+    }
+    hits = []
+    for alias, rowid, snippet, rank in rows:
+        kind = KINDS[rowid % 3]
+        obj = objects[alias, kind].get(rowid // 3)
+        # Объект могли удалить между запросами к индексу и к таблице
+        if obj is not None:
+            hits.append(SearchHit(kind, obj, highlight(snippet), rank))
+    return hits
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def filter_queryset(queryset, query):
+    """Оставить в queryset только найденные индексом объекты.
+
+    С шардами посты и комментарии ищутся в каждом шарде по его индексу,
+    результат — ScatterQuerySet.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    kind = queryset.model._meta.model_name
+    sql = (
+        f'SELECT rowid / 3 FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s AND rowid %% 3 = %s'
+    )
+    params = (expression, KINDS.index(kind))
+    if kind == 'group' or queryset._db is not None:
+        return queryset.filter(pk__in=RawSQL(sql, params))
+    # Индекс лежит в той же базе, что и таблица: подзапрос — в каждом шарде
+    return shards.scatter(queryset.filter(pk__in=RawSQL(sql, params)))
+
+
+def rebuild_index(chunk_size=1000):
+    """Перестроить индекс каждой базы, читая таблицы порциями по chunk_size.
+
+    Возвращает число проиндексированных записей каждого вида (копии групп
+    в шардах не считаются).
+    """
+    counts = dict.fromkeys(KINDS, 0)
+    searched = dict(_sources(KINDS))
+    for alias in dict.fromkeys((DEFAULT_DB_ALIAS, *shards.aliases())):
+        for kind, count in _rebuild(alias, chunk_size).items():
+            if kind in searched.get(alias, ()):
+                counts[kind] += count
+    return counts
+
+
+def _rebuild(alias, chunk_size):
+    counts = {}
+    insert = (
+        f'INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)'
+    )
+    with transaction.atomic(using=alias), \
+            connections[alias].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for code, (model, title_field, body_field) in enumerate(SOURCES):
+            title = (
+                F(title_field) if title_field
+                else Value('', output_field=CharField())
+            )
+            rows = model.objects.using(alias).order_by().values_list(
+                'pk', title, body_field
+            ).iterator(chunk_size=chunk_size)
+            count = 0
+            while True:
+                batch = [
+                    (pk * 3 + code, heading, body)
+                    for pk, heading, body in islice(rows, chunk_size)
+                ]
+                if not batch:
+                    break
+                cursor.executemany(insert, batch)
+                count += len(batch)
+            counts[KINDS[code]] = count
+        cursor.execute(
+            f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')"
+        )
+    return counts
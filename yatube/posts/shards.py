@@ -0,0 +1,361 @@
+"""Шардирование постов по авторам.
+
+Режим включается списком алиасов баз settings.POST_SHARDS. Посты автора
+и комментарии к ним лежат в шарде, который выбирается jump consistent
+hash от хэша author_id: при добавлении шарда переезжает только
+≈1/N авторов. В каждом шарде полная схема, а таблицы пользователей и
+групп копируются туда сигналами (без паролей), чтобы внешние ключи и
+JOIN для карточек работали внутри шарда.
+
+Id постов глобальные: их выдаёт таблица PostDirectory основной базы,
+она же по id поста называет автора, а значит и шард. Благодаря этому
+старые ссылки /posts/<id>/ не меняются ни при переходе на шарды, ни
+при перебалансировке.
+
+Профиль и пост читают один шард. Главная, группа и лента подписок
+собираются ScatterQuerySet: запрос выполняется в каждом нужном шарде,
+а строки сливаются по сортировке через heapq.merge.
+"""
+import hashlib
+import heapq
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+
+POST_MODELS = ('posts.post', 'posts.comment')
+# Поля пользователя, которые копируются в шарды
+REPLICATED_USER_FIELDS = (
+    'username', 'first_name', 'last_name', 'email', 'is_active',
+    'is_staff', 'is_superuser', 'date_joined',
+)
+# Сколько соответствий «пост — автор» помнит процесс
+DIRECTORY_CACHE_SIZE = 100000
+
+_post_authors = {}
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def aliases():
+    """Базы, в которых лежат посты."""
+    return tuple(settings.POST_SHARDS) or (DEFAULT_DB_ALIAS,)
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping, Veach): номер корзины для key."""
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def _author_key(author_id):
+    digest = hashlib.blake2b(
+        int(author_id).to_bytes(8, 'little'), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def shard_for_author(author_id, shards=None):
+    shards = tuple(shards or settings.POST_SHARDS)
+    return shards[jump_hash(_author_key(author_id), len(shards))]
+
+
+def post_authors(post_ids):
+    """{id поста: id автора} по каталогу PostDirectory с кэшем процесса.
+
+    Отсутствующие id не кэшируются: они могут быть выданы позже.
+    """
+    from .models import PostDirectory
+
+    found = {
+        post_id: _post_authors[post_id]
+        for post_id in post_ids if post_id in _post_authors
+    }
+    missing = [post_id for post_id in post_ids if post_id not in found]
+    if missing:
+        rows = dict(
+            PostDirectory.objects.using(DEFAULT_DB_ALIAS).filter(
+                pk__in=missing
+            ).values_list('pk', 'author_id')
+        )
+        if len(_post_authors) + len(rows) > DIRECTORY_CACHE_SIZE:
+            _post_authors.clear()
+        _post_authors.update(rows)
+        found.update(rows)
+    return found
+
+
+def shard_for_post(post_id):
+    """Шард поста; для неизвестного id — первый шард (там его тоже нет)."""
+    author_id = post_authors([int(post_id)]).get(int(post_id))
+    if author_id is None:
+        return settings.POST_SHARDS[0]
+    return shard_for_author(author_id)
+
+
+def group_by_shard(post_ids):
+    """{шард: [id постов]} с сохранением порядка внутри шарда."""
+    authors = post_authors(post_ids)
+    groups = {}
+    for post_id in post_ids:
+        if post_id in authors:
+            groups.setdefault(
+                shard_for_author(authors[post_id]), []
+            ).append(post_id)
+    return groups
+
+
+def each(queryset):
+    """Тот же запрос в каждой базе с постами."""
+    if not enabled():
+        return [queryset]
+    return [queryset.using(alias) for alias in aliases()]
+
+
+def scatter(queryset):
+    """Запрос по всем шардам; без шардирования — сам queryset."""
+    if not enabled():
+        return queryset
+    return ScatterQuerySet(queryset.model, each(queryset))
+
+
+def scatter_authors(queryset, author_ids):
+    """Запрос по постам авторов author_ids: только в их шардах."""
+    if not enabled():
+        return queryset.filter(author_id__in=author_ids)
+    groups = {}
+    for author_id in author_ids:
+        groups.setdefault(shard_for_author(author_id), []).append(author_id)
+    return ScatterQuerySet(queryset.model, [
+        queryset.using(alias).filter(author_id__in=ids)
+        for alias, ids in groups.items()
+    ])
+
+
+class ScatterQuerySet:
+    """Один запрос в нескольких базах, слитый в общую сортировку.
+
+    Поддерживает то, что нужно Paginator, CursorPaginator и поиску в
+    админке: count(), срезы, filter() и order_by(). Срез [a:b] читает из
+    каждого шарда первые b строк, поэтому для глубоких страниц дешевле
+    курсорная пагинация (POSTS_CURSOR_PAGINATION).
+    """
+
+    def __init__(self, model, querysets):
+        self.model = model
+        self.querysets = list(querysets)
+
+    def _chain(self, method, *args, **kwargs):
+        return ScatterQuerySet(self.model, [
+            getattr(queryset, method)(*args, **kwargs)
+            for queryset in self.querysets
+        ])
+
+    def all(self):
+        return self._chain('all')
+
+    # Список изменений в админке копирует результаты поиска через _clone()
+    _clone = all
+
+    def filter(self, *args, **kwargs):
+        return self._chain('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._chain('exclude', *args, **kwargs)
+
+    def order_by(self, *field_names):
+        return self._chain('order_by', *field_names)
+
+    def only(self, *fields):
+        return self._chain('only', *fields)
+
+    @property
+    def ordering(self):
+        if not self.querysets:
+            return ()
+        query = self.querysets[0].query
+        if query.order_by:
+            return tuple(query.order_by)
+        if query.default_ordering:
+            return tuple(self.model._meta.ordering)
+        return ()
+
+    @property
+    def ordered(self):
+        return bool(self.ordering)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def _merge(self, iterables):
+        ordering = self.ordering
+        if not ordering:
+            return chain.from_iterable(iterables)
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) > 1:
+            raise ValueError(
+                f'Смешанное направление сортировки не сливается: {ordering}'
+            )
+        names = [field.lstrip('-') for field in ordering]
+
+        def key(obj):
+            return tuple(getattr(obj, name) for name in names)
+
+        return heapq.merge(*iterables, key=key, reverse=descending.pop())
+
+    def __iter__(self):
+        return self._merge(self.querysets)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop
+        if stop is None:
+            return list(islice(iter(self), start, None))
+        merged = self._merge(
+            [queryset[:stop] for queryset in self.querysets]
+        )
+        return list(islice(merged, start, stop))
+
+
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # Без явной базы шард выбирает роутер по самому объекту: у
+        # queryset для этого нет подсказки instance
+        if self._db is not None or not enabled():
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
+class ShardedManager(models.Manager.from_queryset(ShardedQuerySet)):
+    """Менеджер постов и комментариев с запросами к нужному шарду."""
+
+    def for_post(self, post_id):
+        """Queryset в шарде поста post_id."""
+        if not enabled():
+            return self.all()
+        return self.using(shard_for_post(post_id))
+
+    def for_author(self, author_id):
+        """Queryset постов в шарде автора author_id."""
+        if not enabled():
+            return self.filter(author_id=author_id)
+        return self.using(shard_for_author(author_id)).filter(
+            author_id=author_id
+        )
+
+
+def instance_shard(model, instance):
+    """Шард для запроса model с подсказкой instance или None."""
+    from .models import Comment, Post, User
+
+    if model._meta.label_lower not in POST_MODELS:
+        return None
+    if isinstance(instance, Post):
+        if instance._state.db in settings.POST_SHARDS:
+            return instance._state.db
+        if instance.pk is not None and not instance._state.adding:
+            return shard_for_post(instance.pk)
+        if instance.author_id is not None:
+            return shard_for_author(instance.author_id)
+    if isinstance(instance, Comment) and instance.post_id is not None:
+        return shard_for_post(instance.post_id)
+    if isinstance(instance, User) and model is Post:
+        return shard_for_author(instance.pk)
+    return None
+
+
+class ShardRouter:
+    """Посты и комментарии — в шарды, остальное решают другие роутеры."""
+
+    def db_for_read(self, model, instance=None, **hints):
+        if enabled():
+            return instance_shard(model, instance)
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # В шардах полная схема: внешние ключи ссылаются на копии
+        # пользователей и групп
+        if db in settings.POST_SHARDS:
+            return True
+        return None
+
+
+def replicated_values(instance):
+    """Поля пользователя или группы, которые копируются в шарды."""
+    from .models import Group, User
+
+    if isinstance(instance, Group):
+        fields = ('title', 'slug', 'description')
+    else:
+        fields = REPLICATED_USER_FIELDS
+    values = {field: getattr(instance, field) for field in fields}
+    if isinstance(instance, User):
+        # Аутентификация идёт только по основной базе
+        values['password'] = ''
+    return values
+
+
+def replicate(instances, shards=None):
+    """Записать пользователей или группы в шарды (вставка или правка)."""
+    instances = list(instances)
+    if not instances:
+        return
+    model = type(instances[0])
+    for alias in shards or settings.POST_SHARDS:
+        manager = model._base_manager.using(alias)
+        existing = set(manager.filter(
+            pk__in=[instance.pk for instance in instances]
+        ).values_list('pk', flat=True))
+        for instance in instances:
+            values = replicated_values(instance)
+            if instance.pk in existing:
+                manager.filter(pk=instance.pk).update(**values)
+        manager.bulk_create([
+            model(pk=instance.pk, **replicated_values(instance))
+            for instance in instances if instance.pk not in existing
+        ])
+
+
+def remove_replica(instance):
+    """Убрать пользователя или группу из шардов вместе с зависимыми строками.
+
+    Удаление без сигналов: основная база уже сделала своё каскадное
+    удаление, а в шарде остаются только посты и комментарии.
+    """
+    from .models import Comment, Group, Post
+
+    for alias in settings.POST_SHARDS:
+        posts = Post._base_manager.using(alias)
+        comments = Comment._base_manager.using(alias)
+        if isinstance(instance, Group):
+            posts.filter(group_id=instance.pk).update(group=None)
+        else:
+            comments.filter(
+                models.Q(author_id=instance.pk)
+                | models.Q(post__author_id=instance.pk)
+            )._raw_delete(alias)
+            posts.filter(author_id=instance.pk)._raw_delete(alias)
+        type(instance)._base_manager.using(alias).filter(
+            pk=instance.pk
+        )._raw_delete(alias)
@@ -0,0 +1,209 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    autocomplete, blobs, feeds, page_cache, shards, stats, timelines
+)
+from .models import Comment, Follow, Group, Post, PostDirectory, User
+from .thumbnails import thumbnails_built
+
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _usernames(*user_ids):
+    return User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True
+    )
+
+
+def _slugs(*group_ids):
+    return Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+
+
+def _bump_post_pages(post, previous_group_id=None):
+    page_cache.bump(
+        page_cache.INDEX_NAMESPACE,
+        page_cache.post_namespace(post.pk),
+        *map(page_cache.author_namespace, _usernames(post.author_id)),
+        *map(page_cache.group_namespace,
+             _slugs(post.group_id, previous_group_id)),
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_pre_save(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance._state.adding and not raw and shards.enabled():
+        # Глобальный id из каталога, по которому потом находится шард
+        instance.pk = PostDirectory.objects.create(
+            author_id=instance.author_id
+        ).pk
+    elif instance.pk and not raw:
+        previous = Post.objects.for_post(instance.pk).filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first()
+    instance._previous_group_id, instance._previous_image = (
+        previous or (None, '')
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        # Инбоксы ссылаются на посты основной базы, с шардами лента
+        # подписок собирается из шардов
+        if not shards.enabled():
+            feeds.fan_out_post(instance)
+        timelines.push_post(instance)
+        stats.change(instance.author_id, posts=1)
+    image = instance.image.name or ''
+    previous_image = getattr(instance, '_previous_image', '')
+    if image != previous_image:
+        blobs.acquire(image)
+        blobs.release(previous_image)
+    _bump_post_pages(
+        instance, getattr(instance, '_previous_group_id', None)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if shards.enabled():
+        PostDirectory.objects.filter(pk=instance.pk).delete()
+    timelines.remove_post(instance)
+    stats.change(instance.author_id, posts=-1)
+    blobs.release(instance.image.name)
+    _bump_post_pages(instance)
+
+
+@receiver(thumbnails_built)
+def post_thumbnails_built(sender, name, **kwargs):
+    # Страницы могли закэшироваться с исходной картинкой вместо srcset
+    for queryset in shards.each(Post.objects.filter(image=name).only(
+        'pk', 'author_id', 'group_id'
+    ).order_by()):
+        for post in queryset:
+            _bump_post_pages(post)
+
+
+def _bump_comment_pages(comment):
+    page_cache.bump(
+        page_cache.post_namespace(comment.post_id),
+        *map(page_cache.author_namespace, _usernames(comment.author_id)),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.change(instance.author_id, comments=1)
+    _bump_comment_pages(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, comments=-1)
+    _bump_comment_pages(instance)
+
+
+@receiver(pre_save, sender=Group)
+def group_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk and not raw:
+        instance._previous_slug = _slugs(instance.pk).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        if kwargs['signal'] is post_delete:
+            autocomplete.group_deleted(instance)
+        else:
+            autocomplete.group_changed(
+                instance, getattr(instance, '_previous_slug', None)
+            )
+        if shards.enabled():
+            if kwargs['signal'] is post_delete:
+                shards.remove_replica(instance)
+            else:
+                shards.replicate([instance])
+        page_cache.bump(
+            page_cache.INDEX_NAMESPACE,
+            page_cache.group_namespace(instance.slug),
+            page_cache.group_namespace(
+                getattr(instance, '_previous_slug', None) or instance.slug
+            ),
+        )
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    instance._name_changed = False
+    instance._previous_username = None
+    if raw or not instance.pk:
+        return
+    if update_fields and not set(update_fields) & set(USER_NAME_FIELDS):
+        return
+    previous = User.objects.filter(pk=instance.pk).values_list(
+        *USER_NAME_FIELDS
+    ).first()
+    current = tuple(getattr(instance, field) for field in USER_NAME_FIELDS)
+    instance._name_changed = previous != current
+    if previous is not None:
+        instance._previous_username = previous[0]
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if getattr(instance, '_name_changed', False):
+        page_cache.bump(page_cache.USERS_NAMESPACE)
+    if created and not raw or getattr(instance, '_name_changed', False):
+        autocomplete.user_changed(
+            instance, getattr(instance, '_previous_username', None)
+        )
+    if not raw and shards.enabled() and (
+        update_fields is None
+        or set(update_fields) & set(shards.REPLICATED_USER_FIELDS)
+    ):
+        shards.replicate([instance])
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.user_deleted(instance)
+    if shards.enabled():
+        shards.remove_replica(instance)
+
+
+def _bump_follow_pages(follow):
+    page_cache.bump(*map(
+        page_cache.author_namespace,
+        _usernames(follow.author_id, follow.user_id),
+    ))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        if not shards.enabled():
+            feeds.backfill_inbox(instance.user_id, instance.author_id)
+        stats.change(instance.author_id, followers=1)
+        stats.change(instance.user_id, following=1)
+        _bump_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feeds.prune_inbox(instance.user_id, instance.author_id)
+    stats.change(instance.author_id, followers=-1)
+    stats.change(instance.user_id, following=-1)
+    _bump_follow_pages(instance)
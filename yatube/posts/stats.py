@@ -0,0 +1,71 @@
+"""Денормализованные счётчики авторов.
+
+Счётчики меняются атомарно через F()-выражения в сигналах. Если строки
+статистики ещё нет, её создаёт пересчётом по исходным таблицам первое
+изменение; чтение же только считает, ничего не записывая. Накопившийся
+дрейф исправляет команда reconcile_author_stats.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from . import shards
+from .models import AuthorStats, Comment, Follow, Post
+
+STAT_FIELDS = ('posts', 'comments', 'followers', 'following')
+
+
+def count_stats(author_ids):
+    """Точные значения счётчиков для пачки авторов: {id: {поле: число}}."""
+    sources = (
+        ('posts', Post, 'author'),
+        ('comments', Comment, 'author'),
+        ('followers', Follow, 'author'),
+        ('following', Follow, 'user'),
+    )
+    counts = {
+        author_id: dict.fromkeys(STAT_FIELDS, 0) for author_id in author_ids
+    }
+    for field, model, owner in sources:
+        rows = model.objects.filter(**{f'{owner}__in': author_ids}).values(
+            owner
+        ).annotate(total=Count('pk')).values_list(owner, 'total').order_by()
+        # Комментарии автора разбросаны по шардам чужих постов
+        queries = shards.each(rows) if model in (Post, Comment) else [rows]
+        for query in queries:
+            for author_id, total in query:
+                counts[author_id][field] += total
+    return counts
+
+
+def recount(author_id):
+    values = count_stats([author_id])[author_id]
+    stats, _ = AuthorStats.objects.update_or_create(
+        author_id=author_id, defaults=values
+    )
+    return stats
+
+
+def change(author_id, **deltas):
+    """Изменить счётчики автора на deltas одним UPDATE."""
+    updated = AuthorStats.objects.filter(author_id=author_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if updated or min(deltas.values()) < 0:
+        return
+    try:
+        with transaction.atomic():
+            recount(author_id)
+    except IntegrityError:
+        change(author_id, **deltas)
+
+
+def get_stats(author):
+    """Статистика автора одним запросом по первичному ключу.
+
+    Без строки возвращаются несохранённые точные значения: GET не пишет
+    в базу.
+    """
+    stats = AuthorStats.objects.filter(author=author).first()
+    if stats is not None:
+        return stats
+    return AuthorStats(author=author, **count_stats([author.pk])[author.pk])
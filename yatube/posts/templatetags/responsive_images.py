@@ -0,0 +1,37 @@
+from django import template
+from sorl.thumbnail.images import ImageFile
+
+from posts.thumbnails import lookup_thumbnails
+
+register = template.Library()
+
+# Карточка занимает всю ширину колонки, но не больше 960px
+CARD_SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+def _srcset(thumbnails):
+    return ', '.join(f'{im.url} {im.x}w' for im in thumbnails)
+
+
+@register.inclusion_tag('posts/includes/responsive_image.html')
+def responsive_image(image, css_class='card-img my-2'):
+    """<picture> с srcset по ширинам, WebP рядом с JPEG и размерами.
+
+    Берутся только уже построенные миниатюры; пока их нет, выводится
+    исходная картинка.
+    """
+    context = {'css_class': css_class, 'sizes': CARD_SIZES}
+    if not image:
+        return context
+    # В карточках из PostCard картинка — просто имя файла
+    context['image'] = ImageFile(image)
+    thumbnails = lookup_thumbnails(image)
+    jpeg = thumbnails.get('JPEG')
+    if jpeg:
+        # Самый широкий вариант — для браузеров без srcset
+        context.update(
+            fallback=jpeg[-1],
+            srcset=_srcset(jpeg),
+            webp_srcset=_srcset(thumbnails.get('WEBP', ())),
+        )
+    return context
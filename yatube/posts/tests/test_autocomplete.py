@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import autocomplete, page_cache
+from posts.models import Group
+
+
+User = get_user_model()
+
+
+def values(prefix, limit=10):
+    return [
+        (entry.kind, entry.value)
+        for entry in autocomplete.complete(prefix, limit)
+    ]
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='ivan', first_name='Иван', last_name='Петров'
+        )
+        User.objects.create_user(username='ivanova')
+        cls.group = Group.objects.create(
+            title='Любители котов', slug='cats', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._index = None
+
+    def test_prefix_matches_usernames_names_and_titles(self):
+        self.assertEqual(
+            values('iva'), [('user', 'ivan'), ('user', 'ivanova')]
+        )
+        self.assertEqual(values('ПЕТ'), [('user', 'ivan')])
+        self.assertEqual(values('иван п'), [('user', 'ivan')])
+        self.assertEqual(values('кот'), [('group', 'cats')])
+        self.assertEqual(values('cat'), [('group', 'cats')])
+        self.assertEqual(values('   '), [])
+        self.assertEqual(values('iva', limit=1), [('user', 'ivan')])
+
+    def test_user_matching_twice_is_listed_once(self):
+        """«иван» — и логин, и имя одного автора."""
+        self.assertEqual(
+            values('иван') + values('ivan'),
+            [('user', 'ivan'), ('user', 'ivan'), ('user', 'ivanova')],
+        )
+
+    def test_warm_index_does_not_query_database(self):
+        values('iva')
+        with self.assertNumQueries(0):
+            values('ива')
+
+    def test_new_generation_rebuilds_index_in_other_processes(self):
+        values('iva')
+        # Другой процесс создал автора и сдвинул поколение после коммита
+        User.objects.bulk_create([User(username='ivashka')])
+        self.assertEqual(values('ivas'), [])
+
+        page_cache.bump(autocomplete.NAMESPACE)
+
+        self.assertEqual(values('ivas'), [('user', 'ivashka')])
+
+    def test_journal_updates_index_without_rebuild(self):
+        """Изменение из другого процесса применяется без запросов к БД."""
+        values('iva')
+        # Другой процесс переименовал автора и записал это после коммита
+        autocomplete._append((
+            'user', 'ivan', autocomplete._user_item('ivan2', 'Иван', 'Петров')
+        ))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                values('iva'), [('user', 'ivan2'), ('user', 'ivanova')]
+            )
+            self.assertEqual(values('пет'), [('user', 'ivan2')])
+
+    def test_missing_journal_entry_rebuilds_index(self):
+        values('iva')
+        User.objects.bulk_create([User(username='ivashka')])
+        cache.add(autocomplete.SEQUENCE_KEY, 0)
+        cache.incr(autocomplete.SEQUENCE_KEY)
+
+        self.assertEqual(values('ivas'), [('user', 'ivashka')])
+
+    def test_endpoint_returns_json(self):
+        response = Client().get(reverse('posts:autocomplete'), {'q': 'пет'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'results': [{
+            'type': 'user',
+            'value': 'ivan',
+            'label': 'Иван Петров (ivan)',
+            'url': reverse('posts:profile', args=['ivan']),
+        }]})
+
+
+class AutocompleteCommitTests(TransactionTestCase):
+    """Свой индекс меняется только после коммита."""
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._index = None
+        self.user = User.objects.create_user(
+            username='ivan', first_name='Иван', last_name='Петров'
+        )
+        self.group = Group.objects.create(
+            title='Любители котов', slug='cats', description='Описание'
+        )
+
+    def test_index_follows_user_and_group_saves(self):
+        values('iva')
+        user = User.objects.get(pk=self.user.pk)
+        user.last_name = 'Сидоров'
+        user.save()
+        User.objects.create_user(username='ivashka')
+        group = Group.objects.get(pk=self.group.pk)
+        group.delete()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(values('петр'), [])
+            self.assertEqual(values('сид'), [('user', 'ivan')])
+            self.assertEqual(values('ivas'), [('user', 'ivashka')])
+            self.assertEqual(values('кот'), [])
+
+    def test_rolled_back_change_stays_out_of_index(self):
+        values('iva')
+
+        with transaction.atomic():
+            User.objects.create_user(username='ivashka')
+            self.assertEqual(values('ivas'), [])
+            transaction.set_rollback(True)
+
+        self.assertEqual(values('ivas'), [])
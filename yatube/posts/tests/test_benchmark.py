@@ -0,0 +1,57 @@
+from django.test import TestCase
+
+from posts import benchmark
+from posts.models import AuthorStats, Comment, FeedEntry, Follow, Post
+
+SIZES = {'users': 6, 'groups': 2, 'posts': 40, 'follows': 2, 'comments': 30}
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = benchmark.seed(SIZES, seed=1, batch_size=7)
+
+    def test_seed_builds_dataset_and_derived_tables(self):
+        self.assertEqual(self.counts['posts_post'], 40)
+        self.assertEqual(self.counts['posts_comment'], 30)
+        self.assertEqual(self.counts['posts_follow'], 12)
+        self.assertEqual(
+            FeedEntry.objects.count(),
+            Post.objects.filter(
+                author__following__isnull=False
+            ).count(),
+        )
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts', flat=True)), 40
+        )
+        # Даты разбросаны, а не проставлены auto_now_add
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+
+    def test_measure_covers_every_url_and_rolls_back(self):
+        results = benchmark.measure(benchmark.targets(3, seed=1))
+
+        self.assertEqual(
+            set(results),
+            {scenario.name for scenario in benchmark.SCENARIOS},
+        )
+        for result in results.values():
+            self.assertLessEqual(result['p50'], result['p99'])
+            self.assertGreater(result['queries'], 0)
+        self.assertGreater(results['index']['bytes'], 0)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertEqual(Follow.objects.count(), 12)
+
+    def test_percentile_and_regressions(self):
+        self.assertEqual(benchmark.percentile(range(1, 101), 95), 95)
+        self.assertEqual(benchmark.percentile([5], 99), 5)
+        baseline = {'index': {'p95': 10, 'bytes': 1000, 'queries': 2}}
+        self.assertEqual(benchmark.regressions(
+            {'index': {'p95': 11, 'bytes': 1000, 'queries': 2}},
+            baseline, 0.2,
+        ), [])
+        self.assertEqual(benchmark.regressions(
+            {'index': {'p95': 13, 'bytes': 1000, 'queries': 3}},
+            baseline, 0.2,
+        ), [('index', 'p95', 10, 13), ('index', 'queries', 2, 3)])
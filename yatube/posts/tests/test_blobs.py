@@ -0,0 +1,126 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from core.storage import ContentAddressedStorage
+from posts import thumbnails
+from posts.models import ImageBlob, Post
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def make_jpeg(name='meme.jpg', color='navy'):
+    buffer = BytesIO()
+    Image.new('RGB', (300, 200), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_name_is_content_hash(self):
+        storage = ContentAddressedStorage()
+        digest = hashlib.sha256(b'content').hexdigest()
+
+        name = storage.save('posts/any.JPG', ContentFile(b'content'))
+
+        self.assertEqual(name, f'posts/{digest[:2]}/{digest}.jpg')
+        with storage.open(name) as file_:
+            self.assertEqual(file_.read(), b'content')
+
+    def test_same_bytes_share_one_file(self):
+        storage = ContentAddressedStorage()
+
+        first = storage.save('posts/a.jpg', ContentFile(b'same'))
+        second = storage.save('posts/b.jpg', ContentFile(b'same'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(
+            storage.listdir(f'posts/{first.split("/")[1]}')[1],
+            [first.rsplit('/', 1)[1]],
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageBlobTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        self.author = User.objects.create_user(username='HasNoName')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def create_post(self, text, image):
+        self.client.post(
+            reverse('posts:post_create'),
+            data={'text': text, 'image': image},
+        )
+        return Post.objects.get(text=text)
+
+    def test_identical_uploads_share_file_and_thumbnails(self):
+        first = self.create_post('Первый', make_jpeg('a.jpg'))
+        second = self.create_post('Второй', make_jpeg('b.jpg'))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).references, 2
+        )
+        self.assertTrue(thumbnails.thumbnails_ready(first.image.name))
+
+    def test_file_is_freed_with_last_reference(self):
+        """Файл и миниатюры удаляются только вместе с последним постом."""
+        first = self.create_post('Первый', make_jpeg())
+        second = self.create_post('Второй', make_jpeg())
+        name = first.image.name
+        storage = first.image.storage
+
+        first.delete()
+
+        self.assertTrue(storage.exists(name))
+        self.assertTrue(thumbnails.thumbnails_ready(name))
+
+        second.delete()
+
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        self.assertFalse(thumbnails.thumbnails_ready(name))
+
+    def test_replaced_image_is_released(self):
+        post = self.create_post('Пост', make_jpeg())
+        old_name = post.image.name
+
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Пост', 'image': make_jpeg(color='red')},
+        )
+
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post.image.storage.exists(old_name))
+        self.assertEqual(
+            ImageBlob.objects.get(name=post.image.name).references, 1
+        )
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.cards import PostCard, as_cards
+from posts.models import Follow, Group, Post
+from posts.views import POSTS_QUANTITY
+
+
+User = get_user_model()
+
+
+class PostCardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='HasNoName', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testgroup',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост с длинным текстом',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def test_card_has_template_fields(self):
+        """Карточка содержит всё, что выводят шаблоны ленты."""
+        with self.assertNumQueries(1):
+            card = as_cards(Post.objects.all())[0]
+
+        self.assertIsInstance(card, PostCard)
+        self.assertEqual(card, self.post)
+        self.assertEqual(str(card), str(self.post))
+        self.assertEqual(card.pub_date, self.post.pub_date)
+        self.assertEqual(str(card.author), self.author.username)
+        self.assertEqual(
+            card.author.get_full_name(), self.author.get_full_name()
+        )
+        self.assertEqual(card.group.slug, self.group.slug)
+        self.assertEqual(card.group.title, self.group.title)
+
+    def test_card_without_group(self):
+        post = Post.objects.create(text='Без группы', author=self.author)
+
+        card = as_cards(Post.objects.filter(pk=post.pk)).get()
+
+        self.assertIsNone(card.group)
+
+    def test_count_uses_posts_without_card_joins(self):
+        """count() считает посты без JOIN карточки, с filter, срезами и т.д."""
+        Post.objects.create(text='Без группы', author=self.author)
+        cards = as_cards(Post.objects.all())
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(cards.count(), 2)
+        self.assertNotIn('JOIN', context.captured_queries[0]['sql'])
+        self.assertEqual(cards.filter(group=self.group).count(), 1)
+        self.assertEqual(cards.exclude(group=self.group).count(), 1)
+        self.assertEqual(cards[1:].count(), 1)
+        self.assertEqual(cards.distinct().count(), 2)
+        self.assertEqual(
+            cards.annotate(replies=Count('comments')).filter(
+                replies=0
+            ).order_by('pk').count(),
+            2,
+        )
+
+    def test_card_hashes_like_post(self):
+        """Равные карточка и пост попадают в одну ячейку множества."""
+        card = as_cards(Post.objects.filter(pk=self.post.pk)).get()
+
+        self.assertEqual(hash(card), hash(self.post))
+        self.assertIn(self.post, {card})
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='HasNoName')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testgroup',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт с числом карточек на странице."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+        Post.objects.create(text='Пост', author=self.author, group=self.group)
+        single = [self.count_queries(url) for url in urls]
+
+        for number in range(POSTS_QUANTITY):
+            Post.objects.create(
+                text=f'Пост {number}', author=self.author, group=self.group
+            )
+
+        for url, expected in zip(urls, single):
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), expected)
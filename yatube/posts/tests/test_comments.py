@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+
+User = get_user_model()
+COMMENTS_PAGE_SIZE = 3
+
+
+@override_settings(COMMENTS_PAGE_SIZE=COMMENTS_PAGE_SIZE)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        for number in range(COMMENTS_PAGE_SIZE + 2):
+            commentator = User.objects.create_user(username=f'user{number}')
+            Comment.objects.create(
+                post=cls.post, author=commentator, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments),
+            list(Comment.objects.all()[:COMMENTS_PAGE_SIZE]),
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, comments.next_cursor)
+
+    def test_comments_fragment_loads_rest(self):
+        """Фрагмент по курсору отдаёт оставшиеся комментарии."""
+        first_page = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse(
+                    'posts:post_comments', kwargs={'post_id': self.post.pk}
+                ),
+                {'cursor': first_page.next_cursor},
+            )
+
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            list(response.context['comments']),
+            list(Comment.objects.all()[COMMENTS_PAGE_SIZE:]),
+        )
+        self.assertNotContains(response, 'Показать ещё')
+        self.assertContains(response, 'user4')
+
+    def test_comments_fragment_rejects_broken_cursor(self):
+        """Испорченный курсор — 404, а не повтор первой порции."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': 'не-курсор'},
+        )
+
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.feeds import fan_out_post
+from posts.models import FeedEntry, Follow, Post
+
+
+User = get_user_model()
+
+
+class FeedInboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def follow(self):
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в инбокс подписчика."""
+        Follow.objects.create(user=self.user, author=self.author)
+
+        post = Post.objects.create(text='Новый пост', author=self.author)
+
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    def test_follow_backfills_recent_posts(self):
+        """Подписка добавляет в инбокс уже опубликованные посты."""
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            for number in range(3)
+        ]
+
+        self.follow()
+
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.user).values_list(
+                'post', flat=True
+            )),
+            {post.pk for post in posts},
+        )
+
+    def test_unfollow_prunes_inbox(self):
+        """Отписка удаляет посты автора из инбокса."""
+        self.follow()
+        Post.objects.create(text='Новый пост', author=self.author)
+
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(FEED_INBOX_LIMIT=2)
+    def test_inbox_is_capped(self):
+        """Длина инбокса ограничена FEED_INBOX_LIMIT."""
+        for number in range(4):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+
+        self.follow()
+
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.user).values_list(
+                'post', flat=True
+            )),
+            list(Post.objects.values_list('pk', flat=True)[:2]),
+        )
+
+    @override_settings(FEED_INBOX_LIMIT=2)
+    def test_fan_out_keeps_inbox_capped(self):
+        """Новые посты вытесняют старые из ленты уже при записи."""
+        self.follow()
+        for number in range(4):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.user).values_list(
+                'post', flat=True
+            )),
+            list(Post.objects.values_list('pk', flat=True)[:2]),
+        )
+
+    @override_settings(FEED_INBOX_LIMIT=1)
+    def test_fan_out_trims_all_inboxes_at_once(self):
+        """Ленты всех подписчиков обрезаются одним запросом."""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(5)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=self.author) for reader in readers
+        )
+        old = Post.objects.create(text='Старый пост', author=self.author)
+        new = Post.objects.create(text='Новый пост', author=self.author)
+        FeedEntry.objects.create(
+            user=readers[0], post=old, author=self.author,
+            pub_date=old.pub_date,
+        )
+
+        with self.assertNumQueries(3):
+            fan_out_post(new)
+
+        self.assertFalse(FeedEntry.objects.filter(post=old).exists())
+        self.assertEqual(
+            FeedEntry.objects.filter(user__in=readers).count(), len(readers)
+        )
+
+    def test_follow_index_reads_inbox(self):
+        self.follow()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.user)
+
+        response = self.client.get(reverse('posts:follow_index'))
+
+        self.assertEqual(list(response.context['page_obj']), [post])
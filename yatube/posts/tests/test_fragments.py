@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import fragments
+from posts.cards import as_cards
+from posts.models import Group, Post
+
+
+User = get_user_model()
+TEMPLATE = 'posts/includes/post_list.html'
+
+
+class PostCardFragmentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='testgroup',
+            description='Тестовое описание'
+        )
+        for number in range(3):
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self):
+        with mock.patch.object(
+            fragments, 'render_to_string', wraps=fragments.render_to_string
+        ) as render_to_string:
+            cards = fragments.render_cards(
+                as_cards(Post.objects.all()), TEMPLATE
+            )
+        return cards, render_to_string.call_count
+
+    def test_only_misses_are_rendered(self):
+        """Повторная отрисовка страницы берёт все карточки из кэша."""
+        first, first_renders = self.render()
+        second, second_renders = self.render()
+
+        self.assertEqual(first_renders, 3)
+        self.assertEqual(second_renders, 0)
+        self.assertEqual(first, second)
+
+    def test_changes_invalidate_cards(self):
+        """Правка поста, имени автора или группы меняет версию карточки."""
+        self.render()
+        changes = (
+            lambda: Post.objects.filter(text='Пост 0').update(text='Новый'),
+            lambda: User.objects.filter(pk=self.author.pk).update(
+                first_name='Лев'
+            ),
+            lambda: Group.objects.filter(pk=self.group.pk).update(
+                title='Новая группа'
+            ),
+        )
+
+        for change in changes:
+            with self.subTest(change=change):
+                change()
+                cards, renders = self.render()
+                self.assertGreater(renders, 0)
+
+        self.assertIn('Новый', ''.join(html for _, html in cards))
+
+    def test_index_renders_cached_cards(self):
+        response = Client().get(reverse('posts:index'))
+
+        self.assertContains(response, 'Пост 2')
+        self.assertContains(
+            response,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
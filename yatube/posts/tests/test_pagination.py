@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.pagination import CursorPaginator, InvalidCursor
+from posts.views import POSTS_QUANTITY
+
+
+User = get_user_model()
+TEST_POSTS = POSTS_QUANTITY * 2 + 5
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='HasNoName')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.author)
+            for number in range(TEST_POSTS)
+        )
+
+    def walk(self, paginator):
+        page = paginator.get_page(None)
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(page)
+        return seen
+
+    def test_pages_cover_all_posts_in_order(self):
+        """Курсоры проходят все посты по порядку без повторов."""
+        paginator = CursorPaginator(Post.objects.all(), POSTS_QUANTITY)
+
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+
+        self.assertEqual(self.walk(paginator), expected)
+
+    def test_page_does_not_count(self):
+        """Получение страницы не выполняет COUNT(*)."""
+        paginator = CursorPaginator(Post.objects.all(), POSTS_QUANTITY)
+        first_page = paginator.get_page(None)
+
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_page(first_page.next_cursor))
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+
+    def test_new_posts_do_not_shift_pages(self):
+        """Новые посты не сдвигают следующую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), POSTS_QUANTITY)
+        first_page = paginator.get_page(None)
+        expected = list(paginator.get_page(first_page.next_cursor))
+
+        Post.objects.create(text='Свежий пост', author=self.author)
+
+        self.assertEqual(
+            list(paginator.get_page(first_page.next_cursor)), expected
+        )
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = CursorPaginator(Post.objects.all(), POSTS_QUANTITY)
+        first_page = paginator.get_page(None)
+        second_page = paginator.get_page(first_page.next_cursor)
+
+        previous_page = paginator.get_page(second_page.previous_cursor)
+
+        self.assertEqual(list(previous_page), list(first_page))
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(previous_page.has_next())
+
+    def test_invalid_cursor_is_rejected(self):
+        paginator = CursorPaginator(Post.objects.all(), POSTS_QUANTITY)
+
+        with self.assertRaises(InvalidCursor):
+            paginator.get_page('не-курсор')
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginationViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='HasNoName')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=cls.author)
+            for number in range(POSTS_QUANTITY + 3)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_profile_uses_cursor_links(self):
+        url = reverse('posts:profile', kwargs={'username': 'HasNoName'})
+
+        response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        second = self.client.get(url, {'cursor': page_obj.next_cursor})
+
+        self.assertEqual(len(page_obj), POSTS_QUANTITY)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        self.assertEqual(len(second.context['page_obj']), 3)
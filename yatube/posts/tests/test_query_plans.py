@@ -0,0 +1,174 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.thumbnails import thumbnails_built
+
+User = get_user_model()
+
+# «SCAN posts_post» без USING INDEX — чтение всей таблицы
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Намеренные полные проходы: подсказки собирают все имена один раз на
+# поколение (posts.autocomplete), а форма поста перечисляет все группы
+ALLOWED_SCANS = {
+    'posts:autocomplete': {'auth_user', 'posts_group'},
+    'posts:post_create': {'posts_group'},
+}
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN для каждого запроса представлений posts.
+
+    Запрос не должен читать таблицу целиком или сортировать строки во
+    временном B-дереве: на большой базе это и делает ленты медленными.
+    Ранжирование полнотекстового поиска (виртуальная таблица FTS5)
+    сортирует по bm25 и в проверку не входит.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for author in cls.authors[:3]:
+            Follow.objects.create(user=cls.reader, author=author)
+        for number in range(60):
+            post = Post.objects.create(
+                author=cls.authors[number % 5],
+                text=f'Пост номер {number}',
+                group=cls.group if number % 2 else None,
+            )
+            for reply in range(2):
+                Comment.objects.create(
+                    post=post, author=cls.reader, text=f'Ответ {reply}'
+                )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def capture(self, method, url, data=None):
+        """Выполнить запрос и вернуть SQL выборок с параметрами."""
+        queries, response = self.capture_selects(
+            lambda: getattr(self.client, method)(url, data or {})
+        )
+        self.assertLess(response.status_code, 400, url)
+        return queries
+
+    @staticmethod
+    def capture_selects(action):
+        """Вызвать action; вернуть SQL его выборок и результат."""
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            result = action()
+        return queries, result
+
+    def plan_problems(self, sql, params, allowed_scans=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            details = [row[-1] for row in cursor.fetchall()]
+        if any('VIRTUAL TABLE' in detail for detail in details):
+            return []
+        problems = []
+        for detail in details:
+            scan = FULL_SCAN.match(detail)
+            if scan and scan.group('table') not in allowed_scans:
+                problems.append(detail)
+            elif TEMP_SORT in detail:
+                problems.append(detail)
+        return problems
+
+    def assertIndexedPlans(self, name, args=(), method='get', data=None):
+        url = reverse(name, args=args)
+        allowed_scans = ALLOWED_SCANS.get(name, ())
+        for sql, params in self.capture(method, url, data):
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(
+                    self.plan_problems(sql, params, allowed_scans), []
+                )
+
+    def assert_feeds_indexed(self):
+        author = self.authors[0].username
+        self.assertIndexedPlans('posts:index')
+        self.assertIndexedPlans('posts:group_list', [self.group.slug])
+        self.assertIndexedPlans('posts:profile', [author])
+        self.assertIndexedPlans('posts:follow_index')
+
+    def test_feed_plans(self):
+        self.assert_feeds_indexed()
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_feed_plans_with_cursor_pagination(self):
+        self.assert_feeds_indexed()
+
+    def test_follow_feed_backends(self):
+        for backend in ('inbox', 'join', 'merge'):
+            with self.subTest(backend=backend), override_settings(
+                FOLLOW_FEED_BACKEND=backend
+            ):
+                cache.clear()
+                self.assertIndexedPlans('posts:follow_index')
+
+    def test_post_plans(self):
+        post_id = self.post.pk
+        self.assertIndexedPlans('posts:post_detail', [post_id])
+        self.assertIndexedPlans('posts:post_comments', [post_id])
+        self.assertIndexedPlans(
+            'posts:add_comment', [post_id], 'post', {'text': 'Ещё ответ'}
+        )
+        self.assertIndexedPlans('posts:post_create')
+        self.assertIndexedPlans(
+            'posts:post_create', method='post', data={'text': 'Новый пост'}
+        )
+
+    def test_search_and_autocomplete_plans(self):
+        self.assertIndexedPlans('posts:search', data={'q': 'пост'})
+        self.assertIndexedPlans('posts:autocomplete', data={'q': 'auth'})
+
+    def test_follow_plans(self):
+        author = self.authors[4].username
+        self.assertIndexedPlans('posts:profile_follow', [author])
+        self.assertIndexedPlans('posts:profile_unfollow', [author])
+
+    def test_thumbnails_built_plans(self):
+        """Посты с готовыми миниатюрами ищутся по индексу картинки."""
+        name = 'posts/picture.jpg'
+        Post.objects.filter(pk=self.post.pk).update(image=name)
+
+        queries, _ = self.capture_selects(
+            lambda: thumbnails_built.send(sender=None, name=name)
+        )
+
+        self.assertTrue(any('"image"' in sql for sql, _ in queries))
+        for sql, params in queries:
+            with self.subTest(sql=sql):
+                self.assertEqual(self.plan_problems(sql, params), [])
+
+    def test_plan_check_detects_problems(self):
+        """Сама проверка ловит полный проход и сортировку."""
+        self.assertEqual(
+            self.plan_problems(
+                'SELECT id FROM posts_post WHERE text LIKE %s ORDER BY text',
+                ['Пост'],
+            ),
+            ['SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY'],
+        )
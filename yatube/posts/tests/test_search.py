@@ -0,0 +1,136 @@
+from io import StringIO
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Group, Post
+from posts.views import POSTS_QUANTITY
+
+
+User = get_user_model()
+
+
+def found(query, kinds=search.KINDS):
+    return [
+        (hit.kind, hit.object.pk)
+        for hit in search.SearchResults(query, kinds)[:100]
+    ]
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Питомцы', slug='pets', description='Всё о кошках'
+        )
+        cls.post = Post.objects.create(
+            text='Рыжий кот спит на диване', author=cls.author,
+            group=cls.group,
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.author, text='Какой пушистый кот!'
+        )
+
+    def test_triggers_index_all_kinds(self):
+        self.assertEqual(
+            sorted(found('кот')),
+            [('comment', self.comment.pk), ('post', self.post.pk)],
+        )
+        self.assertEqual(found('кошках'), [('group', self.group.pk)])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Правка, update() и удаление сразу видны в индексе."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Собака гуляет'
+        post.save()
+        Comment.objects.filter(pk=self.comment.pk).update(text='Лает')
+
+        self.assertEqual(found('собака'), [('post', post.pk)])
+        self.assertEqual(found('кот'), [])
+
+        post.delete()
+
+        self.assertEqual(found('собака'), [])
+        self.assertEqual(found('лает'), [])
+
+    def test_query_is_case_insensitive_and_prefix(self):
+        self.assertEqual(found('РЫЖ'), [('post', self.post.pk)])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(found('кот OR "собака'), [])
+        self.assertEqual(found('***'), [])
+
+    def test_group_title_ranks_first(self):
+        Post.objects.create(text='Питомцы и питомцы', author=self.author)
+
+        self.assertEqual(found('питомцы')[0], ('group', self.group.pk))
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        Post.objects.create(text='<b>жирный</b> текст', author=self.author)
+
+        hit = search.SearchResults('жирный')[0]
+
+        self.assertIn('&lt;b&gt;<mark>жирный</mark>&lt;/b&gt;', hit.snippet)
+
+    def test_rebuild_command_restores_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        stdout = StringIO()
+
+        call_command('rebuild_search_index', chunk_size=1, stdout=stdout)
+
+        self.assertEqual(len(found('кот')), 2)
+        self.assertIn('group — 1', stdout.getvalue())
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='HasNoName')
+        Post.objects.bulk_create(
+            Post(text=f'Заметка про погоду {number}', author=cls.author)
+            for number in range(POSTS_QUANTITY + 3)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_results_are_paginated_with_query(self):
+        url = reverse('posts:search')
+
+        response = self.client.get(url, {'q': 'погод'})
+        second = self.client.get(url, {'q': 'погод', 'page': 2})
+
+        self.assertEqual(len(response.context['page_obj']), POSTS_QUANTITY)
+        self.assertContains(response, '<mark>погоду</mark>')
+        self.assertContains(
+            response, f'?{urlencode({"q": "погод"})}&amp;page=2'
+        )
+        self.assertEqual(len(second.context['page_obj']), 3)
+
+    def test_empty_query_shows_form_only(self):
+        response = self.client.get(reverse('posts:search'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        Post.objects.create(text='Про снег', author=self.author)
+
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'снег'}
+        )
+
+        self.assertEqual(response.context['cl'].result_count, 1)
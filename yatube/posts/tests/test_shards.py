@@ -0,0 +1,314 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import shards
+from posts.models import Comment, Follow, Group, Post, PostDirectory
+from posts.search import SearchResults, filter_queryset, rebuild_index
+from posts.views import POSTS_QUANTITY
+
+User = get_user_model()
+SHARDS = ('shard0', 'shard1')
+
+
+class ShardedTestCase(TestCase):
+    """Тесты на двух шардах — SQLite-файлах во временном каталоге."""
+    databases = {'default', *SHARDS}
+    shards = SHARDS
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.directory, f'{alias}.sqlite3'),
+            }
+        with override_settings(POST_SHARDS=SHARDS):
+            for alias in SHARDS:
+                call_command('migrate', database=alias, verbosity=0)
+        cls.shard_settings = override_settings(POST_SHARDS=cls.shards)
+        cls.shard_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.shard_settings.disable()
+        for alias in SHARDS:
+            connections[alias].close()
+            del connections.databases[alias]
+            delattr(connections._connections, alias)
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        cache.clear()
+        shards._post_authors.clear()
+
+    @staticmethod
+    def authors_on_each_shard(shard_list=SHARDS):
+        """По автору на каждый шард из shard_list."""
+        found = {}
+        number = 0
+        while len(found) < len(shard_list):
+            user = User.objects.create_user(username=f'author{number}')
+            found.setdefault(
+                shards.shard_for_author(user.pk, shard_list), user
+            )
+            number += 1
+        return [found[alias] for alias in shard_list]
+
+
+class ShardPlacementTests(ShardedTestCase):
+    def test_jump_hash_moves_only_to_new_bucket(self):
+        keys = range(2000)
+        before = [shards.jump_hash(key, 3) for key in keys]
+        after = [shards.jump_hash(key, 4) for key in keys]
+
+        moved = [b for a, b in zip(before, after) if a != b]
+        self.assertTrue(moved)
+        self.assertEqual(set(moved), {3})
+        self.assertLess(len(moved), len(keys) / 3)
+
+    def test_posts_and_comments_live_in_author_shard(self):
+        first, second = self.authors_on_each_shard()
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(author=first, text='Пост', group=group)
+        other = Post.objects.create(author=second, text='Другой')
+        comment = Comment.objects.create(
+            post=post, author=second, text='Комментарий'
+        )
+
+        self.assertEqual(post._state.db, 'shard0')
+        self.assertEqual(other._state.db, 'shard1')
+        self.assertEqual(
+            list(Comment.objects.using('shard0').values_list('pk')),
+            [(comment.pk,)],
+        )
+        self.assertFalse(Post.objects.using('default').exists())
+        # Id глобальные и известны каталогу
+        self.assertNotEqual(post.pk, other.pk)
+        self.assertEqual(
+            dict(PostDirectory.objects.values_list('pk', 'author_id')),
+            {post.pk: first.pk, other.pk: second.pk},
+        )
+
+    def test_users_and_groups_are_replicated_without_passwords(self):
+        user = User.objects.create_user(username='copy', password='secret')
+        group = Group.objects.create(title='Группа', slug='group')
+        user.first_name = 'Имя'
+        user.save()
+        group.delete()
+
+        for alias in SHARDS:
+            copy = User.objects.using(alias).get(pk=user.pk)
+            self.assertEqual(copy.first_name, 'Имя')
+            self.assertEqual(copy.password, '')
+            self.assertFalse(Group.objects.using(alias).exists())
+
+    def test_deleting_user_removes_shard_rows(self):
+        first, second = self.authors_on_each_shard()
+        post = Post.objects.create(author=first, text='Пост')
+        Comment.objects.create(post=post, author=second, text='Ответ')
+
+        User.objects.get(pk=first.pk).delete()
+
+        self.assertFalse(Post.objects.using('shard0').exists())
+        self.assertFalse(Comment.objects.using('shard0').exists())
+        self.assertFalse(PostDirectory.objects.exists())
+
+
+class ShardedViewsTests(ShardedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.authors_on_each_shard()
+        self.reader = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        now = timezone.now()
+        self.posts = []
+        # Чередование шардов по времени: слияние должно их перемешать
+        for number in range(POSTS_QUANTITY + 3):
+            post = Post.objects.create(
+                author=(self.first, self.second)[number % 2],
+                text=f'Пост {number}',
+            )
+            Post.objects.filter(pk=post.pk).using(post._state.db).update(
+                pub_date=now - timedelta(minutes=number)
+            )
+            self.posts.append(post)
+
+    def page_ids(self, response):
+        return [card.pk for card in response.context['page_obj']]
+
+    def test_index_merges_shards_by_pub_date(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            self.page_ids(response),
+            [post.pk for post in self.posts[:POSTS_QUANTITY]],
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertEqual(
+            self.page_ids(response),
+            [post.pk for post in self.posts[POSTS_QUANTITY:]],
+        )
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_cursor_pages_merge_shards(self):
+        response = self.client.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': page.next_cursor}
+        )
+        self.assertEqual(
+            self.page_ids(response),
+            [post.pk for post in self.posts[POSTS_QUANTITY:]],
+        )
+
+    def test_profile_and_detail_read_one_shard(self):
+        response = self.client.get(
+            reverse('posts:profile', args=[self.first.username])
+        )
+        self.assertEqual(self.page_ids(response), [
+            post.pk for post in self.posts[::2]
+        ][:POSTS_QUANTITY])
+
+        post = self.posts[1]
+        self.client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий'},
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertEqual(response.context['post'], post)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий'],
+        )
+        self.assertTrue(
+            Comment.objects.using('shard1').filter(post_id=post.pk).exists()
+        )
+
+    def test_follow_index_gathers_followed_authors(self):
+        Follow.objects.create(user=self.reader, author=self.second)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            self.page_ids(response), [post.pk for post in self.posts[1::2]]
+        )
+
+
+class ShardedSearchTests(ShardedTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.authors_on_each_shard()
+        self.post = Post.objects.create(
+            author=self.second, text='Черника в шарде'
+        )
+        Post.objects.create(author=self.first, text='Черника дома')
+        Comment.objects.create(
+            post=self.post, author=self.first, text='Ответ про чернику'
+        )
+
+    def test_results_gather_hits_from_every_shard(self):
+        self.assertEqual(self.post._state.db, 'shard1')
+        results = SearchResults('черника', kinds=('post',))
+
+        self.assertEqual(len(results), 2)
+        hits = list(results[:10])
+        self.assertEqual(
+            {hit.object.text for hit in hits},
+            {'Черника в шарде', 'Черника дома'},
+        )
+        hit = next(hit for hit in hits if hit.object.pk == self.post.pk)
+        self.assertEqual(hit.object._state.db, 'shard1')
+
+    def test_filter_queryset_finds_post_on_other_shard(self):
+        found = filter_queryset(Post.objects.all(), 'шарде')
+        self.assertEqual([post.pk for post in found], [self.post.pk])
+
+    def test_admin_search_lists_post_from_shard(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'шарде'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.post.pk],
+        )
+
+    def test_rebuild_indexes_each_shard(self):
+        counts = rebuild_index(chunk_size=1)
+
+        self.assertEqual(counts['post'], 2)
+        self.assertEqual(counts['comment'], 1)
+        self.assertEqual(len(SearchResults('шарде')), 1)
+
+
+class ShardOneTestCase(ShardedTestCase):
+    shards = SHARDS[:1]
+
+
+class RebalanceTests(ShardOneTestCase):
+    def test_new_shard_receives_its_authors(self):
+        first, second = self.authors_on_each_shard()
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(author=second, text='Пост', group=group)
+        Comment.objects.create(post=post, author=first, text='Ответ')
+        stay = Post.objects.create(author=first, text='Остаётся')
+        self.assertEqual(post._state.db, 'shard0')
+
+        out = StringIO()
+        with override_settings(POST_SHARDS=SHARDS):
+            call_command('rebalance_shards', stdout=out)
+            shards._post_authors.clear()
+            moved = Post.objects.for_post(post.pk).get(pk=post.pk)
+
+            self.assertEqual(moved._state.db, 'shard1')
+            self.assertEqual(moved.group.slug, 'group')
+            self.assertEqual(moved.comments.get().text, 'Ответ')
+            self.assertEqual(
+                list(Post.objects.using('shard0').values_list('pk')),
+                [(stay.pk,)],
+            )
+            response = Client().get(
+                reverse('posts:post_detail', args=[post.pk])
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertIn('shard0: перенесено постов 1, комментариев 1',
+                      out.getvalue())
+
+    def test_posts_from_main_database_move_with_their_ids(self):
+        with override_settings(POST_SHARDS=()):
+            author = User.objects.create_user(username='legacy')
+            post = Post.objects.create(author=author, text='Старый пост')
+        self.assertEqual(post._state.db, 'default')
+
+        call_command('rebalance_shards', source=['default'], stdout=StringIO())
+
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertEqual(
+            Post.objects.for_post(post.pk).get(pk=post.pk).text, 'Старый пост'
+        )
+        # Следующий id не пересекается со старыми
+        newer = Post.objects.create(author=author, text='Новый')
+        self.assertGreater(newer.pk, post.pk)
+
+    def test_requires_sharding_enabled(self):
+        with override_settings(POST_SHARDS=()):
+            with self.assertRaisesMessage(Exception, 'POST_SHARDS'):
+                call_command('rebalance_shards')
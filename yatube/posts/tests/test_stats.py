@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Follow, Post
+
+
+User = get_user_model()
+
+
+class AuthorStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(author=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.create(text='Ещё пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+
+        author_stats = self.stats(self.author)
+        reader_stats = self.stats(self.reader)
+        self.assertEqual(author_stats.posts, 2)
+        self.assertEqual(author_stats.followers, 1)
+        self.assertEqual(reader_stats.comments, 1)
+        self.assertEqual(reader_stats.following, 1)
+
+        post.delete()
+        follow.delete()
+
+        author_stats.refresh_from_db()
+        reader_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts, 1)
+        self.assertEqual(author_stats.followers, 0)
+        self.assertEqual(reader_stats.comments, 0)
+        self.assertEqual(reader_stats.following, 0)
+        self.assertFalse(Comment.objects.filter(pk=comment.pk).exists())
+
+    def test_profile_reads_counts_from_stats(self):
+        Post.objects.create(text='Пост', author=self.author)
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        Client().get(url)
+
+        # автор, статистика, COUNT пагинатора и страница карточек
+        with self.assertNumQueries(4):
+            response = Client().get(f'{url}?page=1')
+
+        self.assertEqual(response.context['posts_count'], 1)
+
+    def test_profile_without_stats_does_not_write(self):
+        """Профиль без строки статистики считает её, но не сохраняет."""
+        Post.objects.create(text='Пост', author=self.author)
+        AuthorStats.objects.filter(author=self.author).delete()
+
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': self.author})
+        )
+
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertFalse(
+            AuthorStats.objects.filter(author=self.author).exists()
+        )
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_author_stats исправляет расхождения."""
+        Post.objects.create(text='Пост', author=self.author)
+        AuthorStats.objects.filter(author=self.author).update(posts=10)
+        AuthorStats.objects.filter(author=self.reader).delete()
+
+        call_command(
+            'reconcile_author_stats', batch_size=1, stdout=StringIO()
+        )
+
+        self.assertEqual(self.stats(self.author).posts, 1)
+        self.assertEqual(self.stats(self.reader).posts, 0)
@@ -0,0 +1,161 @@
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import Post
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+
+def make_jpeg(name='photo.jpg', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'navy').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+def has_thumbnails(name):
+    return bool(default.kvstore._get(ImageFile(name).key, 'thumbnails'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPregenerationTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        # Одинаковые картинки разных тестов — один и тот же файл, а LRU
+        # хранилища ключей живёт весь процесс
+        default.kvstore.clear()
+        self.author = User.objects.create_user(username='HasNoName')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_post_create_builds_thumbnails(self):
+        """После публикации миниатюры уже готовы."""
+        self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': make_jpeg()},
+        )
+
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(has_thumbnails(post.image.name))
+
+    def test_locked_image_is_skipped(self):
+        """Миниатюры, которые уже строит другой воркер, не строятся."""
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=make_jpeg()
+        )
+        cache.add(thumbnails.LOCK_KEY.format(post.image.name), 1)
+
+        self.assertFalse(thumbnails.build_thumbnails(post.image.name))
+        self.assertFalse(has_thumbnails(post.image.name))
+
+    def test_warm_thumbnails_command(self):
+        post = Post.objects.create(
+            text='Пост', author=self.author, image=make_jpeg()
+        )
+
+        call_command('warm_thumbnails', workers=1, stdout=StringIO())
+
+        self.assertTrue(has_thumbnails(post.image.name))
+
+    def test_benchmark_thumbnails_command(self):
+        stdout = StringIO()
+
+        call_command(
+            'benchmark_thumbnails', generate=1, size='800x600', repeat=1,
+            stdout=stdout,
+        )
+
+        self.assertIn('ускорение', stdout.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ResponsiveImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Одинаковые картинки разных тестов — один и тот же файл, а LRU
+        # хранилища ключей живёт весь процесс
+        default.kvstore.clear()
+        self.author = User.objects.create_user(username='HasNoName')
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, image=make_jpeg()
+        )
+
+    def test_card_has_srcset_and_dimensions(self):
+        """Карточка выводит srcset всех ширин, размеры и lazy-загрузку."""
+        thumbnails.build_thumbnails(self.post.image.name)
+
+        response = self.client.get(reverse('posts:index'))
+
+        for width in thumbnails.CARD_WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f' {width}w')
+        self.assertContains(response, 'width="1440" height="509"')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_missing_thumbnails_fall_back_to_image(self):
+        """Без готовых миниатюр Pillow не вызывается, а выводится оригинал.
+        """
+        with mock.patch.object(
+            thumbnails, 'schedule_thumbnails'
+        ) as schedule, mock.patch(
+            'sorl.thumbnail.engines.pil_engine.Engine.get_image'
+        ) as get_image:
+            response = self.client.get(reverse('posts:index'))
+
+        schedule.assert_called_with(self.post.image.name)
+        get_image.assert_not_called()
+        self.assertContains(response, f'src="{self.post.image.url}"')
+        self.assertNotContains(response, 'srcset')
+
+    def test_built_thumbnails_refresh_cached_pages(self):
+        with mock.patch.object(thumbnails, 'schedule_thumbnails'):
+            self.client.get(reverse('posts:index'))
+
+        thumbnails.build_thumbnails(self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+
+        self.assertContains(response, 'srcset')
+
+
+@override_settings(THUMBNAIL_WORKERS=2)
+class ThumbnailQueueTests(TestCase):
+    def test_duplicate_jobs_are_dropped(self):
+        """Повторное задание для той же картинки не ставится в очередь."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_build(name):
+            started.set()
+            release.wait(5)
+
+        with mock.patch.object(
+            thumbnails, 'build_thumbnails', side_effect=slow_build
+        ) as build:
+            thumbnails._submit('posts/photo.jpg')
+            started.wait(5)
+            thumbnails._submit('posts/photo.jpg')
+            release.set()
+            thumbnails._get_executor().submit(lambda: None).result(5)
+
+        self.assertEqual(build.call_count, 1)
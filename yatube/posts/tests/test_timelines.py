@@ -0,0 +1,129 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timelines
+from posts.models import Follow, Post
+from posts.views import POSTS_QUANTITY
+
+
+User = get_user_model()
+
+
+class MergedTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        for number in range(POSTS_QUANTITY * 2):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=cls.authors[number % len(cls.authors)],
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_merge_matches_database_order(self):
+        """Слияние лент авторов совпадает с сортировкой в БД."""
+        author_ids = [author.pk for author in self.authors[:2]]
+        timeline = timelines.MergedTimeline(author_ids)
+
+        expected = list(Post.objects.filter(author__in=author_ids))
+
+        self.assertEqual(len(timeline), len(expected))
+        self.assertEqual(timeline[0:len(expected)], expected)
+        self.assertEqual(timeline[3:6], expected[3:6])
+
+    def test_warm_page_reads_posts_once(self):
+        """Со сложенными в кэш лентами страница — один запрос к постам."""
+        author_ids = [author.pk for author in self.authors]
+        timelines.get_timelines(author_ids)
+
+        with CaptureQueriesContext(connection) as queries:
+            timelines.MergedTimeline(author_ids)[0:POSTS_QUANTITY]
+
+        self.assertEqual(len(queries), 1)
+
+    def test_timeline_follows_saves_and_deletes(self):
+        """Лента автора обновляется при создании и удалении поста."""
+        author = self.authors[0]
+        timelines.get_timelines([author.pk])
+
+        post = Post.objects.create(text='Свежий пост', author=author)
+        self.assertEqual(timelines.MergedTimeline([author.pk])[0:1], [post])
+
+        post.delete()
+        self.assertNotIn(
+            post.pk, timelines.get_timelines([author.pk])[author.pk]
+        )
+
+    def test_update_under_foreign_lock_drops_timeline(self):
+        """Не дождавшись блокировки, запись сбрасывает ленту из кэша."""
+        author = self.authors[0]
+        timelines.get_timelines([author.pk])
+        cache.add(timelines.LOCK_KEY.format(author.pk), True)
+
+        with mock.patch.object(timelines, 'LOCK_ATTEMPTS', 1):
+            post = Post.objects.create(text='Свежий пост', author=author)
+
+        self.assertIsNone(cache.get(timelines.TIMELINE_KEY.format(author.pk)))
+        self.assertEqual(timelines.MergedTimeline([author.pk])[0:1], [post])
+
+    @override_settings(AUTHOR_TIMELINE_LENGTH=2)
+    def test_timeline_is_bounded(self):
+        author = self.authors[0]
+        timelines.get_timelines([author.pk])
+
+        Post.objects.create(text='Свежий пост', author=author)
+
+        self.assertEqual(len(timelines.MergedTimeline([author.pk])), 2)
+
+
+@override_settings(FOLLOW_FEED_BACKEND='merge')
+class MergeFollowIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_follow_index_merges_followed_authors(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.user)
+
+        response = self.client.get(reverse('posts:follow_index'))
+
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    @override_settings(POSTS_CURSOR_PAGINATION=True)
+    def test_follow_index_pages_by_cursor(self):
+        """С курсорной пагинацией слитая лента листается курсорами."""
+        Follow.objects.create(user=self.user, author=self.author)
+        for number in range(POSTS_QUANTITY + 2):
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+        expected = list(Post.objects.filter(author=self.author))
+        url = reverse('posts:follow_index')
+
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+
+        self.assertEqual(list(first), expected[:POSTS_QUANTITY])
+        self.assertEqual(list(second), expected[POSTS_QUANTITY:])
+        self.assertFalse(second.has_next())
+        self.assertEqual(list(back), list(first))
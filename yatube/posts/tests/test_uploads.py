@@ -0,0 +1,162 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, features
+
+from posts.models import ImageBlob, Post
+from posts.uploads import is_normalized, normalize_image, variant_name
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+ORIENTATION = 0x0112
+
+
+def make_image(name='photo.jpg', size=(300, 100), format_='JPEG',
+               mode='RGB', orientation=None):
+    buffer = BytesIO()
+    image = Image.new(mode, size, 'navy')
+    options = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[ORIENTATION] = orientation
+        options['exif'] = exif.tobytes()
+    image.save(buffer, format_, **options)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def open_master(result):
+    return Image.open(BytesIO(result.master.read()))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class NormalizeImageTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_orientation_applied_and_metadata_stripped(self):
+        """Картинка развёрнута по EXIF, а сами метаданные удалены."""
+        result = normalize_image(make_image(orientation=6))
+
+        image = open_master(result)
+        self.assertEqual(image.size, (100, 300))
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(image.format, 'JPEG')
+
+    @override_settings(POST_IMAGE_MAX_EDGE=100)
+    def test_longest_edge_is_capped(self):
+        result = normalize_image(make_image(size=(400, 200)))
+
+        self.assertEqual(open_master(result).size, (100, 50))
+
+    def test_transparent_png_becomes_jpeg(self):
+        result = normalize_image(
+            make_image('logo.png', format_='PNG', mode='RGBA')
+        )
+
+        self.assertEqual(result.master.name, 'logo.jpg')
+        self.assertEqual(open_master(result).mode, 'RGB')
+
+    def test_steps_are_timed(self):
+        result = normalize_image(make_image())
+
+        for step in ('decode', 'orient', 'strip', 'resize', 'encode'):
+            with self.subTest(step=step):
+                self.assertGreaterEqual(result.timings[step], 0)
+
+    def test_post_create_stores_normalized_master(self):
+        author = User.objects.create_user(username='HasNoName')
+        client = Client()
+        client.force_login(author)
+
+        client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': make_image('logo.png', format_='PNG'),
+            },
+        )
+
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertTrue(is_normalized(post.image.name))
+
+    def test_decompression_bomb_is_form_error(self):
+        """Слишком большая картинка — ошибка формы, а не 500."""
+        author = User.objects.create_user(username='HasNoName')
+        client = Client()
+        client.force_login(author)
+
+        with mock.patch(
+            'posts.forms.normalize_image',
+            side_effect=Image.DecompressionBombError('bomb'),
+        ):
+            response = client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Бомба', 'image': make_image()},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка слишком большая'
+        )
+        self.assertFalse(Post.objects.filter(text='Бомба').exists())
+
+    @override_settings(POST_IMAGE_MAX_EDGE=100)
+    def test_command_normalizes_existing_images(self):
+        author = User.objects.create_user(username='HasNoName')
+        name = default_storage.save(
+            'posts/old.png',
+            ContentFile(make_image(size=(400, 200), format_='PNG').read()),
+        )
+        post = Post.objects.create(text='Старый пост', author=author,
+                                   image=name)
+
+        call_command('normalize_post_images', stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertTrue(is_normalized(post.image.name))
+        self.assertFalse(ImageBlob.objects.filter(name=name).exists())
+        with default_storage.open(post.image.name) as file_:
+            self.assertEqual(Image.open(file_).size, (100, 50))
+
+    def test_command_skips_normalized_images(self):
+        author = User.objects.create_user(username='HasNoName')
+        result = normalize_image(make_image())
+        name = default_storage.save('posts/photo.jpg', result.master)
+        for extension, content in result.variants.items():
+            default_storage.save(
+                variant_name(name, extension), ContentFile(content)
+            )
+        Post.objects.create(text='Пост', author=author, image=name)
+        stdout = StringIO()
+
+        call_command('normalize_post_images', stdout=stdout)
+
+        self.assertIn('Нормализовано картинок: 0', stdout.getvalue())
+
+    def test_webp_variant_is_written(self):
+        if not features.check('webp'):
+            self.skipTest('Pillow собран без поддержки WebP')
+        result = normalize_image(make_image())
+
+        self.assertIn('.webp', result.variants)
+        self.assertEqual(
+            Image.open(BytesIO(result.variants['.webp'])).format, 'WEBP'
+        )
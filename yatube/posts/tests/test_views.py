@@ -1,9 +1,18 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
 from django import forms
 
+from core.replica import ReplicaRouter, confirm_replica, replica_reads
+from posts import page_cache
 from posts.models import Post, Group, Follow
 from posts.views import POSTS_QUANTITY
 
@@ -139,16 +148,11 @@ class PostPagesTests(TestCase):
     def test_cache_on_index_page(self):
         """Проверка кэширования главной страницы."""
         first_response = self.authorized_client.get(reverse('posts:index'))
-        form_data = {
-            'text': self.post.text,
-            'group': self.group.id
-        }
+        # bulk_create не отправляет сигналы, поэтому кэш не сбрасывается
+        Post.objects.bulk_create([
+            Post(text='Пост мимо сигналов', author=self.author)
+        ])
 
-        self.authorized_client.post(
-            reverse('posts:post_create'),
-            data=form_data,
-            follow=True
-        )
         response_aftr_test = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(first_response.content, response_aftr_test.content)
 
@@ -156,6 +160,52 @@ class PostPagesTests(TestCase):
         response_clr_cache = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first_response.content, response_clr_cache.content)
 
+    def test_new_post_invalidates_cached_pages(self):
+        """Новый пост сразу виден на закэшированных страницах."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        first_responses = [
+            self.authorized_client.get(page).content for page in pages
+        ]
+
+        self.authorized_author.post(
+            reverse('posts:post_create'),
+            data={'text': 'Свежий пост', 'group': self.group.id},
+        )
+
+        for page, first_content in zip(pages, first_responses):
+            with self.subTest(page=page):
+                content = self.authorized_client.get(page).content
+                self.assertNotEqual(content, first_content)
+                self.assertIn('Свежий пост'.encode(), content)
+
+    def test_cached_pages_are_not_shared_between_users(self):
+        """Закэшированная страница одного пользователя не видна другим."""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author})
+        )
+        self.assertContains(self.authorized_client.get(url), 'Отписаться')
+
+        for client in (self.authorized_author, Client()):
+            with self.subTest(client=client):
+                response = client.get(url)
+                self.assertNotContains(response, 'Отписаться')
+                self.assertNotContains(response, self.user.username)
+
+    def test_cache_follows_author_name(self):
+        """Смена имени автора сбрасывает кэш страниц с его постами."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.authorized_client.get(url)
+
+        self.author.first_name = 'Лев'
+        self.author.save()
+
+        self.assertContains(self.authorized_client.get(url), 'Лев')
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -318,3 +368,130 @@ class TestFollow(TestCase):
         self.assertEqual(Follow.objects.count(), follower_count - 1)
         self.assertFalse(Follow.objects.filter(
             user=self.user, author=self.user_2).exists())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        self.client = Client()
+        self.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_unchanged_page_answers_not_modified(self):
+        """Совпавший ETag или Last-Modified — 304 без рендеринга."""
+        # Посту нужен только автор: по нему сдвигается счётчик постов
+        queries = {self.pages[-1]: 1}
+        for page in self.pages:
+            with self.subTest(page=page):
+                response = self.client.get(page)
+                self.assertIn('no-cache', response['Cache-Control'])
+                with self.assertNumQueries(queries.get(page, 0)):
+                    not_modified = self.client.get(
+                        page, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.content, b'')
+                since = self.client.get(
+                    page, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(since.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """Новый пост автора в группе меняет ETag всех его страниц."""
+        etags = [self.client.get(page)['ETag'] for page in self.pages]
+
+        Post.objects.create(
+            text='Ещё пост', author=self.author, group=self.group
+        )
+
+        for page, etag in zip(self.pages, etags):
+            with self.subTest(page=page):
+                response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_etag_follows_csrf_cookie(self):
+        """После повторного входа форма комментария не берётся из 304."""
+        page = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client.force_login(self.author)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        etag = self.client.get(page)['ETag']
+        self.assertEqual(
+            self.client.get(page, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'b' * 64
+
+        response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_differs_per_user(self):
+        """Вошедший пользователь не получает 304 на гостевую страницу."""
+        page = reverse('posts:index')
+        etag = self.client.get(page)['ETag']
+        self.client.force_login(self.author)
+
+        response = self.client.get(page, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class ReplicaPageCacheTests(TestCase):
+    """Страница попадает в кэш из реплики, только если та её догнала."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.replica = os.path.join(directory.name, 'db.replica.sqlite3')
+        open(self.replica, 'w').close()
+        replica_settings = override_settings(
+            REPLICA_DATABASE='replica', REPLICA_PATH=self.replica
+        )
+        replica_settings.enable()
+        self.addCleanup(replica_settings.disable)
+
+    def read_database(self, decorator):
+        used = []
+
+        @decorator(lambda: ['index'])
+        @replica_reads
+        def view(request):
+            used.append(ReplicaRouter().db_for_read(Post))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        view(request)
+        return used
+
+    def test_stale_replica_is_not_read(self):
+        decorators = (
+            lambda names: page_cache.cache_page_by_generation(60, names),
+            page_cache.conditional_by_generation,
+        )
+        for decorator in decorators:
+            with self.subTest(decorator=decorator):
+                cache.clear()
+                page_cache.bump('index')
+                # Снимок сделан до записи, сдвинувшей поколение
+                snapshot = time.time() - 60
+                confirm_replica(self.replica, snapshot)
+                self.assertEqual(self.read_database(decorator), ['default'])
+
+                cache.clear()
+                page_cache.bump('index')
+                snapshot = time.time() + 60
+                confirm_replica(self.replica, snapshot)
+                self.assertEqual(self.read_database(decorator), ['replica'])
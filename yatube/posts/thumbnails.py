@@ -0,0 +1,171 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры создаются не в запросе первого читателя, а сразу после
+публикации или правки поста — в локальном пуле потоков. Одна и та же
+миниатюра строится ровно один раз: повторные задания в процессе
+отбрасываются, а между процессами работу делит блокировка в общем кэше.
+
+Шаблоны читают готовые миниатюры только из хранилища ключей sorl
+(lookup_thumbnails) и никогда не вызывают Pillow во время запроса.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.thumbnail_kvstore import thumbnail_name
+
+logger = logging.getLogger(__name__)
+
+# Ширины карточки для srcset, пропорции — как у прежней 960x339
+CARD_WIDTHS = (320, 640, 960, 1440)
+CARD_RATIO = 339 / 960
+THUMBNAIL_FORMATS = ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+
+
+def card_geometry(width):
+    return f'{width}x{round(width * CARD_RATIO)}'
+
+
+# Все варианты, в которых шаблоны выводят post.image
+THUMBNAIL_SPECS = tuple(
+    (card_geometry(width),
+     {'crop': 'center', 'upscale': True, 'format': format_})
+    for format_ in THUMBNAIL_FORMATS
+    for width in CARD_WIDTHS
+)
+LOCK_KEY = 'thumbnail-lock:{}'
+LOCK_TIMEOUT = 60
+
+# Отправляется, когда все миниатюры картинки построены
+thumbnails_built = Signal(providing_args=['name'])
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _source_name(image):
+    # Миниатюры строятся и ищутся по имени файла в хранилище по умолчанию:
+    # ключ sorl зависит от хранилища, а у поля Post.image оно своё
+    return getattr(image, 'name', image)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def build_thumbnails(name):
+    """Построить все миниатюры картинки, если их ещё никто не строит."""
+    lock_key = LOCK_KEY.format(name)
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        return False
+    get_thumbnails = getattr(default.backend, 'get_thumbnails', None)
+    try:
+        if get_thumbnails is not None:
+            # Исходник декодируется один раз на все варианты
+            get_thumbnails(name, THUMBNAIL_SPECS)
+        else:
+            for geometry, options in THUMBNAIL_SPECS:
+                get_thumbnail(name, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+        return False
+    finally:
+        cache.delete(lock_key)
+    thumbnails_built.send(sender=None, name=name)
+    return True
+
+
+def _build_pending(name):
+    try:
+        return build_thumbnails(name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def _submit(name):
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _get_executor().submit(_build_pending, name)
+
+
+def schedule_thumbnails(image):
+    """Поставить построение миниатюр картинки в очередь пула.
+
+    Задание отправляется после фиксации транзакции, чтобы воркер не
+    конкурировал с запросом за базу. При THUMBNAIL_WORKERS = 0 миниатюры
+    строятся сразу. image — файл поля или имя файла в хранилище.
+    """
+    if not image:
+        return
+    name = _source_name(image)
+    if not settings.THUMBNAIL_WORKERS:
+        build_thumbnails(name)
+        return
+    transaction.on_commit(partial(_submit, name))
+
+
+def prefetch_thumbnails(images):
+    """Загрузить записи миниатюр всех картинок страницы одним заходом."""
+    prefetch = getattr(default.kvstore, 'prefetch', None)
+    names = [
+        thumbnail_name(_source_name(image), geometry, **options)
+        for image in images if image
+        for geometry, options in THUMBNAIL_SPECS
+    ]
+    if prefetch is not None and names:
+        prefetch(names)
+
+
+def _stored_thumbnails(image):
+    source = _source_name(image)
+    for geometry, options in THUMBNAIL_SPECS:
+        name = thumbnail_name(source, geometry, **options)
+        yield options['format'], default.kvstore.get(
+            ImageFile(name, default.storage)
+        )
+
+
+def thumbnails_ready(image):
+    """Все ли варианты картинки уже построены."""
+    return all(
+        thumbnail is not None for _, thumbnail in _stored_thumbnails(image)
+    )
+
+
+def lookup_thumbnails(image):
+    """Готовые миниатюры картинки по форматам, от узкой к широкой.
+
+    Читается только хранилище ключей: если каких-то вариантов ещё нет,
+    их построение ставится в очередь, а вызывающий получает то, что есть.
+    """
+    found = {}
+    complete = True
+    for format_, thumbnail in _stored_thumbnails(image):
+        if thumbnail is None:
+            complete = False
+        else:
+            found.setdefault(format_, []).append(thumbnail)
+    if not complete:
+        schedule_thumbnails(image)
+    return found
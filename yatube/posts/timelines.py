@@ -0,0 +1,204 @@
+"""Pull-модель ленты подписок: слияние коротких лент авторов.
+
+Для каждого автора в кэше хранится компактный массив последних постов
+в виде пар (pub_date в микросекундах, id), от новых к старым. Страница
+ленты собирается k-путевым слиянием массивов авторов через heapq, так что
+таблица постов читается только на финальной выборке строк по id.
+
+Создание и удаление поста правят ленту автора под блокировкой cache.add,
+иначе два одновременных чтения-изменения-записи теряли бы одно из
+изменений.
+"""
+import heapq
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from itertools import dropwhile, islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+
+from .cards import fetch_cards
+from .models import Follow, Post
+from .pagination import CursorPaginator
+
+TIMELINE_KEY = 'timeline:{}'
+LOCK_KEY = 'timeline-lock:{}'
+# Блокировка истекает сама, если процесс умер, не сняв её
+LOCK_TIMEOUT = 5
+LOCK_ATTEMPTS = 50
+LOCK_DELAY = 0.01
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def _timestamp(pub_date):
+    return (pub_date - EPOCH) // MICROSECOND
+
+
+def _pairs(timeline):
+    return zip(timeline[::2], timeline[1::2])
+
+
+def _reversed_pairs(timeline):
+    return zip(timeline[-2::-2], timeline[::-2])
+
+
+def _dump(timeline):
+    return timeline.tobytes()
+
+
+def _load(raw):
+    timeline = array('q')
+    timeline.frombytes(raw)
+    return timeline
+
+
+def _build(author_id):
+    timeline = array('q')
+    rows = Post.objects.for_author(author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pub_date', 'pk')[:settings.AUTHOR_TIMELINE_LENGTH]
+    for pub_date, post_id in rows:
+        timeline.extend((_timestamp(pub_date), post_id))
+    return timeline
+
+
+def get_timelines(author_ids):
+    """Ленты авторов одним обращением к кэшу; недостающие строятся из БД."""
+    keys = {TIMELINE_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    cached = cache.get_many(keys)
+    timelines = {keys[key]: _load(raw) for key, raw in cached.items()}
+    missing = {
+        key: author_id for key, author_id in keys.items()
+        if key not in cached
+    }
+    for key, author_id in missing.items():
+        timelines[author_id] = _build(author_id)
+        # add, а не set: собранная лента не затирает ту, что успел
+        # обновить push_post
+        cache.add(
+            key, _dump(timelines[author_id]), settings.AUTHOR_TIMELINE_TIMEOUT
+        )
+    return timelines
+
+
+def _update(author_id, change):
+    """Применить change к ленте автора в кэше, если она там есть.
+
+    Не дождавшись блокировки, лента удаляется: её соберёт из БД следующее
+    чтение.
+    """
+    key = TIMELINE_KEY.format(author_id)
+    lock = LOCK_KEY.format(author_id)
+    for _ in range(LOCK_ATTEMPTS):
+        if cache.add(lock, True, LOCK_TIMEOUT):
+            break
+        time.sleep(LOCK_DELAY)
+    else:
+        cache.delete(key)
+        return
+    try:
+        raw = cache.get(key)
+        if raw is not None:
+            cache.set(
+                key, _dump(change(_load(raw))),
+                settings.AUTHOR_TIMELINE_TIMEOUT,
+            )
+    finally:
+        cache.delete(lock)
+
+
+def push_post(post):
+    """Добавить новый пост в начало ленты автора, если она уже в кэше."""
+    def change(cached):
+        timeline = array('q', (_timestamp(post.pub_date), post.pk))
+        timeline.extend(cached)
+        return timeline[:settings.AUTHOR_TIMELINE_LENGTH * 2]
+
+    _update(post.author_id, change)
+
+
+def remove_post(post):
+    """Убрать удалённый пост из ленты автора."""
+    def change(cached):
+        timeline = array('q')
+        for pair in _pairs(cached):
+            if pair[1] != post.pk:
+                timeline.extend(pair)
+        return timeline
+
+    _update(post.author_id, change)
+
+
+class MergedTimeline:
+    """Ленивая последовательность постов из слияния лент авторов.
+
+    Поддерживает len() и срезы, поэтому её можно отдать Paginator:
+    срез стоит O((offset + размер страницы) * log(число авторов)).
+    Для TimelineCursorPaginator есть seek().
+    """
+
+    model = Post
+
+    def __init__(self, author_ids):
+        self.timelines = list(get_timelines(author_ids).values())
+
+    def __len__(self):
+        return sum(len(timeline) // 2 for timeline in self.timelines)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('MergedTimeline поддерживает только срезы')
+        merged = heapq.merge(
+            *(_pairs(timeline) for timeline in self.timelines), reverse=True
+        )
+        ids = [
+            post_id for _, post_id
+            in islice(merged, index.start, index.stop, index.step)
+        ]
+        return fetch_cards(ids)
+
+    def seek(self, values, limit, reverse=False):
+        """Первые limit постов строго старше values = (pub_date, pk).
+
+        С reverse — строго новее, от старых к новым.
+        """
+        pub_date, post_id = values
+        key = (_timestamp(pub_date), post_id)
+        if reverse:
+            merged = heapq.merge(
+                *(_reversed_pairs(timeline) for timeline in self.timelines)
+            )
+            rest = dropwhile(lambda pair: pair <= key, merged)
+        else:
+            merged = heapq.merge(
+                *(_pairs(timeline) for timeline in self.timelines),
+                reverse=True,
+            )
+            rest = dropwhile(lambda pair: pair >= key, merged)
+        return fetch_cards([post_id for _, post_id in islice(rest, limit)])
+
+
+class TimelineCursorPaginator(CursorPaginator):
+    """Курсорная пагинация слитой ленты по паре (pub_date, pk)."""
+
+    def __init__(self, timeline, per_page):
+        self.ordering = ('-pub_date', '-pk')
+        Paginator.__init__(self, timeline, per_page)
+
+    def _rows(self, ordering, values):
+        if values is None:
+            return self.object_list[:self.per_page + 1]
+        return self.object_list.seek(
+            values, self.per_page + 1, reverse=ordering != self.ordering
+        )
+
+
+def follow_timeline(user):
+    author_ids = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    return MergedTimeline(list(author_ids))
@@ -0,0 +1,153 @@
+"""Нормализация картинок постов при загрузке.
+
+Загруженный файл разворачивается по EXIF-ориентации, лишается метаданных,
+уменьшается до POST_IMAGE_MAX_EDGE по длинной стороне и пересохраняется
+в компактный JPEG-мастер. Рядом с мастером кладутся варианты в других
+форматах (WebP, если Pillow собран с его поддержкой). Время каждого шага
+записывается в результат и в лог.
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+MASTER_FORMAT = 'JPEG'
+MASTER_EXTENSION = '.jpg'
+# Метаданные, которых не должно остаться в мастере
+METADATA_KEYS = ('exif', 'icc_profile', 'xmp', 'photoshop', 'comment')
+
+
+class NormalizedImage:
+    """Мастер-файл, варианты по расширениям и время шагов в секундах."""
+
+    def __init__(self):
+        self.master = None
+        self.variants = {}
+        self.timings = {}
+
+    @contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+
+def variant_formats():
+    """Форматы вариантов, которые умеет писать установленный Pillow."""
+    formats = {}
+    if features.check('webp'):
+        formats['.webp'] = ('WEBP', {
+            'quality': settings.POST_IMAGE_WEBP_QUALITY,
+            'method': 4,
+        })
+    return formats
+
+
+def variant_name(name, extension):
+    return os.path.splitext(name)[0] + extension
+
+
+def _flatten(image):
+    """Привести картинку к RGB, подложив белый фон под прозрачность."""
+    if image.mode == 'P' and 'transparency' in image.info:
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, format_, **options):
+    buffer = BytesIO()
+    image.save(buffer, format_, **options)
+    return buffer.getvalue()
+
+
+def normalize_image(file_):
+    """Нормализовать загруженную картинку поста."""
+    result = NormalizedImage()
+    with result.step('decode'):
+        file_.seek(0)
+        image = Image.open(file_)
+        image.load()
+    with result.step('orient'):
+        image = ImageOps.exif_transpose(image)
+    with result.step('strip'):
+        image = _flatten(image)
+        image.info = {}
+    with result.step('resize'):
+        max_edge = settings.POST_IMAGE_MAX_EDGE
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    with result.step('encode'):
+        result.master = ContentFile(
+            _encode(
+                image,
+                MASTER_FORMAT,
+                quality=settings.POST_IMAGE_QUALITY,
+                optimize=True,
+                progressive=True,
+            ),
+            name=variant_name(os.path.basename(file_.name), MASTER_EXTENSION),
+        )
+    for extension, (format_, options) in variant_formats().items():
+        with result.step(f'encode{extension}'):
+            result.variants[extension] = _encode(image, format_, **options)
+    logger.info(
+        'Картинка %s нормализована: %s',
+        file_.name,
+        ', '.join(
+            f'{step} {seconds * 1000:.1f} мс'
+            for step, seconds in result.timings.items()
+        ),
+    )
+    return result
+
+
+def is_normalized(name, storage=default_storage):
+    """Проверить, что файл уже мастер нужного вида и варианты на месте."""
+    if not name.lower().endswith(MASTER_EXTENSION):
+        return False
+    if not all(
+        storage.exists(variant_name(name, extension))
+        for extension in variant_formats()
+    ):
+        return False
+    with storage.open(name) as file_:
+        image = Image.open(file_)
+        return (
+            image.format == MASTER_FORMAT
+            and max(image.size) <= settings.POST_IMAGE_MAX_EDGE
+            and not any(key in image.info for key in METADATA_KEYS)
+        )
+
+
+def store_variants(name, variants, storage=default_storage):
+    """Записать варианты рядом с мастером.
+
+    Имя мастера — хэш его содержимого, поэтому уже записанные варианты
+    с тем же именем совпадают с новыми и не перезаписываются.
+    """
+    for extension, content in variants.items():
+        path = variant_name(name, extension)
+        if not storage.exists(path):
+            storage.save(path, ContentFile(content))
+
+
+def delete_variants(name, storage=default_storage):
+    """Удалить варианты, лежащие рядом с мастером."""
+    for extension in variant_formats():
+        path = variant_name(name, extension)
+        if storage.exists(path):
+            storage.delete(path)
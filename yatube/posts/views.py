@@ -1,21 +1,60 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
+from django.db.models import Exists, OuterRef
+from django.http import Http404, JsonResponse
+
+from core.replica import replica_reads
 
-from .models import Post, Group, User, Follow
+from .models import Post, Group, User, Follow, Comment
 from .forms import PostForm, CommentForm
+from . import (
+    autocomplete, feeds, page_cache, shards, stats, thumbnails, timelines
+)
+from .search import SearchResults
+from .cards import as_cards, fetch_cards
+from .pagination import CursorPaginator, InvalidCursor
 
 
 POSTS_QUANTITY = 10
-CACHE_TIME_IN_SECONDS = 20
 
 
-@cache_page(CACHE_TIME_IN_SECONDS, key_prefix='index_page')
+def index_namespaces():
+    return page_cache.INDEX_NAMESPACE, page_cache.USERS_NAMESPACE
+
+
+def group_namespaces(slug):
+    return page_cache.group_namespace(slug), page_cache.USERS_NAMESPACE
+
+
+def profile_namespaces(username):
+    return page_cache.author_namespace(username), page_cache.USERS_NAMESPACE
+
+
+def post_namespaces(post_id):
+    """Пост, его комментарии и счётчик постов автора на странице."""
+    usernames = Post.objects.for_post(post_id).filter(
+        pk=post_id
+    ).order_by().values_list('author__username', flat=True)
+    return (
+        page_cache.post_namespace(post_id),
+        *map(page_cache.author_namespace, usernames),
+        page_cache.USERS_NAMESPACE,
+    )
+
+
+@page_cache.conditional_by_generation(index_namespaces)
+@page_cache.cache_page_by_generation(
+    settings.PAGE_CACHE_TIMEOUT, index_namespaces
+)
+@replica_reads
 def index(request):
     """Главная страница."""
     template = 'posts/index.html'
-    posts = Post.objects.all().order_by('-pub_date')
+    posts = shards.scatter(as_cards(Post.objects.all()))
     context = {
         'title': 'Последние обновления на сайте',
         'posts': posts,
@@ -24,11 +63,16 @@ def index(request):
     return render(request, template, context)
 
 
+@page_cache.conditional_by_generation(group_namespaces)
+@page_cache.cache_page_by_generation(
+    settings.PAGE_CACHE_TIMEOUT, group_namespaces
+)
+@replica_reads
 def group_posts(request, slug):
     """view-функция принимает параметр slug из path()."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').order_by('-pub_date')
+    posts = shards.scatter(as_cards(group.posts.all()))
     context = {
         'group': group,
         'posts': posts,
@@ -37,12 +81,17 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@page_cache.conditional_by_generation(profile_namespaces)
+@page_cache.cache_page_by_generation(
+    settings.PAGE_CACHE_TIMEOUT, profile_namespaces
+)
+@replica_reads
 def profile(request, username):
     """Здесь код запроса к модели и создание словаря контекста."""
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    posts_count = author.posts.count()
+    posts = as_cards(author.posts.all())
+    author_stats = stats.get_stats(author)
     following = (
         request.user.is_authenticated
         and author.following.filter(user=request.user).exists()
@@ -50,28 +99,92 @@ def profile(request, username):
     context = {
         'author': author,
         'posts': posts,
-        'posts_count': posts_count,
+        'posts_count': author_stats.posts,
+        'stats': author_stats,
         'page_obj': get_page(posts, request),
         'following': following,
     }
     return render(request, template, context)
 
 
+@page_cache.conditional_by_generation(post_namespaces, vary_on_csrf=True)
+@replica_reads
 def post_detail(request, post_id):
     """Здесь код запроса к модели и создание словаря контекста."""
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    posts_count = post.author.posts.count()
+    post = get_object_or_404(Post.objects.for_post(post_id), id=post_id)
+    posts_count = stats.get_stats(post.author).posts
     form = CommentForm()
     context = {
         'post': post,
         'posts_count': posts_count,
         'form': form,
-        'comments': post.comments.all()
+        'comments': get_comments_page(post.pk, None),
     }
     return render(request, template, context)
 
 
+@replica_reads
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста HTML-фрагментом."""
+    template = 'posts/includes/comments.html'
+    post = get_object_or_404(
+        Post.objects.for_post(post_id).only('pk'), id=post_id
+    )
+    context = {
+        'post': post,
+        'comments': get_comments_page(
+            post.pk, request.GET.get(CursorPaginator.cursor_param)
+        ),
+    }
+    return render(request, template, context)
+
+
+def get_comments_page(post_id, cursor):
+    comments = Comment.objects.for_post(post_id).filter(
+        post_id=post_id
+    ).select_related(
+        'author'
+    ).only('text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PAGE_SIZE, ('created', 'pk')
+    )
+    return get_cursor_page(paginator, cursor)
+
+
+def get_cursor_page(paginator, cursor):
+    """Страница по курсору; испорченный курсор — 404, как у ListView."""
+    try:
+        return paginator.get_page(cursor)
+    except InvalidCursor:
+        raise Http404('Неверный курсор')
+
+
+def search(request):
+    """Поиск по постам, комментариям и группам."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': Paginator(
+            SearchResults(query), POSTS_QUANTITY
+        ).get_page(request.GET.get('page')),
+        # Ссылки пагинатора должны сохранять запрос
+        'query_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+def autocomplete_names(request):
+    """Подсказки авторов и групп по началу имени в JSON."""
+    entries = autocomplete.complete(
+        request.GET.get('q', ''), settings.AUTOCOMPLETE_LIMIT
+    )
+    return JsonResponse(
+        {'results': [entry.as_dict() for entry in entries]}
+    )
+
+
 @login_required
 def post_create(request):
     """Форма создания поста."""
@@ -82,6 +195,8 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            form.save_image_variants()
+            thumbnails.schedule_thumbnails(post.image)
             return redirect('posts:profile', request.user)
         return render(request, template, {'form': form})
     form = PostForm()
@@ -92,7 +207,7 @@ def post_create(request):
 def post_edit(request, post_id):
     """Форма редактирования поста."""
     template = 'posts/create_post.html'
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_post(post_id), id=post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post.pk)
     if request.method == 'POST':
@@ -105,6 +220,9 @@ def post_edit(request, post_id):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            if 'image' in form.changed_data:
+                form.save_image_variants()
+                thumbnails.schedule_thumbnails(post.image)
             return redirect('posts:post_detail', post.pk)
     else:
         form = PostForm(instance=post)
@@ -115,8 +233,18 @@ def post_edit(request, post_id):
     })
 
 
-def get_page(posts, request):
+def get_page(posts, request, ordering=('-pub_date', '-pk'), count=None):
+    """Страница posts; count — функция подсчёта, если posts.count()
+    дорог, нужна только номерной пагинации.
+    """
+    if settings.POSTS_CURSOR_PAGINATION:
+        paginator = CursorPaginator(posts, POSTS_QUANTITY, ordering)
+        return get_cursor_page(
+            paginator, request.GET.get(CursorPaginator.cursor_param)
+        )
     paginator = Paginator(posts, POSTS_QUANTITY)
+    if count is not None:
+        paginator.count = count()
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
@@ -124,7 +252,7 @@ def get_page(posts, request):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_post(post_id), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -135,17 +263,75 @@ def add_comment(request, post_id):
 
 
 @login_required
+@replica_reads
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
+    backend = settings.FOLLOW_FEED_BACKEND
+    # Инбоксы ведутся только без шардов
+    if backend == 'inbox' and shards.enabled():
+        backend = 'join'
+    if backend == 'inbox':
+        page_obj = get_inbox_page(request)
+        posts = page_obj.object_list
+    elif backend == 'merge':
+        page_obj = get_timeline_page(request)
+        posts = page_obj.object_list
+    elif shards.enabled():
+        # Подписки — в основной базе, посты — в шардах авторов
+        posts = shards.scatter_authors(
+            as_cards(Post.objects.all()),
+            request.user.follower.values_list('author_id', flat=True),
+        )
+        page_obj = get_page(posts, request)
+    else:
+        # EXISTS вместо JOIN: посты идут по индексу pub_date, а подписка
+        # проверяется точечно, без сортировки во временном B-дереве.
+        # Считаются же посты по IN: COUNT по аннотации EXISTS Django
+        # оборачивает в GROUP BY и проходит всю таблицу
+        followed = Follow.objects.filter(
+            user=request.user, author=OuterRef('author')
+        )
+        posts = as_cards(
+            Post.objects.annotate(followed=Exists(followed)).filter(
+                followed=True
+            )
+        )
+        counted = Post.objects.filter(
+            author__in=request.user.follower.values('author_id')
+        )
+        page_obj = get_page(posts, request, count=counted.count)
     context = {
         'title': 'Лента подписок',
-        'page_obj': get_page(posts, request),
+        'page_obj': page_obj,
         'posts': posts
     }
     return render(request, template, context)
 
 
+def get_timeline_page(request):
+    """Страница ленты подписок из слияния лент авторов."""
+    timeline = timelines.follow_timeline(request.user)
+    if settings.POSTS_CURSOR_PAGINATION:
+        return get_cursor_page(
+            timelines.TimelineCursorPaginator(timeline, POSTS_QUANTITY),
+            request.GET.get(CursorPaginator.cursor_param),
+        )
+    return Paginator(timeline, POSTS_QUANTITY).get_page(
+        request.GET.get('page')
+    )
+
+
+def get_inbox_page(request):
+    """Страница ленты подписок из материализованного инбокса."""
+    page_obj = get_page(
+        feeds.inbox_entries(request.user), request, ('-pub_date', '-post_id')
+    )
+    page_obj.object_list = fetch_cards(
+        [entry.post_id for entry in page_obj.object_list]
+    )
+    return page_obj
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from urllib.request import pathname2url
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -52,10 +53,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Статика отдаётся до сессий и базы
+    'core.middleware.StaticFilesMiddleware',
+    # Раньше сессий: запись сессии тоже должна идти через очередь
+    'core.middleware.SerializedWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReadYourWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -85,12 +91,51 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Реплика только для чтения лент: копия db.sqlite3, которую обновляет
+# команда sync_replica (core.replica)
+REPLICA_PATH = os.path.join(BASE_DIR, 'db.replica.sqlite3')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{pathname2url(REPLICA_PATH)}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = [
+    'posts.shards.ShardRouter',
+    'core.replica.ReplicaRouter',
+]
+# Шардирование постов по авторам (posts.shards): алиасы баз из DATABASES,
+# например ('shard0', 'shard1'). Пусто — все посты в основной базе.
+# Базы шардов создаются командой migrate --database <alias>, после
+# включения режима или смены списка посты раскладывает rebalance_shards.
+POST_SHARDS = ()
+REPLICA_DATABASE = 'replica'
+REPLICA_SYNC_INTERVAL = 5
+# Сколько секунд после своей записи клиент читает из основной базы;
+# должно перекрывать интервал синхронизации и время самой копии
+REPLICA_PIN_COOKIE = 'read_primary'
+REPLICA_PIN_SECONDS = 3 * REPLICA_SYNC_INTERVAL
+
+# PRAGMA для каждого нового соединения с SQLite (core.sqlite):
+# WAL, ожидание блокировки 5 с, 64 МиБ страничного кэша, 256 МиБ mmap
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Пишущие запросы процесса идут к SQLite по очереди; после таймаута
+# (в секундах) запрос пишет без очереди и ждёт по busy_timeout
+SQLITE_SERIALIZE_WRITES = True
+SQLITE_WRITE_QUEUE_TIMEOUT = 10
 
 
 # Password validation
@@ -133,6 +178,22 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 STATIC_URL = '/static/'
+# collectstatic кладёт сюда файлы с хэшем в имени и их .gz / .br копии
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# Срок кэширования файлов с хэшем: их содержимое не меняется
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+# purge_css: из PURGE_CSS_SOURCE остаются правила для классов шаблонов
+PURGE_CSS_SOURCE = 'css/bootstrap.min.css'
+PURGE_CSS_OUTPUT = 'css/bootstrap.purged.css'
+# Критический CSS — классы шаблонов первого экрана, встраивается в <head>
+CRITICAL_CSS = 'css/critical.css'
+CRITICAL_CSS_TEMPLATES = ('base.html', 'includes/header.html')
+# Классы, которых нет в шаблонах: значение по умолчанию responsive_image
+# и состояния, которые ставит JavaScript бустрапа
+PURGE_CSS_SAFELIST = (
+    'card-img', 'my-2', 'show', 'fade', 'collapse', 'collapsing',
+)
 
 LOGIN_URL = 'users:login'
 
@@ -145,8 +206,55 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Общий для всех воркеров хоста кэш в SQLite-файле (WAL, LRU, лимит размера)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
+
+# Курсорная пагинация лент (без COUNT(*) и OFFSET)
+POSTS_CURSOR_PAGINATION = False
+
+# Лента подписок: 'inbox' — материализованный инбокс,
+# 'merge' — слияние лент авторов из кэша, 'join' — JOIN по Follow
+FOLLOW_FEED_BACKEND = 'inbox'
+FEED_INBOX_LIMIT = 1000
+FEED_INBOX_BACKFILL = 100
+AUTHOR_TIMELINE_LENGTH = 200
+AUTHOR_TIMELINE_TIMEOUT = 60 * 60 * 24
+
+# Время жизни кэша отрисованных карточек постов
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кэш страниц лент сбрасывается сигналами, поэтому может жить долго
+PAGE_CACHE_TIMEOUT = 60 * 60 * 12
+
+# Комментариев на одной порции страницы поста
+COMMENTS_PAGE_SIZE = 20
+
+# Подсказок в автодополнении авторов и групп
+AUTOCOMPLETE_LIMIT = 10
+
+# Нормализация загруженных картинок: длинная сторона и качество
+POST_IMAGE_MAX_EDGE = 1920
+POST_IMAGE_QUALITY = 85
+POST_IMAGE_WEBP_QUALITY = 80
+
+# Потоков для фоновой подготовки миниатюр (0 — строить сразу в запросе)
+THUMBNAIL_WORKERS = 2
+
+# Движок sorl.thumbnail с уменьшенным декодированием JPEG и бэкенд,
+# строящий все варианты картинки из одного декодированного исходника
+THUMBNAIL_ENGINE = 'core.thumbnail_engine.Engine'
+THUMBNAIL_BACKEND = 'core.thumbnail_backend.ThumbnailBackend'
+
+# Хранилище ключей sorl.thumbnail: LRU процесса перед общим кэшем
+THUMBNAIL_KVSTORE = 'core.thumbnail_kvstore.KVStore'
+THUMBNAIL_LRU_SIZE = 10000
+THUMBNAIL_LRU_TIMEOUT = 300
@@ -0,0 +1,20 @@
+"""Настройки тестов: manage.py test --settings=yatube.test_settings.
+
+pytest берёт их из pytest.ini.
+"""
+from .settings import *  # noqa: F401,F403
+
+# Данные тестов живут в транзакции основной базы, реплика их не видит
+REPLICA_DATABASE = None
+
+# Свой кэш в памяти процесса: cache.clear() в тестах не стирает кэш хоста,
+# а поколения страниц не переходят из прогона в прогон
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Потоки пула переживали бы тест и писали во временный MEDIA_ROOT после
+# его удаления, поэтому миниатюры строятся сразу
+THUMBNAIL_WORKERS = 0